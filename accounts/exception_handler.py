@@ -0,0 +1,9 @@
+from rest_framework.views import exception_handler
+
+
+def custom_exception_handler(exc, context):
+    """
+    Project-wide DRF exception handler (see REST_FRAMEWORK["EXCEPTION_HANDLER"]).
+    Currently defers to DRF's default handling.
+    """
+    return exception_handler(exc, context)
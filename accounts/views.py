@@ -18,6 +18,8 @@ from rest_framework.generics import (
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView
 
+from cart.guest import merge_guest_cart
+from core.pagination import KeysetPagination
 from .serializers import (
     UserRegisterSerializer,
     UserLoginSerializer,
@@ -44,6 +46,7 @@ class RegisterView(APIView):
         serializer = UserRegisterSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
+        merge_guest_cart(request.session.session_key, user)
         token_data = JWTTokenSerializer.from_user(user).data
         return Response(token_data, status=status.HTTP_201_CREATED)
 
@@ -66,6 +69,9 @@ class LoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
+        # Keep what the visitor put in their cart before signing in
+        merge_guest_cart(request.session.session_key, user)
+
         token_data = JWTTokenSerializer.from_user(user).data
         return Response(token_data, status=status.HTTP_200_OK)
 
@@ -149,9 +155,10 @@ class PasswordResetConfirmView(GenericAPIView):
 
 class UserListView(ListAPIView):
     """Admin: list all users."""
-    queryset = User.objects.all().order_by("-date_joined")
+    queryset = User.objects.all().order_by("-date_joined", "id")
     serializer_class = UserListSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = KeysetPagination
 
 
 class UserDetailView(RetrieveAPIView):
@@ -1,4 +1,5 @@
 from django.db.models import Sum, Count
+from django.db.models.functions import TruncDate
 from django.utils.timezone import now, timedelta
 
 from rest_framework.views import APIView
@@ -9,6 +10,9 @@ from orders.models import Order
 from products.models import Product
 from accounts.models import CustomUser
 
+# Orders that count towards revenue (money received)
+REVENUE_STATUSES = ["paid", "shipped", "delivered"]
+
 
 # ---------------------------
 # Dashboard Overview
@@ -20,8 +24,8 @@ class AnalyticsOverviewView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        total_revenue = Order.objects.filter(status="completed").aggregate(
-            total=Sum("total_amount")
+        total_revenue = Order.objects.filter(status__in=REVENUE_STATUSES).aggregate(
+            total=Sum("total")
         )["total"] or 0
 
         total_orders = Order.objects.count()
@@ -50,10 +54,10 @@ class SalesOverTimeView(APIView):
         start_date = now() - timedelta(days=30)
 
         sales = (
-            Order.objects.filter(created_at__gte=start_date, status="completed")
-            .extra(select={"day": "date(created_at)"})
+            Order.objects.filter(created_at__gte=start_date, status__in=REVENUE_STATUSES)
+            .annotate(day=TruncDate("created_at"))
             .values("day")
-            .annotate(total=Sum("total_amount"), count=Count("id"))
+            .annotate(total=Sum("total"), count=Count("id"))
             .order_by("day")
         )
 
@@ -77,7 +81,7 @@ class RecentOrdersView(APIView):
                 "id",
                 "user__email",
                 "status",
-                "total_amount",
+                "total",
                 "created_at",
             )
         )
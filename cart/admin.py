@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cart, CartItem, Coupon
+from .models import ArchivedCart, Cart, CartItem, Coupon
 
 
 class CartItemInline(admin.TabularInline):
@@ -8,8 +8,8 @@ class CartItemInline(admin.TabularInline):
     """
     model = CartItem
     extra = 0
-    readonly_fields = ("product", "price", "subtotal", "added_at")
-    fields = ("product", "quantity", "price", "subtotal", "added_at")
+    readonly_fields = ("product", "variation", "price", "subtotal", "added_at")
+    fields = ("product", "variation", "quantity", "price", "subtotal", "added_at")
 
     def subtotal(self, obj):
         return obj.subtotal
@@ -20,10 +20,10 @@ class CartAdmin(admin.ModelAdmin):
     """
     Admin for Carts with inline items.
     """
-    list_display = ("id", "user", "session_id", "total_items", "total_price", "is_active", "updated_at")
+    list_display = ("id", "user", "session_id", "item_count", "subtotal", "is_active", "updated_at")
     list_filter = ("is_active", "updated_at", "created_at")
     search_fields = ("user__username", "session_id")
-    readonly_fields = ("total_items", "total_price", "created_at", "updated_at")
+    readonly_fields = ("item_count", "subtotal", "created_at", "updated_at")
     inlines = [CartItemInline]
 
 
@@ -32,7 +32,7 @@ class CartItemAdmin(admin.ModelAdmin):
     """
     Admin for individual Cart Items.
     """
-    list_display = ("id", "cart", "product", "quantity", "price", "subtotal", "added_at")
+    list_display = ("id", "cart", "product", "variation", "quantity", "price", "subtotal", "added_at")
     list_filter = ("added_at",)
     search_fields = ("product__name", "cart__id")
 
@@ -42,15 +42,30 @@ class CartItemAdmin(admin.ModelAdmin):
         return obj.subtotal
 
 
+@admin.register(ArchivedCart)
+class ArchivedCartAdmin(admin.ModelAdmin):
+    """
+    Read-only snapshots of abandoned carts removed by cleanup_carts.
+    """
+    list_display = ("cart_id", "user", "item_count", "subtotal", "last_activity_at", "archived_at")
+    list_filter = ("archived_at",)
+    search_fields = ("user__email", "cart_id")
+    readonly_fields = ("cart_id", "user", "item_count", "subtotal", "lines", "created_at", "last_activity_at", "archived_at")
+
+
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
     """
     Admin for Coupons (discount codes).
     """
-    list_display = ("code", "discount_percent", "active", "valid_from", "valid_to", "is_valid_now")
-    list_filter = ("active", "valid_from", "valid_to")
+    list_display = (
+        "code", "kind", "discount_percent", "amount", "times_used", "usage_limit",
+        "active", "valid_from", "valid_to", "is_valid_now",
+    )
+    list_filter = ("kind", "active", "valid_from", "valid_to")
     search_fields = ("code",)
-    readonly_fields = ("is_valid_now",)
+    readonly_fields = ("times_used", "is_valid_now")
+    filter_horizontal = ("categories", "brands")
 
     def is_valid_now(self, obj):
         return obj.is_valid()
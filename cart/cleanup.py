@@ -0,0 +1,76 @@
+"""
+Removal of carts nobody will use again.
+
+Carts are deleted in primary-key batches (keyset iteration, one short
+transaction per batch), so a cleanup over millions of rows never holds locks
+for long. Every batch re-applies the staleness filter inside its transaction,
+so a cart touched after its id was read is left alone.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedCart, Cart, CartItem
+
+
+def _days_ago(days, now=None):
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def checked_out_carts(days=None, now=None):
+    """Carts deactivated by checkout (their orders keep their own item snapshot)."""
+    days = days if days is not None else getattr(settings, "CHECKED_OUT_CART_RETENTION_DAYS", 30)
+    return Cart.objects.filter(is_active=False, updated_at__lt=_days_ago(days, now))
+
+
+def abandoned_carts(days=None, now=None):
+    """Active carts of signed-in users that nobody touched for a long time."""
+    days = days if days is not None else getattr(settings, "ABANDONED_CART_DAYS", 90)
+    return Cart.objects.filter(is_active=True, user__isnull=False, updated_at__lt=_days_ago(days, now))
+
+
+def guest_carts(days=None, now=None):
+    days = days if days is not None else getattr(settings, "GUEST_CART_TTL_DAYS", 30)
+    return Cart.objects.filter(user=None, updated_at__lt=_days_ago(days, now))
+
+
+def archive_carts(carts):
+    """Write an ArchivedCart snapshot of each cart in `carts` (one items query, one insert)."""
+    lines = {}
+    for line in CartItem.objects.filter(cart__in=carts).values("cart_id", "product_id", "variation_id", "quantity", "price"):
+        lines.setdefault(line.pop("cart_id"), []).append({**line, "price": str(line["price"])})
+    return ArchivedCart.objects.bulk_create([
+        ArchivedCart(
+            cart_id=cart.pk,
+            user_id=cart.user_id,
+            item_count=cart.item_count,
+            subtotal=cart.subtotal,
+            lines=lines.get(cart.pk, []),
+            created_at=cart.created_at,
+            last_activity_at=cart.updated_at,
+        )
+        for cart in carts
+    ])
+
+
+def delete_carts(queryset, batch_size=500, archive=False):
+    """
+    Delete every cart in `queryset` (archiving it first if asked), `batch_size`
+    carts per transaction. Returns the number of carts deleted.
+    """
+    deleted = 0
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last_id).order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            batch = queryset.filter(pk__in=ids)
+            if archive:
+                archive_carts(list(batch.select_for_update()))
+            _, per_model = batch.delete()
+        deleted += per_model.get(Cart._meta.label, 0)
+        last_id = ids[-1]
+    return deleted
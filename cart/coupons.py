@@ -0,0 +1,184 @@
+"""
+Coupon evaluation.
+
+Active coupons are compiled once into plain `CompiledCoupon` objects held in a
+process-local registry keyed by normalized code. Applying a code is then a
+dict lookup plus an in-memory pass over the cart lines; the database is only
+touched to redeem the coupon at checkout.
+
+The registry is rebuilt whenever the shared Coupon / Category generation moves
+(`core.cache`), so a coupon saved in the admin takes effect in every worker on
+its next request. Redemption counts (`times_used`) change through
+`redeem_coupon()`'s conditional UPDATE, which does not bump the generation:
+the limit check at apply time may be slightly stale, the one at checkout is not.
+"""
+import threading
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.cache import get_generations
+from products.models import Category
+
+from .models import Coupon
+
+CENT = Decimal("0.01")
+
+
+class CouponError(Exception):
+    """The coupon cannot be applied; the message is safe to show to the customer."""
+
+
+@dataclass(frozen=True)
+class CompiledCoupon:
+    id: int
+    code: str
+    kind: str
+    percent: Decimal
+    amount: Decimal
+    tiers: tuple  # ((min_subtotal, percent), ...) highest threshold first
+    min_subtotal: Decimal
+    category_paths: tuple
+    brand_ids: frozenset
+    usage_limit: int
+    times_used: int
+    valid_from: object
+    valid_to: object
+
+    @classmethod
+    def compile(cls, coupon, category_paths, brand_ids):
+        tiers = sorted(
+            ((Decimal(str(tier["min_subtotal"])), Decimal(str(tier["percent"]))) for tier in coupon.tiers or []),
+            reverse=True,
+        )
+        return cls(
+            id=coupon.pk,
+            code=coupon.code,
+            kind=coupon.kind,
+            percent=coupon.discount_percent,
+            amount=coupon.amount,
+            tiers=tuple(tiers),
+            min_subtotal=coupon.min_subtotal,
+            category_paths=tuple(category_paths),
+            brand_ids=frozenset(brand_ids),
+            usage_limit=coupon.usage_limit,
+            times_used=coupon.times_used,
+            valid_from=coupon.valid_from,
+            valid_to=coupon.valid_to,
+        )
+
+    def check(self, now=None):
+        now = now or timezone.now()
+        if not self.valid_from <= now <= self.valid_to:
+            raise CouponError("Coupon is expired or inactive")
+        if self.usage_limit is not None and self.times_used >= self.usage_limit:
+            raise CouponError("Coupon usage limit reached")
+
+    def applies_to(self, product):
+        if self.category_paths:
+            path = product.category.path if product.category_id else ""
+            if not path.startswith(self.category_paths):
+                return False
+        if self.brand_ids and product.brand_id not in self.brand_ids:
+            return False
+        return True
+
+    def discount(self, lines):
+        """
+        Discount for `lines` (CartItem-likes with `product`, `price`, `quantity`;
+        scoped coupons read product.category.path and product.brand_id).
+        """
+        self.check()
+        subtotal = sum((line.price * line.quantity for line in lines), Decimal("0"))
+        if subtotal < self.min_subtotal:
+            raise CouponError(f"Coupon requires a subtotal of at least {self.min_subtotal}")
+
+        base = sum(
+            (line.price * line.quantity for line in lines if self.applies_to(line.product)), Decimal("0")
+        )
+        if self.kind == Coupon.FIXED:
+            value = min(self.amount, base)
+        elif self.kind == Coupon.TIERED:
+            percent = next((percent for threshold, percent in self.tiers if base >= threshold), Decimal("0"))
+            value = base * percent / 100
+        else:
+            value = base * self.percent / 100
+        return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class CouponRegistry:
+    """Process-local {normalized code: CompiledCoupon} of active coupons, reloaded on generation change."""
+
+    models = (Coupon, Category)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generations = None
+        self._by_code = {}
+        self._by_id = {}
+
+    def _current(self):
+        generations = get_generations(self.models)
+        if generations != self._generations:
+            with self._lock:
+                if generations != self._generations:
+                    self._load()
+                    self._generations = generations
+        return self._by_code, self._by_id
+
+    def _load(self):
+        coupons = list(Coupon.objects.filter(active=True).prefetch_related("categories", "brands"))
+        compiled = [
+            CompiledCoupon.compile(
+                coupon,
+                category_paths=[category.path for category in coupon.categories.all() if category.path],
+                brand_ids=[brand.pk for brand in coupon.brands.all()],
+            )
+            for coupon in coupons
+        ]
+        self._by_code = {coupon.code: coupon for coupon in compiled}
+        self._by_id = {coupon.id: coupon for coupon in compiled}
+
+    def get(self, code):
+        """The compiled coupon for `code` (any case / surrounding spaces); CouponError if unknown."""
+        by_code, _ = self._current()
+        coupon = by_code.get(Coupon.normalize_code(code))
+        if coupon is None:
+            raise CouponError("Invalid coupon code")
+        return coupon
+
+    def get_by_id(self, coupon_id):
+        """The compiled coupon applied to a cart, or None if it was deactivated or deleted."""
+        _, by_id = self._current()
+        return by_id.get(coupon_id)
+
+
+registry = CouponRegistry()
+
+
+def cart_discount(coupon_id, lines):
+    """(discount, error) for a cart's applied coupon; a coupon that no longer applies gives (0, message)."""
+    if coupon_id is None:
+        return Decimal("0"), None
+    coupon = registry.get_by_id(coupon_id)
+    if coupon is None:
+        return Decimal("0"), "Coupon is expired or inactive"
+    try:
+        return coupon.discount(lines), None
+    except CouponError as exc:
+        return Decimal("0"), str(exc)
+
+
+def redeem_coupon(coupon_id):
+    """
+    Count one use of the coupon, atomically: the UPDATE only matches while uses
+    remain, so concurrent checkouts can never exceed usage_limit.
+    Raises CouponError when the limit is already reached.
+    """
+    redeemed = Coupon.objects.filter(pk=coupon_id, active=True).filter(
+        Q(usage_limit__isnull=True) | Q(times_used__lt=F("usage_limit"))
+    ).update(times_used=F("times_used") + 1)
+    if not redeemed:
+        raise CouponError("Coupon usage limit reached")
@@ -0,0 +1,58 @@
+"""
+Guest carts.
+
+A guest only gets a session and a Cart row once they add something (see
+CartViewSet._get_cart). On login the guest cart is folded into the user's
+active cart, and guest carts nobody came back to are purged in batches.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from .cleanup import delete_carts, guest_carts
+from .models import Cart, CartItem
+from .totals import recalculate_cart_totals
+
+
+@transaction.atomic
+def merge_guest_cart(session_id, user):
+    """
+    Fold the active guest cart of `session_id` into `user`'s active cart.
+    Lines for a product (and variation) already in the user's cart add their
+    quantity to it (one line per product and variation); the rest move over. If the user has no active
+    cart the guest cart simply becomes theirs. Returns the user's cart, or None
+    if there was no guest cart.
+    """
+    if not session_id:
+        return None
+    guest = Cart.objects.select_for_update().filter(session_id=session_id, user=None, is_active=True).first()
+    if guest is None:
+        return None
+
+    cart = Cart.objects.select_for_update().filter(user=user, is_active=True).first()
+    if cart is None:
+        guest.user, guest.session_id = user, None
+        guest.save(update_fields=["user", "session_id", "updated_at"])
+        return guest
+
+    guest_lines = {(line.product_id, line.variation_id): line for line in CartItem.objects.filter(cart=guest)}
+    existing = [
+        line for line in CartItem.objects.filter(cart=cart, product_id__in={key[0] for key in guest_lines})
+        if (line.product_id, line.variation_id) in guest_lines
+    ]
+    for line in existing:
+        line.quantity = F("quantity") + guest_lines.pop((line.product_id, line.variation_id)).quantity
+    CartItem.objects.bulk_update(existing, ["quantity"])
+    CartItem.objects.filter(pk__in=[line.pk for line in guest_lines.values()]).update(cart=cart)
+
+    guest.delete()
+    recalculate_cart_totals(cart.pk)  # the bulk writes above skip the item signals
+    return cart
+
+
+def purge_guest_carts(older_than=None, batch_size=500):
+    """
+    Delete guest carts untouched since `older_than` (default: GUEST_CART_TTL_DAYS ago)
+    in primary-key batches. Returns the number of carts deleted.
+    """
+    stale = guest_carts() if older_than is None else Cart.objects.filter(user=None, updated_at__lt=older_than)
+    return delete_carts(stale, batch_size=batch_size)
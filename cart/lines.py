@@ -0,0 +1,82 @@
+"""
+Adding lines to a cart.
+
+A line is for a product or for one of its variations; two sizes of the same
+shoe are two lines. `resolve_lines()` validates and prices every requested
+line. It issues one product query and one variation query, however many lines
+a batch adds. `add_line()` then writes one resolved line, merging it into the
+cart's existing line for the same product and variation.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from products.models import Product, ProductVariation
+
+from .models import CartItem
+
+
+@dataclass(frozen=True)
+class ResolvedLine:
+    product: Product
+    variation: ProductVariation
+    quantity: int
+    price: Decimal
+
+    @property
+    def key(self):
+        return self.product.pk, self.variation.pk if self.variation else None
+
+
+def resolve_lines(requests, prices):
+    """
+    Validate and price `requests`, a {key: {"product_id", "variation_id" (optional),
+    "quantity"}} mapping, with the request's products.pricing.PriceResolver.
+    Returns ({key: ResolvedLine}, {key: {field: message}}) for the valid and
+    invalid requests.
+    """
+    product_ids = {request["product_id"] for request in requests.values()}
+    variation_ids = {request["variation_id"] for request in requests.values() if request.get("variation_id")}
+    products = Product.objects.filter(is_active=True).in_bulk(product_ids)
+    variations = ProductVariation.objects.filter(is_active=True).in_bulk(variation_ids) if variation_ids else {}
+
+    resolved, errors = {}, {}
+    for key, request in requests.items():
+        product = products.get(request["product_id"])
+        if product is None:
+            errors[key] = {"product_id": "Invalid product."}
+            continue
+        variation = None
+        if request.get("variation_id"):
+            variation = variations.get(request["variation_id"])
+            if variation is None or variation.product_id != product.pk:
+                errors[key] = {"variation_id": "Invalid variation for this product."}
+                continue
+        quantity = request.get("quantity", 1)
+        resolved[key] = ResolvedLine(product, variation, quantity, prices.price(product, variation).unit)
+    return resolved, errors
+
+
+def add_line(cart, line, existing=None):
+    """
+    Add a ResolvedLine to `cart`, or its quantity to the cart's line for the same
+    product and variation (refreshing the price snapshot). Pass `existing`, a
+    {(product_id, variation_id): CartItem} map of the cart's lines, to skip the
+    lookup; new lines are added to it.
+    """
+    if existing is None:
+        item, created = CartItem.objects.get_or_create(
+            cart=cart, product=line.product, variation=line.variation,
+            defaults={"quantity": line.quantity, "price": line.price},
+        )
+    else:
+        item, created = existing.get(line.key), False
+        if item is None:
+            item = existing[line.key] = CartItem.objects.create(
+                cart=cart, product=line.product, variation=line.variation, quantity=line.quantity, price=line.price,
+            )
+            created = True
+    if not created:
+        item.quantity += line.quantity
+        item.price = line.price
+        item.save()
+    return item
@@ -0,0 +1,44 @@
+"""
+Schedulable cart cleanup, e.g. nightly from cron:
+
+    python manage.py cleanup_carts --batch-size 1000
+
+Deletes checked-out carts after CHECKED_OUT_CART_RETENTION_DAYS, guest carts
+after GUEST_CART_TTL_DAYS, and archives then deletes signed-in users' carts
+abandoned for ABANDONED_CART_DAYS. Each threshold can be overridden.
+"""
+from django.core.management.base import BaseCommand
+
+from cart.cleanup import abandoned_carts, checked_out_carts, delete_carts, guest_carts
+
+
+class Command(BaseCommand):
+    help = "Delete old checked-out and guest carts and archive abandoned user carts, in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checked-out-days", type=int, help="Override CHECKED_OUT_CART_RETENTION_DAYS.")
+        parser.add_argument("--guest-days", type=int, help="Override GUEST_CART_TTL_DAYS.")
+        parser.add_argument("--abandoned-days", type=int, help="Override ABANDONED_CART_DAYS.")
+        parser.add_argument(
+            "--no-archive", action="store_true",
+            help="Delete abandoned user carts without keeping an ArchivedCart snapshot.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of carts deleted per transaction.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be removed.")
+
+    def handle(self, *args, **options):
+        jobs = [
+            ("checked-out", checked_out_carts(options["checked_out_days"]), False),
+            ("guest", guest_carts(options["guest_days"]), False),
+            ("abandoned", abandoned_carts(options["abandoned_days"]), not options["no_archive"]),
+        ]
+        for label, queryset, archive in jobs:
+            if options["dry_run"]:
+                self.stdout.write(f"Would remove {queryset.count()} {label} cart(s).")
+                continue
+            deleted = delete_carts(queryset, batch_size=options["batch_size"], archive=archive)
+            verb = "Archived and deleted" if archive else "Deleted"
+            self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} {label} cart(s)."))
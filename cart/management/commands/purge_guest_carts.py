@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cart.guest import purge_guest_carts
+
+
+class Command(BaseCommand):
+    help = "Delete guest carts that have not been touched for GUEST_CART_TTL_DAYS (or --days)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Override GUEST_CART_TTL_DAYS.")
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of carts deleted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options["days"]) if options["days"] is not None else None
+        deleted = purge_guest_carts(older_than=older_than, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} guest cart(s)."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from cart.totals import rebuild_cart_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored item_count / subtotal on every cart from its items and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of carts checked per aggregate query / bulk update.",
+        )
+
+    def handle(self, *args, **options):
+        checked, repaired = rebuild_cart_totals(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} cart(s), repaired {repaired}."))
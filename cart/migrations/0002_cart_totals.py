@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:43
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('cart', 'Cart')
+    CartItem = apps.get_model('cart', 'CartItem')
+    carts = []
+    for row in (
+        CartItem.objects.values('cart_id')
+        .annotate(count=Sum('quantity'), total=Sum(F('price') * F('quantity')))
+        .order_by()
+    ):
+        carts.append(Cart(pk=row['cart_id'], item_count=row['count'], subtotal=row['total']))
+    Cart.objects.bulk_update(carts, ['item_count', 'subtotal'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_cart_totals, migrations.RunPython.noop),
+    ]
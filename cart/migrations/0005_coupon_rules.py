@@ -0,0 +1,69 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize_coupon_codes(apps, schema_editor):
+    Coupon = apps.get_model('cart', 'Coupon')
+    coupons = list(Coupon.objects.only('id', 'code'))
+    for coupon in coupons:
+        coupon.code = coupon.code.strip().upper()
+    Coupon.objects.bulk_update(coupons, ['code'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_cart_cleanup'),
+        ('products', '0006_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='coupon',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='carts', to='cart.coupon'),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='For fixed coupons', max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='brands',
+            field=models.ManyToManyField(blank=True, related_name='coupons', to='products.brand'),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='categories',
+            field=models.ManyToManyField(blank=True, related_name='coupons', to='products.category'),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='kind',
+            field=models.CharField(choices=[('percent', 'Percent off'), ('fixed', 'Fixed amount off'), ('tiered', 'Percent off by spend tier')], default='percent', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='min_subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='tiers',
+            field=models.JSONField(blank=True, default=list, help_text='For tiered coupons: [{"min_subtotal": "100.00", "percent": "5"}, ...]'),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='times_used',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='usage_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Empty for unlimited', null=True),
+        ),
+        migrations.RunPython(normalize_coupon_codes, migrations.RunPython.noop),
+    ]
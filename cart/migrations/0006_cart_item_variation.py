@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0005_coupon_rules'),
+        ('products', '0007_product_sale_window'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='cartitem',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='variation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='products.productvariation'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('variation__isnull', False)), fields=('cart', 'product', 'variation'), name='cart_item_variation_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('variation__isnull', True)), fields=('cart', 'product'), name='cart_item_product_unique'),
+        ),
+    ]
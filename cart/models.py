@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
-from products.models import Product  # your existing product model
+from products.models import Product, ProductVariation
 
 User = settings.AUTH_USER_MODEL
 
@@ -18,11 +19,25 @@ class Cart(models.Model):
         max_length=255, null=True, blank=True, help_text="For guest carts"
     )
     is_active = models.BooleanField(default=True)
+
+    # Stored totals, shifted by every CartItem write (see cart.totals)
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    version = models.PositiveIntegerField(default=0, editable=False)  # +1 on every item write
+    coupon = models.ForeignKey(
+        "Coupon", on_delete=models.SET_NULL, null=True, blank=True, related_name="carts"
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-updated_at"]
+        indexes = [
+            # CartViewSet._get_cart / _get_or_create_cart lookups
+            models.Index(fields=["user", "is_active"], name="cart_user_active_idx"),
+            models.Index(fields=["session_id", "is_active"], name="cart_session_active_idx"),
+        ]
 
     def __str__(self):
         if self.user:
@@ -31,15 +46,24 @@ class Cart(models.Model):
 
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.item_count
 
     @property
     def total_price(self):
-        return sum(item.subtotal for item in self.items.all())
+        return self.subtotal
 
     def clear(self):
-        """Remove all items from the cart."""
-        self.items.all().delete()
+        """
+        Remove all items from the cart: one DELETE, then one UPDATE zeroing the
+        totals, instead of a per-line total shift from CartItem's post_delete.
+        """
+        with transaction.atomic():
+            items = CartItem.objects.filter(cart_id=self.pk)
+            items._raw_delete(items.db)  # nothing references cart lines, so no cascade is skipped
+            Cart.objects.filter(pk=self.pk).update(
+                item_count=0, subtotal=0, version=F("version") + 1, updated_at=timezone.now(),
+            )
+        self.item_count, self.subtotal = 0, 0
 
 
 class CartItem(models.Model):
@@ -53,6 +77,10 @@ class CartItem(models.Model):
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="cart_items"
     )
+    # A specific size / colour; without one the line is for the product itself
+    variation = models.ForeignKey(
+        ProductVariation, on_delete=models.CASCADE, related_name="cart_items", null=True, blank=True
+    )
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(
         max_digits=10, decimal_places=2,
@@ -61,10 +89,45 @@ class CartItem(models.Model):
     added_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
-        unique_together = ("cart", "product")
         ordering = ["-added_at"]
+        # One line per product and variation: NULLs never collide in a unique index,
+        # so product-only lines get their own partial constraint
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart", "product", "variation"],
+                condition=models.Q(variation__isnull=False),
+                name="cart_item_variation_unique",
+            ),
+            models.UniqueConstraint(
+                fields=["cart", "product"],
+                condition=models.Q(variation__isnull=True),
+                name="cart_item_product_unique",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so cart totals can be shifted by the delta on save
+        instance._loaded_cart_id = instance.__dict__.get("cart_id")
+        instance._loaded_quantity = instance.__dict__.get("quantity")
+        instance._loaded_price = instance.__dict__.get("price")
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and None in (
+            getattr(self, "_loaded_cart_id", None),
+            getattr(self, "_loaded_quantity", None),
+            getattr(self, "_loaded_price", None),
+        ):
+            # Loaded with cart, quantity or price deferred: read the stored values the delta starts from
+            stored = CartItem.objects.filter(pk=self.pk).values_list("cart_id", "quantity", "price").first()
+            self._loaded_cart_id, self._loaded_quantity, self._loaded_price = stored or (None, None, None)
+        super().save(*args, **kwargs)
 
     def __str__(self):
+        if self.variation_id:
+            return f"{self.quantity} × {self.variation}"
         return f"{self.quantity} × {self.product.name}"
 
     @property
@@ -72,12 +135,58 @@ class CartItem(models.Model):
         return self.price * self.quantity
 
 
+class ArchivedCart(models.Model):
+    """
+    Snapshot of an abandoned cart taken by `manage.py cleanup_carts` before the
+    cart is deleted, kept for abandoned-cart reporting.
+    """
+    cart_id = models.PositiveBigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="archived_carts")
+    item_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    lines = models.JSONField(default=list)  # [{"product_id", "variation_id", "quantity", "price"}, ...]
+    created_at = models.DateTimeField()  # of the cart
+    last_activity_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-archived_at"]
+
+    def __str__(self):
+        return f"Archived cart {self.cart_id} ({self.item_count} items)"
+
+
 class Coupon(models.Model):
     """
-    Optional: For applying discounts on carts or orders.
+    A discount code applied to a cart and redeemed at checkout.
+    Rules are evaluated in memory by cart.coupons; see CouponRegistry.
     """
-    code = models.CharField(max_length=50, unique=True)
+    PERCENT = "percent"
+    FIXED = "fixed"
+    TIERED = "tiered"
+    KIND_CHOICES = [
+        (PERCENT, "Percent off"),
+        (FIXED, "Fixed amount off"),
+        (TIERED, "Percent off by spend tier"),
+    ]
+
+    code = models.CharField(max_length=50, unique=True)  # stored normalized, see normalize_code
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=PERCENT)
     discount_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="For fixed coupons")
+    tiers = models.JSONField(
+        default=list, blank=True,
+        help_text='For tiered coupons: [{"min_subtotal": "100.00", "percent": "5"}, ...]',
+    )
+    min_subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # Scope: when set, only lines in these category subtrees / brands are discounted
+    categories = models.ManyToManyField("products.Category", blank=True, related_name="coupons")
+    brands = models.ManyToManyField("products.Brand", blank=True, related_name="coupons")
+
+    usage_limit = models.PositiveIntegerField(null=True, blank=True, help_text="Empty for unlimited")
+    times_used = models.PositiveIntegerField(default=0, editable=False)
+
     active = models.BooleanField(default=True)
     valid_from = models.DateTimeField()
     valid_to = models.DateTimeField()
@@ -88,6 +197,14 @@ class Coupon(models.Model):
     def __str__(self):
         return self.code
 
+    @staticmethod
+    def normalize_code(code):
+        return (code or "").strip().upper()
+
+    def save(self, *args, **kwargs):
+        self.code = self.normalize_code(self.code)
+        super().save(*args, **kwargs)
+
     def is_valid(self):
         now = timezone.now()
         return self.active and self.valid_from <= now <= self.valid_to
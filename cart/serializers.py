@@ -1,14 +1,62 @@
 from rest_framework import serializers
+from .coupons import cart_discount, registry as coupon_registry
+from .lines import add_line, resolve_lines
 from .models import Cart, CartItem, Coupon
-from products.serializers import ProductSerializer  # assuming you already have this
+from products.models import Product, ProductVariation
+from products.pricing import PriceResolver
+from products.serializers import EffectivePriceField, ProductSerializer
+
+
+class CartProductSerializer(serializers.ModelSerializer):
+    """
+    Product snapshot shown on a cart line.
+    Expects featured images prefetched into `featured_images`; see cart.views.cart_items_queryset.
+    """
+    image = serializers.SerializerMethodField()
+    in_stock = serializers.SerializerMethodField()
+    effective_price = EffectivePriceField()
+
+    class Meta:
+        model = Product
+        fields = [
+            "id", "slug", "name", "image", "price", "effective_price", "availability", "stock_quantity", "in_stock",
+        ]
+        read_only_fields = fields
+
+    def get_image(self, obj):
+        images = getattr(obj, "featured_images", None)
+        if images is None:
+            images = obj.images.filter(is_featured=True)[:1]
+        for image in images:
+            request = self.context.get("request")
+            return request.build_absolute_uri(image.image.url) if request else image.image.url
+        return None
+
+    def get_in_stock(self, obj):
+        return obj.is_active and obj.stock_quantity > 0
+
+
+class CartVariationSerializer(serializers.ModelSerializer):
+    """The variation a cart line is for, with its own price and stock."""
+    effective_price = EffectivePriceField()
+    in_stock = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductVariation
+        fields = ["id", "name", "sku", "price", "effective_price", "stock_quantity", "in_stock"]
+        read_only_fields = fields
+
+    def get_in_stock(self, obj):
+        return obj.is_active and obj.stock_quantity > 0
 
 
 class CartItemSerializer(serializers.ModelSerializer):
     """
     Serializer for a single Cart Item.
-    Includes product details and subtotal.
+    Includes a compact product snapshot, the variation (if any) and subtotal.
     """
-    product = ProductSerializer(read_only=True)  # nested product details
+    product = CartProductSerializer(read_only=True)
+    variation = serializers.SerializerMethodField()
     subtotal = serializers.ReadOnlyField()
 
     class Meta:
@@ -16,12 +64,25 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = [
             "id",
             "product",
+            "variation",
             "quantity",
             "price",
             "subtotal",
             "added_at",
         ]
 
+    def get_variation(self, obj):
+        if obj.variation_id is None:
+            return None
+        variation = obj.variation
+        variation.product = obj.product  # the line's product; pricing reads it, don't load it again
+        return CartVariationSerializer(variation, context=self.context).data
+
+
+class CartItemExpandedSerializer(CartItemSerializer):
+    """Cart line with full product details, for `?expand=product`."""
+    product = ProductSerializer(read_only=True)
+
 
 class CartItemCreateUpdateSerializer(serializers.ModelSerializer):
     """
@@ -29,40 +90,36 @@ class CartItemCreateUpdateSerializer(serializers.ModelSerializer):
     Used when client only sends product_id + quantity.
     """
     product_id = serializers.IntegerField(write_only=True)
+    variation_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
 
     class Meta:
         model = CartItem
-        fields = ["id", "product_id", "quantity"]
+        fields = ["id", "product_id", "variation_id", "quantity"]
 
     def validate_quantity(self, value):
         if value < 1:
             raise serializers.ValidationError("Quantity must be at least 1.")
         return value
 
+    def validate(self, attrs):
+        """
+        An added line is resolved and priced here (cart.lines), so a bad product
+        or variation is rejected before the view creates a session or a cart.
+        """
+        if self.instance is None:
+            resolved, errors = resolve_lines({0: attrs}, PriceResolver.for_request(self.context.get("request")))
+            if errors:
+                raise serializers.ValidationError(errors[0])
+            attrs["line"] = resolved[0]
+        return attrs
+
     def create(self, validated_data):
         """
-        Handles creation or update of a CartItem.
-        Ensures price snapshot is stored.
+        Handles creation or update of a CartItem; pass the cart to `save(cart=...)`.
+        Stores the effective unit price (products.pricing) as the line's price
+        snapshot; adding to an existing line refreshes it. See cart.lines.
         """
-        cart = self.context["cart"]
-        product_id = validated_data.pop("product_id")
-        quantity = validated_data.get("quantity", 1)
-
-        from products.models import Product
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
-            raise serializers.ValidationError({"product_id": "Invalid product."})
-
-        item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={"quantity": quantity, "price": product.price},
-        )
-        if not created:
-            item.quantity += quantity
-            item.save()
-        return item
+        return add_line(validated_data["cart"], validated_data["line"])
 
     def update(self, instance, validated_data):
         instance.quantity = validated_data.get("quantity", instance.quantity)
@@ -73,10 +130,17 @@ class CartItemCreateUpdateSerializer(serializers.ModelSerializer):
 class CartSerializer(serializers.ModelSerializer):
     """
     Full cart serializer with nested items, totals, and coupon support.
+    Lines carry a product snapshot; pass `expand_product` in the context for full products.
     """
-    items = CartItemSerializer(many=True, read_only=True)
-    total_items = serializers.ReadOnlyField()
-    total_price = serializers.ReadOnlyField()
+    items = serializers.SerializerMethodField()
+    # Stored on the cart row, kept current by item writes
+    total_items = serializers.ReadOnlyField(source="item_count")
+    total_price = serializers.ReadOnlyField(source="subtotal")
+    # Evaluated in memory from the applied coupon's compiled rules
+    coupon = serializers.SerializerMethodField()
+    discount = serializers.SerializerMethodField()
+    coupon_error = serializers.SerializerMethodField()
+    final_total = serializers.SerializerMethodField()
 
     class Meta:
         model = Cart
@@ -88,11 +152,87 @@ class CartSerializer(serializers.ModelSerializer):
             "items",
             "total_items",
             "total_price",
+            "coupon",
+            "discount",
+            "coupon_error",
+            "final_total",
+            "version",
             "created_at",
             "updated_at",
         ]
         read_only_fields = ["user", "session_id", "created_at", "updated_at"]
 
+    def _discount(self, obj):
+        if not hasattr(self, "_discounts"):
+            self._discounts = {}
+        if obj.pk not in self._discounts:
+            lines = obj.items.all() if obj.coupon_id else []
+            self._discounts[obj.pk] = cart_discount(obj.coupon_id, lines)
+        return self._discounts[obj.pk]
+
+    def get_coupon(self, obj):
+        coupon = coupon_registry.get_by_id(obj.coupon_id) if obj.coupon_id else None
+        return coupon.code if coupon else None
+
+    def get_discount(self, obj):
+        return self._discount(obj)[0]
+
+    def get_coupon_error(self, obj):
+        return self._discount(obj)[1]
+
+    def get_final_total(self, obj):
+        return obj.subtotal - self._discount(obj)[0]
+
+    def get_items(self, obj):
+        if obj.pk is None:  # guest cart that has not been created yet
+            return []
+        serializer_class = CartItemExpandedSerializer if self.context.get("expand_product") else CartItemSerializer
+        return serializer_class(obj.items.all(), many=True, context=self.context).data
+
+
+class CartSummarySerializer(serializers.ModelSerializer):
+    """Cart totals and version, returned with delta responses."""
+    total_items = serializers.ReadOnlyField(source="item_count")
+    total_price = serializers.ReadOnlyField(source="subtotal")
+
+    class Meta:
+        model = Cart
+        fields = ["id", "total_items", "total_price", "version", "updated_at"]
+        read_only_fields = fields
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """One operation of a batch: add a product, or update / remove a line."""
+    OPS = ("add", "update", "remove")
+
+    op = serializers.ChoiceField(choices=OPS)
+    product_id = serializers.IntegerField(required=False)
+    variation_id = serializers.IntegerField(required=False, allow_null=True)
+    item_id = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        required = {"add": ("product_id",), "update": ("item_id", "quantity"), "remove": ("item_id",)}[attrs["op"]]
+        missing = {name: "This field is required." for name in required if name not in attrs}
+        if missing:
+            raise serializers.ValidationError(missing)
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    ops = CartOperationSerializer(many=True, allow_empty=False, max_length=50)
+
+
+class AppliedCouponSerializer(serializers.Serializer):
+    """A compiled coupon (cart.coupons.CompiledCoupon) as returned by apply_coupon."""
+    id = serializers.IntegerField()
+    code = serializers.CharField()
+    kind = serializers.CharField()
+    discount_percent = serializers.DecimalField(source="percent", max_digits=5, decimal_places=2)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    min_subtotal = serializers.DecimalField(max_digits=10, decimal_places=2)
+    valid_to = serializers.DateTimeField()
+
 
 class CouponSerializer(serializers.ModelSerializer):
     """
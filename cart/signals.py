@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import bump_generation, track_generations
+
+from .models import Cart, CartItem, Coupon
+from .totals import apply_cart_delta
+
+
+# ----------------------------
+# ITEM -> CART TOTALS
+# ----------------------------
+@receiver(post_save, sender=CartItem)
+def cart_item_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    old_cart_id = getattr(instance, "_loaded_cart_id", None)
+    old_quantity = getattr(instance, "_loaded_quantity", None)
+    old_price = getattr(instance, "_loaded_price", None)
+
+    if created:
+        apply_cart_delta(instance.cart_id, instance.quantity, instance.subtotal)
+    elif old_cart_id != instance.cart_id:
+        apply_cart_delta(old_cart_id, -old_quantity, -old_price * old_quantity)
+        apply_cart_delta(instance.cart_id, instance.quantity, instance.subtotal)
+    elif (old_quantity, old_price) != (instance.quantity, instance.price):
+        apply_cart_delta(
+            instance.cart_id, instance.quantity - old_quantity, instance.subtotal - old_price * old_quantity,
+        )
+
+    instance._loaded_cart_id = instance.cart_id
+    instance._loaded_quantity = instance.quantity
+    instance._loaded_price = instance.price
+
+
+@receiver(post_delete, sender=CartItem)
+def cart_item_deleted(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Cart) or getattr(origin, "model", None) is Cart:
+        return  # the cart itself is being deleted
+    quantity = getattr(instance, "_loaded_quantity", None)
+    price = getattr(instance, "_loaded_price", None)
+    if quantity is None:
+        quantity, price = instance.quantity, instance.price
+    cart_id = getattr(instance, "_loaded_cart_id", None) or instance.cart_id
+    apply_cart_delta(cart_id, -quantity, -price * quantity)
+
+
+# ----------------------------
+# COUPON REGISTRY INVALIDATION
+# ----------------------------
+track_generations(Coupon)
+
+
+@receiver(m2m_changed, sender=Coupon.categories.through)
+@receiver(m2m_changed, sender=Coupon.brands.through)
+def coupon_scope_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(lambda: bump_generation(Coupon))
@@ -1,11 +1,19 @@
 from decimal import Decimal
+from io import StringIO
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
+from rest_framework.test import APIClient
 
-from products.models import Product
-from .models import Cart, CartItem, Coupon
+from products.models import Brand, Category, Product, ProductVariation
+from .coupons import CouponError, redeem_coupon, registry as coupon_registry
+from .models import ArchivedCart, Cart, CartItem, Coupon
 
 User = get_user_model()
 
@@ -14,18 +22,21 @@ class CartModelTest(TestCase):
 
     def setUp(self):
         self.user = User.objects.create_user(
-            username="testuser",
             email="test@example.com",
+            full_name="Test User",
             password="password123"
         )
+        self.category = Category.objects.create(name="Test Category")
 
         self.product1 = Product.objects.create(
             name="Test Product 1",
+            category=self.category,
             price=Decimal("100.00")
         )
 
         self.product2 = Product.objects.create(
             name="Test Product 2",
+            category=self.category,
             price=Decimal("50.00")
         )
 
@@ -48,6 +59,7 @@ class CartModelTest(TestCase):
             price=Decimal("50.00")
         )
 
+        self.cart.refresh_from_db()
         self.assertEqual(self.cart.total_items, 3)
 
     def test_cart_total_price(self):
@@ -64,6 +76,7 @@ class CartModelTest(TestCase):
             price=Decimal("50.00")
         )
 
+        self.cart.refresh_from_db()
         self.assertEqual(self.cart.total_price, Decimal("250.00"))
 
     def test_cart_clear(self):
@@ -77,18 +90,372 @@ class CartModelTest(TestCase):
         self.assertEqual(self.cart.items.count(), 1)
         self.cart.clear()
         self.assertEqual(self.cart.items.count(), 0)
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (0, 0))
+
+    def test_totals_follow_item_writes(self):
+        item = CartItem.objects.create(cart=self.cart, product=self.product1, quantity=2, price=Decimal("100.00"))
+        CartItem.objects.create(cart=self.cart, product=self.product2, quantity=1, price=Decimal("50.00"))
+
+        item = CartItem.objects.get(pk=item.pk)
+        item.quantity = 5
+        item.save()
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (6, Decimal("550.00")))
+
+        item.delete()
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (1, Decimal("50.00")))
+
+    def test_deferred_item_saves_shift_totals_by_the_change(self):
+        item = CartItem.objects.create(cart=self.cart, product=self.product1, quantity=2, price=Decimal("100.00"))
+
+        item = CartItem.objects.only("id").get(pk=item.pk)
+        item.quantity = 3
+        item.save()
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (3, Decimal("300.00")))
+
+    def test_clear_zeroes_totals_in_one_update(self):
+        CartItem.objects.create(cart=self.cart, product=self.product1, quantity=2, price=Decimal("100.00"))
+        CartItem.objects.create(cart=self.cart, product=self.product2, quantity=1, price=Decimal("50.00"))
+        self.cart.refresh_from_db()
+        version = self.cart.version
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.cart.clear()
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith(("UPDATE", "DELETE"))]
+        self.assertEqual(len(writes), 2)
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (0, 0))
+        self.assertEqual(self.cart.version, version + 1)
+        self.assertFalse(self.cart.items.exists())
+
+    def test_rebuild_command_repairs_drift(self):
+        CartItem.objects.create(cart=self.cart, product=self.product1, quantity=2, price=Decimal("100.00"))
+        Cart.objects.filter(pk=self.cart.pk).update(item_count=99, subtotal=1)
+
+        out = StringIO()
+        call_command("rebuild_cart_totals", stdout=out)
+        self.assertIn("Checked 1 cart(s), repaired 1.", out.getvalue())
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (2, Decimal("200.00")))
+
+    def test_summary_endpoint_reads_stored_totals(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(reverse("cart:cart-add-item"), {"product_id": self.product1.pk, "quantity": 2})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["total_items"], response.data["total_price"]), (2, Decimal("200.00")))
+
+        item_id = response.data["items"][0]["id"]
+        response = client.patch(reverse("cart:cart-manage-item", args=[item_id]), {"quantity": 3})
+        self.assertEqual((response.data["total_items"], response.data["total_price"]), (3, Decimal("300.00")))
+
+
+class CartPayloadTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="payload@example.com", full_name="Payload User", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="Test Category")
+        self.cart = Cart.objects.create(user=self.user)
+
+    def _add_lines(self, count):
+        for n in range(count):
+            product = Product.objects.create(
+                name=f"Line Product {self.cart.items.count()}", category=self.category,
+                price=Decimal("10.00"), stock_quantity=n,
+            )
+            CartItem.objects.create(cart=self.cart, product=product, quantity=1, price=product.price)
+
+    def _get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("cart:cart-detail"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_lines_carry_a_product_snapshot(self):
+        self._add_lines(2)
+        data, _ = self._get()
+        product = data["items"][0]["product"]
+        self.assertEqual(
+            set(product),
+            {"id", "slug", "name", "image", "price", "effective_price", "availability", "stock_quantity", "in_stock"},
+        )
+        self.assertEqual({line["product"]["in_stock"] for line in data["items"]}, {True, False})
+
+    def test_expand_returns_full_products(self):
+        self._add_lines(1)
+        data, _ = self._get(expand="product")
+        self.assertIn("description", data["items"][0]["product"])
+        self.assertEqual(data["items"][0]["product"]["category"]["subcategories"], [])
+
+    def test_queries_do_not_grow_with_lines(self):
+        self._add_lines(1)
+        _, few = self._get()
+        _, few_expanded = self._get(expand="product")
+        self._add_lines(5)
+        _, many = self._get()
+        _, many_expanded = self._get(expand="product")
+        self.assertEqual((few, few_expanded), (many, many_expanded))
+
+
+class CartDeltaTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="delta@example.com", full_name="Delta User", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name="Test Category")
+        self.shoe = Product.objects.create(name="Shoe", category=category, price=Decimal("40.00"), stock_quantity=5)
+        self.sock = Product.objects.create(name="Sock", category=category, price=Decimal("5.00"), stock_quantity=5)
+        self.cart = Cart.objects.create(user=self.user)
+        self.line = CartItem.objects.create(cart=self.cart, product=self.shoe, quantity=1, price=self.shoe.price)
+
+    def test_delta_returns_changed_line_and_totals(self):
+        url = reverse("cart:cart-add-item") + "?response=delta"
+        response = self.client.post(url, {"product_id": self.sock.pk, "quantity": 2}, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([line["product"]["id"] for line in response.data["items"]], [self.sock.pk])
+        self.assertEqual(response.data["removed"], [])
+        self.assertEqual(response.data["cart"]["total_items"], 3)
+        self.assertEqual(response.data["cart"]["total_price"], Decimal("50.00"))
+        self.assertEqual(response.data["cart"]["version"], 2)
+
+        url = reverse("cart:cart-manage-item", args=[self.line.pk]) + "?response=delta"
+        response = self.client.delete(url)
+        self.assertEqual((response.data["items"], response.data["removed"]), ([], [self.line.pk]))
+        self.assertEqual(response.data["cart"]["version"], 3)
+
+    def test_batch_applies_every_op(self):
+        response = self.client.post(reverse("cart:cart-batch") + "?response=delta", {"ops": [
+            {"op": "add", "product_id": self.sock.pk, "quantity": 3},
+            {"op": "update", "item_id": self.line.pk, "quantity": 2},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["items"]), 2)
+        self.assertEqual(response.data["cart"]["total_items"], 5)
+        self.assertEqual(response.data["cart"]["total_price"], Decimal("95.00"))
+
+    def test_batch_is_all_or_nothing(self):
+        response = self.client.post(reverse("cart:cart-batch"), {"ops": [
+            {"op": "add", "product_id": self.sock.pk},
+            {"op": "remove", "item_id": 999999},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("1", response.json()["ops"])
+        self.assertEqual(list(self.cart.items.values_list("product_id", flat=True)), [self.shoe.pk])
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.version), (1, 1))
+
+    def test_batch_ops_are_validated(self):
+        response = self.client.post(reverse("cart:cart-batch"), {"ops": [{"op": "update", "item_id": self.line.pk}]}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_variations_are_separate_lines(self):
+        small = ProductVariation.objects.create(product=self.shoe, name="40", price=Decimal("38.00"), sku="SHOE-40")
+        large = ProductVariation.objects.create(product=self.shoe, name="44", price=Decimal("42.00"), sku="SHOE-44")
+        url = reverse("cart:cart-add-item")
+        for variation in (small, large, small):
+            self.client.post(url, {"product_id": self.shoe.pk, "variation_id": variation.pk}, format="json")
+
+        lines = {line.variation_id: (line.quantity, line.price) for line in self.cart.items.all()}
+        self.assertEqual(lines, {
+            None: (1, Decimal("40.00")), small.pk: (2, Decimal("38.00")), large.pk: (1, Decimal("42.00")),
+        })
+        data = self.client.get(reverse("cart:cart-detail")).data
+        self.assertEqual({line["variation"]["name"] for line in data["items"] if line["variation"]}, {"40", "44"})
+
+    def test_variation_must_belong_to_the_product(self):
+        other = ProductVariation.objects.create(product=self.sock, name="M", price=Decimal("5.00"), sku="SOCK-M")
+        response = self.client.post(
+            reverse("cart:cart-add-item"), {"product_id": self.shoe.pk, "variation_id": other.pk}, format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("variation_id", response.json())
+
+    def test_batch_adds_look_products_up_once(self):
+        category = self.shoe.category
+        products = [
+            Product.objects.create(name=f"Batch {i}", category=category, price=Decimal("1.00")) for i in range(12)
+        ]
+        variation = ProductVariation.objects.create(product=products[0], name="L", price=Decimal("2.00"), sku="B-L")
+        ops = [{"op": "add", "product_id": product.pk} for product in products]
+        ops.append({"op": "add", "product_id": products[0].pk, "variation_id": variation.pk})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("cart:cart-batch") + "?response=delta", {"ops": ops}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["items"]), 13)
+        lookups = [q["sql"] for q in queries if 'FROM "products_product"' in q["sql"]]
+        self.assertEqual(len(lookups), 1)
+
+    def test_added_lines_snapshot_the_sale_price(self):
+        self.sock.discount_price = Decimal("4.00")
+        self.sock.save()
+        self.client.post(reverse("cart:cart-add-item"), {"product_id": self.sock.pk}, format="json")
+        self.assertEqual(self.cart.items.get(product=self.sock).price, Decimal("4.00"))
+
+        # Adding again re-prices the line once the sale is over
+        self.sock.sale_ends_at = timezone.now()
+        self.sock.save()
+        self.client.post(reverse("cart:cart-add-item"), {"product_id": self.sock.pk}, format="json")
+        line = self.cart.items.get(product=self.sock)
+        self.assertEqual((line.quantity, line.price), (2, Decimal("5.00")))
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, Decimal("50.00"))
+
+
+class CartCleanupTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="cleanup@example.com", full_name="Cleanup User", password="password123")
+        self.other = User.objects.create_user(email="other@example.com", full_name="Other User", password="password123")
+        self.product = Product.objects.create(
+            name="Cleanup Product", category=Category.objects.create(name="Test Category"), price=Decimal("20.00"),
+        )
+
+    def _cart(self, days_idle, **fields):
+        cart = Cart.objects.create(**fields)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2, price=self.product.price)
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now() - timedelta(days=days_idle))
+        return cart
+
+    def test_cleanup_deletes_and_archives_by_threshold(self):
+        checked_out = self._cart(40, user=self.user, is_active=False)
+        recent_checkout = self._cart(5, user=self.user, is_active=False)
+        guest = self._cart(40, session_id="abc")
+        abandoned = self._cart(120, user=self.user)
+        active = self._cart(10, user=self.other)
+
+        out = StringIO()
+        call_command("cleanup_carts", "--batch-size", "1", stdout=out)
+
+        self.assertEqual(set(Cart.objects.values_list("pk", flat=True)), {recent_checkout.pk, active.pk})
+        self.assertIn("Archived and deleted 1 abandoned cart(s).", out.getvalue())
+        archived = ArchivedCart.objects.get()
+        self.assertEqual((archived.cart_id, archived.user, archived.item_count), (abandoned.pk, self.user, 2))
+        self.assertEqual(
+            archived.lines, [{"product_id": self.product.pk, "variation_id": None, "quantity": 2, "price": "20.00"}],
+        )
+        self.assertFalse(CartItem.objects.filter(cart_id__in=[checked_out.pk, guest.pk, abandoned.pk]).exists())
+
+    def test_dry_run_and_overrides(self):
+        self._cart(40, session_id="abc")
+        out = StringIO()
+        call_command("cleanup_carts", "--dry-run", "--guest-days", "60", stdout=out)
+        self.assertIn("Would remove 0 guest cart(s).", out.getvalue())
+        call_command("cleanup_carts", "--dry-run", stdout=out)
+        self.assertIn("Would remove 1 guest cart(s).", out.getvalue())
+        self.assertEqual(Cart.objects.count(), 1)
+
+
+class CouponEngineTest(TestCase):
+
+    def setUp(self):
+        cache.clear()  # start from a fresh registry generation
+        self.user = User.objects.create_user(email="coupon@example.com", full_name="Coupon User", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.shoes = Category.objects.create(name="Shoes")
+        self.trail = Category.objects.create(name="Trail", parent=self.shoes)
+        self.socks = Category.objects.create(name="Socks")
+        self.acme = Brand.objects.create(name="Acme")
+        self.boot = Product.objects.create(name="Boot", category=self.trail, brand=self.acme, price=Decimal("80.00"))
+        self.sock = Product.objects.create(name="Sock", category=self.socks, price=Decimal("20.00"))
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.boot, quantity=1, price=self.boot.price)
+        CartItem.objects.create(cart=self.cart, product=self.sock, quantity=1, price=self.sock.price)
+
+    def _coupon(self, code="save", **fields):
+        now = timezone.now()
+        return Coupon.objects.create(
+            code=code, valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1), **fields
+        )
+
+    def _apply(self, code):
+        return self.client.post(reverse("cart:cart-apply-coupon"), {"code": code}, format="json")
+
+    def test_percent_coupon_is_applied_and_persisted(self):
+        self._coupon(discount_percent=Decimal("10"))
+        response = self._apply("  Save ")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["discount"], response.data["final_total"]), (Decimal("10.00"), Decimal("90.00")))
+        detail = self.client.get(reverse("cart:cart-detail")).data
+        self.assertEqual((detail["coupon"], detail["discount"], detail["final_total"]), ("SAVE", Decimal("10.00"), Decimal("90.00")))
+
+    def test_rule_kinds(self):
+        lines = list(self.cart.items.select_related("product__category"))
+        cases = [
+            ({"kind": Coupon.FIXED, "amount": Decimal("500")}, Decimal("100.00")),  # capped at the cart
+            ({"kind": Coupon.TIERED, "tiers": [{"min_subtotal": "50", "percent": "5"}, {"min_subtotal": "100", "percent": "15"}]}, Decimal("15.00")),
+            ({"kind": Coupon.TIERED, "tiers": [{"min_subtotal": "500", "percent": "50"}]}, Decimal("0.00")),
+        ]
+        for index, (fields, expected) in enumerate(cases):
+            with self.captureOnCommitCallbacks(execute=True):
+                self._coupon(code=f"kind{index}", **fields)
+            self.assertEqual(coupon_registry.get(f"kind{index}").discount(lines), expected, fields)
+
+    def test_scoped_coupons_only_discount_matching_lines(self):
+        lines = list(self.cart.items.select_related("product__category"))
+        by_category = self._coupon(code="shoes", discount_percent=Decimal("50"))
+        by_category.categories.add(self.shoes)  # covers the Trail subcategory
+        by_brand = self._coupon(code="acme", discount_percent=Decimal("25"))
+        by_brand.brands.add(self.acme)
+
+        self.assertEqual(coupon_registry.get("shoes").discount(lines), Decimal("40.00"))
+        self.assertEqual(coupon_registry.get("acme").discount(lines), Decimal("20.00"))
+
+    def test_invalid_coupons_are_rejected(self):
+        self._coupon(code="big", discount_percent=Decimal("10"), min_subtotal=Decimal("500"))
+        self._coupon(code="used", discount_percent=Decimal("10"), usage_limit=0)
+        self._coupon(code="gone", discount_percent=Decimal("10"), active=False)
+
+        for code in ("nope", "big", "used", "gone"):
+            response = self._apply(code)
+            self.assertEqual(response.status_code, 400, code)
+        self.cart.refresh_from_db()
+        self.assertIsNone(self.cart.coupon_id)
+
+    def test_lookup_is_a_dict_hit_until_a_coupon_changes(self):
+        coupon = self._coupon(discount_percent=Decimal("10"))
+        coupon_registry.get("save")
+        with self.assertNumQueries(0):
+            self.assertEqual(coupon_registry.get("SAVE").percent, Decimal("10"))
+
+        coupon.discount_percent = Decimal("30")
+        with self.captureOnCommitCallbacks(execute=True):  # the registry is invalidated on commit
+            coupon.save()
+        self.assertEqual(coupon_registry.get("save").percent, Decimal("30"))
+
+    def test_redemption_respects_usage_limit(self):
+        coupon = self._coupon(discount_percent=Decimal("10"), usage_limit=2)
+        redeem_coupon(coupon.pk)
+        redeem_coupon(coupon.pk)
+        with self.assertRaises(CouponError):
+            redeem_coupon(coupon.pk)
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.times_used, 2)
 
 
 class CartItemModelTest(TestCase):
 
     def setUp(self):
         self.user = User.objects.create_user(
-            username="itemuser",
+            email="item@example.com",
+            full_name="Item User",
             password="password123"
         )
 
         self.product = Product.objects.create(
             name="Cart Item Product",
+            category=Category.objects.create(name="Test Category"),
             price=Decimal("75.00")
         )
 
@@ -117,10 +484,89 @@ class CartItemModelTest(TestCase):
 
 class GuestCartTest(TestCase):
 
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name="Test Category")
+        self.shoe = Product.objects.create(name="Shoe", category=category, price=Decimal("40.00"), stock_quantity=5)
+        self.sock = Product.objects.create(name="Sock", category=category, price=Decimal("5.00"), stock_quantity=5)
+        self.user = User.objects.create_user(email="guest@example.com", full_name="Guest User", password="password123")
+
+    def _login(self):
+        return self.client.post(
+            reverse("accounts:login"), {"email": "guest@example.com", "password": "password123"}, format="json",
+        )
+
     def test_guest_cart_str(self):
         cart = Cart.objects.create(session_id="test-session-id")
         self.assertIn("Guest", str(cart))
 
+    def test_browsing_creates_no_cart_or_session(self):
+        response = self.client.get(reverse("cart:cart-detail"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["id"], response.data["items"], response.data["total_items"]), (None, [], 0))
+        self.assertFalse(Cart.objects.exists())
+        self.assertNotIn("sessionid", response.cookies)
+
+    def test_first_item_creates_the_guest_cart(self):
+        self.client.post(reverse("cart:cart-add-item"), {"product_id": self.shoe.pk, "quantity": 1}, format="json")
+
+        cart = Cart.objects.get()
+        self.assertIsNone(cart.user)
+        self.assertEqual(self.client.get(reverse("cart:cart-detail")).data["id"], cart.pk)
+
+    def test_rejected_writes_create_no_cart_or_session(self):
+        add = self.client.post(reverse("cart:cart-add-item"), {"product_id": 999, "quantity": 1}, format="json")
+        batch = self.client.post(reverse("cart:cart-batch"), {"ops": [
+            {"op": "add", "product_id": self.shoe.pk, "quantity": 1},
+            {"op": "remove", "item_id": 1},
+        ]}, format="json")
+
+        self.assertEqual((add.status_code, batch.status_code), (400, 400))
+        self.assertEqual(batch.json()["ops"], {"1": {"item_id": "Invalid item."}})
+        self.assertFalse(Cart.objects.exists())
+        self.assertNotIn("sessionid", add.cookies)
+        self.assertNotIn("sessionid", batch.cookies)
+
+    def test_login_merges_guest_lines_into_user_cart(self):
+        user_cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=user_cart, product=self.shoe, quantity=1, price=self.shoe.price)
+        self.client.post(reverse("cart:cart-batch"), {"ops": [
+            {"op": "add", "product_id": self.shoe.pk, "quantity": 2},
+            {"op": "add", "product_id": self.sock.pk, "quantity": 1},
+        ]}, format="json")
+
+        self.assertEqual(self._login().status_code, 200)
+
+        self.assertEqual(Cart.objects.get(), user_cart)
+        self.assertEqual(
+            dict(user_cart.items.values_list("product_id", "quantity")), {self.shoe.pk: 3, self.sock.pk: 1},
+        )
+        user_cart.refresh_from_db()
+        self.assertEqual((user_cart.item_count, user_cart.subtotal), (4, Decimal("125.00")))
+
+    def test_login_without_user_cart_adopts_the_guest_cart(self):
+        self.client.post(reverse("cart:cart-add-item"), {"product_id": self.sock.pk}, format="json")
+        self._login()
+
+        cart = Cart.objects.get()
+        self.assertEqual((cart.user, cart.session_id, cart.item_count), (self.user, None, 1))
+
+    def test_purge_removes_only_stale_guest_carts(self):
+        stale = Cart.objects.create(session_id="stale")
+        CartItem.objects.create(cart=stale, product=self.shoe, quantity=1, price=self.shoe.price)
+        fresh = Cart.objects.create(session_id="fresh")
+        owned = Cart.objects.create(user=self.user)
+        old = timezone.now() - timedelta(days=60)
+        Cart.objects.filter(pk__in=[stale.pk, owned.pk]).update(updated_at=old)
+
+        out = StringIO()
+        call_command("purge_guest_carts", "--batch-size", "1", stdout=out)
+
+        self.assertIn("Deleted 1 guest cart(s).", out.getvalue())
+        self.assertEqual(set(Cart.objects.values_list("pk", flat=True)), {fresh.pk, owned.pk})
+        self.assertFalse(CartItem.objects.exists())
+
 
 class CouponModelTest(TestCase):
 
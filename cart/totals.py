@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Cart, CartItem
+
+
+def apply_cart_delta(cart_id, count_delta, subtotal_delta):
+    """
+    Shift a cart's stored item_count / subtotal in a single UPDATE, so concurrent
+    item writes never read-modify-write stale totals. Also bumps the cart version
+    clients compare to know their copy is stale, and marks the cart as touched.
+    """
+    return Cart.objects.filter(pk=cart_id).update(
+        item_count=F("item_count") + count_delta,
+        subtotal=F("subtotal") + subtotal_delta,
+        version=F("version") + 1,
+        updated_at=timezone.now(),
+    )
+
+
+def recalculate_cart_totals(cart_id):
+    """Set one cart's totals from its items (after writes that skip the item signals)."""
+    totals = CartItem.objects.filter(cart_id=cart_id).aggregate(
+        count=Sum("quantity"), total=Sum(F("price") * F("quantity")),
+    )
+    return Cart.objects.filter(pk=cart_id).update(
+        item_count=totals["count"] or 0,
+        subtotal=totals["total"] or 0,
+        version=F("version") + 1,
+        updated_at=timezone.now(),
+    )
+
+
+def rebuild_cart_totals(batch_size=500):
+    """
+    Recompute item_count / subtotal for every cart from its items and fix the ones that drifted.
+    Walks carts in primary-key batches: one aggregate query + one bulk_update per batch.
+    Returns (carts checked, carts repaired).
+    """
+    checked = repaired = 0
+    last_id = 0
+    while True:
+        carts = list(
+            Cart.objects.filter(pk__gt=last_id)
+            .order_by("pk")
+            .only("pk", "item_count", "subtotal", "version")[:batch_size]
+        )
+        if not carts:
+            break
+
+        totals = {
+            row["cart_id"]: (row["count"], row["total"])
+            for row in CartItem.objects.filter(cart_id__in=[cart.pk for cart in carts])
+            .values("cart_id")
+            .annotate(count=Sum("quantity"), total=Sum(F("price") * F("quantity")))
+            .order_by()
+        }
+
+        drifted = []
+        for cart in carts:
+            count, total = totals.get(cart.pk, (0, Decimal("0")))
+            if (cart.item_count, cart.subtotal) != (count, total):
+                cart.item_count, cart.subtotal = count, total
+                cart.version += 1
+                drifted.append(cart)
+        Cart.objects.bulk_update(drifted, ["item_count", "subtotal", "version"])
+
+        checked += len(carts)
+        repaired += len(drifted)
+        last_id = carts[-1].pk
+    return checked, repaired
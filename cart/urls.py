@@ -12,6 +12,8 @@ urlpatterns = [
         "patch": "update_item",
         "delete": "remove_item",
     }), name="cart-manage-item"),
+    path("cart/batch/", CartViewSet.as_view({"post": "batch"}), name="cart-batch"),
     path("cart/clear/", CartViewSet.as_view({"post": "clear"}), name="cart-clear"),
     path("cart/apply-coupon/", CartViewSet.as_view({"post": "apply_coupon"}), name="cart-apply-coupon"),
+    path("cart/remove-coupon/", CartViewSet.as_view({"post": "remove_coupon"}), name="cart-remove-coupon"),
 ]
@@ -1,106 +1,273 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny
+from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 
-from .models import Cart, CartItem, Coupon
+from products.categories import children_map, subtree_q
+from products.models import Category, ProductImage
+from products.pricing import PriceResolver
+from .coupons import CouponError, registry as coupon_registry
+from .lines import add_line, resolve_lines
+from .models import Cart, CartItem
 from .serializers import (
+    AppliedCouponSerializer,
     CartSerializer,
     CartItemSerializer,
     CartItemCreateUpdateSerializer,
-    CouponSerializer,
+    CartBatchSerializer,
+    CartSummarySerializer,
 )
 
 
+def cart_items_queryset(expand_product=False):
+    """
+    Cart lines with everything their serializer and the coupon rules read: products in the same query,
+    featured images in one more. Full products (`?expand=product`) also prefetch
+    what ProductSerializer nests.
+    """
+    # product__category: scoped coupons match lines on the category path
+    queryset = CartItem.objects.select_related("product__category", "variation")
+    if expand_product:
+        return queryset.select_related("product__brand").prefetch_related(
+            "product__images", "product__variations", "product__reviews__user",
+        )
+    return queryset.prefetch_related(
+        Prefetch(
+            "product__images",
+            queryset=ProductImage.objects.filter(is_featured=True),
+            to_attr="featured_images",
+        )
+    )
+
+
 class CartViewSet(viewsets.ViewSet):
     """
     Cart endpoints:
     - GET /api/cart/ -> retrieve current cart (user or guest)
-    - POST /api/cart/items/ -> add item
+    - POST /api/cart/items/ -> add item (a product, or one of its variations via variation_id)
     - PATCH /api/cart/items/<id>/ -> update quantity
     - DELETE /api/cart/items/<id>/ -> remove item
+    - POST /api/cart/batch/ -> apply several add/update/remove ops atomically
     - POST /api/cart/clear/ -> empty the cart
+
+    Lines carry a compact product snapshot; `?expand=product` returns full products.
+    Mutations called with `?response=delta` return only the changed lines,
+    removed line ids and the cart totals/version instead of the whole cart.
+
+    Guests get a session and a Cart row only when they first add something;
+    until then reads return an empty, unsaved cart (see `_get_cart`).
     """
 
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [AllowAny]
+
+    def _get_cart(self, request, lock=False):
+        """
+        The current active cart, or an unsaved empty one. Never creates a session or a row.
+        `lock` selects it for update, as `_get_or_create_cart` does.
+        """
+        carts = Cart.objects.select_for_update() if lock else Cart.objects
+        if request.user.is_authenticated:
+            owner = {"user": request.user}
+        elif request.session.session_key:
+            owner = {"session_id": request.session.session_key, "user": None}
+        else:
+            return Cart()
+        return carts.filter(is_active=True, **owner).first() or Cart(**owner)
 
     def _get_or_create_cart(self, request):
-        """Get existing cart or create one for user or guest."""
+        """
+        Get existing cart or create one for user or guest. Only used by writes that
+        add lines, once they are validated, inside their transaction: the cart row stays locked until it
+        ends, so concurrent writes that read lines before changing them (merging
+        an add, a batch) queue up instead of losing each other's quantities.
+        """
+        carts = Cart.objects.select_for_update()
         if request.user.is_authenticated:
-            cart, _ = Cart.objects.get_or_create(user=request.user, is_active=True)
+            cart, _ = carts.get_or_create(user=request.user, is_active=True)
         else:
             session_id = request.session.session_key
             if not session_id:
                 request.session.create()
                 session_id = request.session.session_key
-            cart, _ = Cart.objects.get_or_create(session_id=session_id, is_active=True)
+            cart, _ = carts.get_or_create(session_id=session_id, is_active=True)
         return cart
 
+    def _cart_data(self, request, cart, refresh=True):
+        if refresh:
+            # Item writes shift the stored totals in SQL; re-read them before serializing
+            cart.refresh_from_db(fields=["item_count", "subtotal", "version", "updated_at"])
+        expand_product = "product" in request.query_params.get("expand", "").split(",")
+        if cart.pk:
+            prefetch_related_objects([cart], Prefetch("items", queryset=cart_items_queryset(expand_product)))
+        context = {"request": request, "expand_product": expand_product}
+        if expand_product:
+            # Nested categories list their subcategories: read every line's subtree in one query
+            paths = {item.product.category.path for item in cart.items.all()}
+            if paths:
+                context["category_children"] = children_map(
+                    Category.objects.filter(subtree_q(paths), is_active=True).order_by("name")
+                )
+        return CartSerializer(cart, context=context).data
+
+    def _delta_data(self, request, cart, changed=(), removed=()):
+        cart.refresh_from_db(fields=["item_count", "subtotal", "version", "updated_at"])
+        items = cart_items_queryset().filter(cart=cart, pk__in=changed)
+        return {
+            "items": CartItemSerializer(items, many=True, context={"request": request}).data,
+            "removed": sorted(removed),
+            "cart": CartSummarySerializer(cart).data,
+        }
+
+    def _mutation_response(self, request, cart, changed=(), removed=(), status_code=status.HTTP_200_OK):
+        if request.query_params.get("response") == "delta":
+            return Response(self._delta_data(request, cart, changed, removed), status=status_code)
+        return Response(self._cart_data(request, cart), status=status_code)
+
     def list(self, request):
         """Return the current cart."""
-        cart = self._get_or_create_cart(request)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        cart = self._get_cart(request)
+        return Response(self._cart_data(request, cart, refresh=False))
 
     @action(detail=False, methods=["post"], url_path="items")
     def add_item(self, request):
         """Add item to cart (or increase quantity)."""
-        cart = self._get_or_create_cart(request)
-        serializer = CartItemCreateUpdateSerializer(
-            data=request.data, context={"cart": cart}
-        )
+        serializer = CartItemCreateUpdateSerializer(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED)
+        with transaction.atomic():
+            cart = self._get_or_create_cart(request)
+            item = serializer.save(cart=cart)
+        return self._mutation_response(request, cart, changed=[item.pk], status_code=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=["patch"], url_path="items/(?P<pk>[^/.]+)")
     def update_item(self, request, pk=None):
         """Update quantity of an item in the cart."""
-        cart = self._get_or_create_cart(request)
-        item = get_object_or_404(CartItem, id=pk, cart=cart)
+        cart = self._get_cart(request)
+        item = get_object_or_404(CartItem, id=pk, cart_id=cart.pk)
         serializer = CartItemCreateUpdateSerializer(
-            item, data=request.data, partial=True, context={"cart": cart}
+            item, data=request.data, partial=True, context={"request": request}
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        return Response(CartSerializer(cart).data)
+        return self._mutation_response(request, cart, changed=[item.pk])
 
     @action(detail=False, methods=["delete"], url_path="items/(?P<pk>[^/.]+)")
     def remove_item(self, request, pk=None):
         """Remove item from the cart."""
-        cart = self._get_or_create_cart(request)
-        item = get_object_or_404(CartItem, id=pk, cart=cart)
+        cart = self._get_cart(request)
+        item = get_object_or_404(CartItem, id=pk, cart_id=cart.pk)
+        item_id = item.pk
         item.delete()
-        return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+        return self._mutation_response(request, cart, removed=[item_id])
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        Apply several operations in one transaction:
+        {"ops": [{"op": "add", "product_id": 1, "variation_id": 4, "quantity": 2},
+                 {"op": "update", "item_id": 7, "quantity": 3},
+                 {"op": "remove", "item_id": 8}]}
+        If any op fails nothing is applied and the errors are keyed by op index.
+        Every added product / variation is validated and priced in one lookup,
+        and the cart's lines are read once.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ops = serializer.validated_data["ops"]
+
+        adds, errors = resolve_lines(
+            {index: op for index, op in enumerate(ops) if op["op"] == "add"}, PriceResolver.for_request(request),
+        )
+        if errors:
+            raise ValidationError({"ops": errors})
+
+        changed, removed = set(), set()
+        with transaction.atomic():
+            cart = self._get_cart(request, lock=True)
+            if not cart.pk:
+                # Without a cart every update / remove names an unknown line: fail before creating one
+                stray = next((index for index, op in enumerate(ops) if op["op"] != "add"), None)
+                if stray is not None:
+                    raise ValidationError({"ops": {stray: {"item_id": "Invalid item."}}})
+                cart = self._get_or_create_cart(request)
+            lines = {line.pk: line for line in CartItem.objects.filter(cart=cart)}
+            existing = {(line.product_id, line.variation_id): line for line in lines.values()}
+            for index, op in enumerate(ops):
+                try:
+                    item_id = self._apply_op(request, cart, op, adds.get(index), lines, existing)
+                except ValidationError as exc:
+                    raise ValidationError({"ops": {index: exc.detail}})
+                if op["op"] == "remove":
+                    changed.discard(item_id)
+                    removed.add(item_id)
+                else:
+                    changed.add(item_id)
+                    removed.discard(item_id)
+        return self._mutation_response(request, cart, changed=changed, removed=removed)
+
+    def _apply_op(self, request, cart, op, resolved, lines, existing):
+        """
+        Apply one batch op and return the line id. `lines` ({id: CartItem}) and
+        `existing` ({(product_id, variation_id): CartItem}) are the cart's lines, kept current.
+        """
+        if op["op"] == "add":
+            item = add_line(cart, resolved, existing)
+            lines[item.pk] = item
+            return item.pk
+
+        item = lines.get(op["item_id"])
+        if item is None:
+            raise ValidationError({"item_id": "Invalid item."})
+        if op["op"] == "remove":
+            del lines[op["item_id"]], existing[(item.product_id, item.variation_id)]
+            item.delete()
+            return op["item_id"]
+        serializer = CartItemCreateUpdateSerializer(
+            item, data={"quantity": op["quantity"]}, partial=True, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return item.pk
 
     @action(detail=False, methods=["post"])
     def clear(self, request):
         """Empty the cart."""
-        cart = self._get_or_create_cart(request)
-        cart.clear()
+        cart = self._get_cart(request)
+        if cart.pk:
+            cart.clear()
         return Response({"message": "Cart cleared."}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["post"])
     def apply_coupon(self, request):
-        """Apply a coupon code to the cart."""
+        """Apply a coupon code to the cart; it stays applied and is redeemed at checkout."""
         code = request.data.get("code")
-        cart = self._get_or_create_cart(request)
+        cart = self._get_cart(request)
+        if not cart.pk:
+            return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            coupon = Coupon.objects.get(code__iexact=code)
-        except Coupon.DoesNotExist:
-            return Response({"error": "Invalid coupon code"}, status=status.HTTP_400_BAD_REQUEST)
-
-        if not coupon.is_valid():
-            return Response({"error": "Coupon is expired or inactive"}, status=status.HTTP_400_BAD_REQUEST)
-
-        discount = (cart.total_price * coupon.discount_percent) / 100
-        discounted_total = cart.total_price - discount
+            coupon = coupon_registry.get(code)
+            discount = coupon.discount(list(cart_items_queryset().filter(cart=cart)))
+        except CouponError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
+        cart.coupon_id = coupon.id
+        cart.save(update_fields=["coupon", "updated_at"])
         return Response({
-            "cart": CartSerializer(cart).data,
-            "coupon": CouponSerializer(coupon).data,
+            "cart": self._cart_data(request, cart, refresh=False),
+            "coupon": AppliedCouponSerializer(coupon).data,
             "discount": discount,
-            "final_total": discounted_total,
+            "final_total": cart.subtotal - discount,
         })
+
+    @action(detail=False, methods=["post"])
+    def remove_coupon(self, request):
+        """Take the applied coupon off the cart."""
+        cart = self._get_cart(request)
+        if cart.pk and cart.coupon_id:
+            cart.coupon = None
+            cart.save(update_fields=["coupon", "updated_at"])
+        return Response(self._cart_data(request, cart, refresh=False))
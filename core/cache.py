@@ -0,0 +1,201 @@
+"""
+Generation-versioned response caching for anonymous catalog reads.
+
+Every cached model has a generation counter in the cache (`gen:<app.model>`).
+Writes bump the counter once their transaction commits (see
+`track_generations`), and response cache keys embed the current generations
+of the models a view depends on, so one increment orphans every cached
+response built from the old data; nothing is ever searched for or deleted,
+and stale entries simply expire.
+
+Counters start from a timestamp rather than 1, so an evicted counter never
+comes back at a value an older cached response was keyed with. Next to each
+counter the time of the last bump (`gen-at:<app.model>`) is kept for
+Last-Modified headers, in whole seconds rounded up and never ahead of the
+clock; writes within one second share a date, and the ETag (which carries the
+generation) tells them apart. A lost timestamp restarts at "now", which only
+costs clients one full download.
+"""
+import hashlib
+import math
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+GENERATION_PREFIX = "gen:"
+MODIFIED_PREFIX = "gen-at:"
+RESPONSE_PREFIX = "response:"
+
+
+def _generation_key(model):
+    return f"{GENERATION_PREFIX}{model._meta.label_lower}"
+
+
+def _modified_key(model):
+    return f"{MODIFIED_PREFIX}{model._meta.label_lower}"
+
+
+def _get_or_seed(keys, seed):
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, seed(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def get_generations(models):
+    """Current generation of each model, in the order given (one cache round-trip)."""
+    return _get_or_seed([_generation_key(model) for model in models], time.time_ns)
+
+
+def _now_seconds():
+    return math.ceil(time.time())
+
+
+def get_last_modified(models):
+    """UTC datetime of the latest write to any of `models`."""
+    stamps = _get_or_seed([_modified_key(model) for model in models], _now_seconds)
+    return datetime.fromtimestamp(max(stamps, default=0), tz=timezone.utc)
+
+
+def bump_generation(*models):
+    """Invalidate every cached response built from `models`. Call after bulk writes that skip signals."""
+    for model in models:
+        key = _generation_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+        _stamp_modified(model)
+
+
+def _stamp_modified(model):
+    key, now = _modified_key(model), _now_seconds()
+    # Already at this second: keep it rather than run ahead of the clock
+    if (cache.get(key) or 0) < now:
+        cache.set(key, now, timeout=None)
+
+
+def _bump_sender(sender, raw=False, **kwargs):
+    # Bumping before commit would let a concurrent read re-cache the old rows under the new generation
+    if not raw:
+        transaction.on_commit(lambda: bump_generation(sender))
+
+
+def track_generations(*models):
+    """Bump a model's generation after every committed save/delete. Called from AppConfig.ready()."""
+    for model in models:
+        uid = f"track-generation:{model._meta.label_lower}"
+        post_save.connect(_bump_sender, sender=model, dispatch_uid=uid)
+        post_delete.connect(_bump_sender, sender=model, dispatch_uid=uid)
+
+
+def normalized_query(query_params):
+    """Query string with keys sorted, repeated values sorted and empty values dropped."""
+    parts = []
+    for name in sorted(query_params):
+        for value in sorted(v for v in query_params.getlist(name) if v != ""):
+            parts.append(f"{name}={value}")
+    return "&".join(parts)
+
+
+# ----------------------------
+# VIEW MIXINS
+# ----------------------------
+class CachedResponseMixin:
+    """
+    Cache anonymous `list` / `retrieve` responses of a DRF view.
+
+    Set `cache_models` to every model the response is built from. The key covers
+    host, path, normalized query params and those models' generations.
+    Authenticated requests always hit the database (staff may see inactive rows).
+    """
+    cache_models = ()
+    cache_timeout = None  # falls back to settings.RESPONSE_CACHE_TIMEOUT
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return getattr(settings, "RESPONSE_CACHE_TIMEOUT", 600)
+
+    def get_response_cache_key(self, request):
+        generations = get_generations(self.cache_models)
+        raw = "|".join([
+            request.get_host(),
+            request.path,
+            normalized_query(request.query_params),
+            ",".join(str(generation) for generation in generations),
+        ])
+        return f"{RESPONSE_PREFIX}{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.get_cache_timeout())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """
+    Answer `If-None-Match` / `If-Modified-Since` on `list` / `retrieve` with 304.
+
+    The ETag hashes path, query, renderer, audience and the generations of
+    `cache_models`; Last-Modified is the latest bump of those models. Both come
+    from the cache, so a 304 costs no database queries and no serialization.
+    Place it before CachedResponseMixin so revalidations short-circuit first.
+    """
+    cache_models = ()
+
+    def get_etag(self, request):
+        raw = "|".join([
+            request.get_host(),
+            request.path,
+            normalized_query(request.query_params),
+            getattr(request.accepted_renderer, "format", ""),
+            # staff may see inactive rows
+            "staff" if request.user.is_staff else "public",
+            ",".join(str(generation) for generation in get_generations(self.cache_models)),
+        ])
+        return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        # Rounded up: a Last-Modified earlier than the write would let it pass If-Modified-Since
+        last_modified = math.ceil(get_last_modified(self.cache_models).timestamp())
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
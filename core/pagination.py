@@ -0,0 +1,180 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by the sort-key values of the last row served instead of an
+OFFSET, so page N costs the same as page 1. The sort keys are read from the
+queryset's final ordering (whatever the view, `sort` param or OrderingFilter
+produced) and the primary key is appended as a tie-breaker, in the direction of
+the last sort key so a single (key, id) index can be scanned either way. Sort
+keys must be non-null columns or annotations. Cursor values are converted back
+with each key's field (`to_python()`), so a tampered cursor is a 404, not a 500.
+"""
+import base64
+import hashlib
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()  # keeps microseconds, unlike DjangoJSONEncoder
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    # `?count=false` skips the COUNT(*) for clients that only need "next"
+    count_query_param = "count"
+    include_count = True
+    invalid_cursor_message = "Invalid cursor."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        self.key_fields = self.get_key_fields(queryset)
+        self.count = self.get_count(queryset, request)
+
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.build_keyset_filter(cursor))
+
+        rows = list(queryset.order_by(*self.ordering)[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        payload = {}
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["next"] = self.get_next_link()
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["next", "results"],
+            "properties": {
+                "count": {"type": "integer"},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    # ----------------------------
+    # Ordering / keyset
+    # ----------------------------
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        fields = [field for field in ordering if isinstance(field, str)]
+        if len(fields) != len(ordering):
+            raise TypeError("KeysetPagination only supports ordering by field or annotation names.")
+        if not any(field.lstrip("-") in ("pk", "id") for field in fields):
+            fields.append("-pk" if fields and fields[-1].startswith("-") else "pk")
+        return fields
+
+    def get_key_fields(self, queryset):
+        """The model field, or annotation output field, behind each sort key."""
+        fields = []
+        for key in self.ordering:
+            name = key.lstrip("-")
+            if name in queryset.query.annotations:
+                fields.append(queryset.query.annotations[name].output_field)
+                continue
+            model = queryset.model
+            for part in name.split("__"):
+                field = model._meta.pk if part == "pk" else model._meta.get_field(part)
+                model = field.related_model or model
+            fields.append(field)
+        return fields
+
+    def build_keyset_filter(self, values):
+        """(k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... honouring each key's direction."""
+        keyset = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            keyset |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return keyset
+
+    def get_key_values(self, obj):
+        values = []
+        for field in self.ordering:
+            value = obj
+            for part in field.lstrip("-").split("__"):
+                value = getattr(value, part)
+            values.append(_encode_value(value))
+        return values
+
+    # ----------------------------
+    # Cursor encoding
+    # ----------------------------
+    def ordering_signature(self):
+        return hashlib.sha1(",".join(self.ordering).encode()).hexdigest()[:8]
+
+    def encode_cursor(self, values):
+        raw = json.dumps({"o": self.ordering_signature(), "v": values}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            cursor = json.loads(raw)
+            values = cursor["v"]
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        # A cursor minted for another sort order cannot be resumed
+        if cursor.get("o") != self.ordering_signature() or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = [field.to_python(value) for field, value in zip(self.key_fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in values:  # sort keys are non-null
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.get_key_values(self.page[-1])))
+
+    # ----------------------------
+    # Sizes
+    # ----------------------------
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_count(self, queryset, request):
+        flag = request.query_params.get(self.count_query_param)
+        if flag is None:
+            enabled = self.include_count
+        else:
+            enabled = flag.lower() not in ("0", "false", "no")
+        return queryset.count() if enabled else None
@@ -169,6 +169,36 @@ REST_FRAMEWORK = {
 }
 
 
+# Caching
+# Response cache generations must be shared by every worker, so production
+# points REDIS_URL at a shared Redis; without it Django's local-memory cache is used.
+
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
+RESPONSE_CACHE_TIMEOUT = 600  # seconds; entries are invalidated by generation bumps, not expiry
+
+
+# Checkout holds stock this long for an unpaid order before
+# `manage.py release_expired_reservations` puts it back
+STOCK_RESERVATION_MINUTES = 15
+
+# A retried POST carrying the same Idempotency-Key within this window gets the
+# stored response back instead of creating a second order / payment
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
+# Cart retention for `manage.py cleanup_carts` (guest carts also for purge_guest_carts)
+GUEST_CART_TTL_DAYS = 30
+CHECKED_OUT_CART_RETENTION_DAYS = 30
+ABANDONED_CART_DAYS = 90  # archived to ArchivedCart, then deleted
+
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
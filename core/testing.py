@@ -0,0 +1,205 @@
+"""
+Shared test fixtures.
+
+`seed_catalog()` bulk-loads a realistic store (catalog, reviews, carts, orders,
+payments, shipments, hero content) so tests and benchmarks can exercise the API
+at a size where N+1 queries and oversized payloads actually show up.
+"""
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from hero.models import HeroSlide
+from orders.models import Order, OrderHistory, OrderItem
+from payments.models import Payment
+from products.models import (
+    Brand,
+    Category,
+    HeroBanner,
+    Product,
+    ProductImage,
+    ProductReview,
+    ProductVariation,
+)
+from products.categories import rebuild_category_paths
+from products.ratings import rebuild_rating_aggregates
+from products.search import get_search_backend
+from shipping.models import Shipment, ShipmentHistory, ShippingAddress, ShippingMethod
+
+User = get_user_model()
+
+AVAILABILITY = ["in_stock", "preorder", "coming_soon"]
+
+
+def seed_catalog(
+    products=2000,
+    root_categories=10,
+    subcategories=3,
+    brands=15,
+    reviewers=5,
+    orders=30,
+    items_per_order=3,
+    cart_items=10,
+):
+    """
+    Populate the database with bulk inserts and return a namespace of handy objects
+    (staff, customer, product, category, brand, order, payment, shipment, cart, ...).
+    """
+    staff = User.objects.create_user(
+        email="staff@example.com", full_name="Store Staff", password="password123", is_staff=True
+    )
+    customer = User.objects.create_user(
+        email="customer@example.com", full_name="Store Customer", password="password123"
+    )
+    reviewer_users = User.objects.bulk_create([
+        User(email=f"reviewer{i}@example.com", full_name=f"Reviewer {i}", password="!")
+        for i in range(reviewers)
+    ])
+
+    # --- Catalog ---
+    roots = Category.objects.bulk_create([
+        Category(name=f"Category {i}", slug=f"category-{i}") for i in range(root_categories)
+    ])
+    children = Category.objects.bulk_create([
+        Category(name=f"Category {i}.{j}", slug=f"category-{i}-{j}", parent=root)
+        for i, root in enumerate(roots)
+        for j in range(subcategories)
+    ])
+    categories = roots + children
+    rebuild_category_paths()
+    brand_objs = Brand.objects.bulk_create([
+        Brand(name=f"Brand {i}", slug=f"brand-{i}") for i in range(brands)
+    ])
+
+    product_objs = []
+    for i in range(products):
+        price = Decimal(500 + (i * 37) % 9500)
+        discount = price - Decimal(50) if i % 4 == 0 else None
+        product_objs.append(Product(
+            name=f"Product {i}",
+            slug=f"product-{i}",
+            description=f"Description for product {i}. " * 10,
+            category=categories[i % len(categories)],
+            brand=brand_objs[i % len(brand_objs)],
+            price=price,
+            discount_price=discount,
+            is_on_sale=discount is not None,
+            is_featured=i % 10 == 0,
+            sku=f"SKU-{i:06d}",
+            stock_quantity=(i * 7) % 50,
+            availability=AVAILABILITY[i % len(AVAILABILITY)],
+        ))
+    product_objs = Product.objects.bulk_create(product_objs, batch_size=500)
+
+    ProductImage.objects.bulk_create([
+        ProductImage(product=product, image=f"products/{product.slug}-{n}.jpg", is_featured=n == 0)
+        for product in product_objs
+        for n in range(2)
+    ], batch_size=1000)
+    ProductVariation.objects.bulk_create([
+        ProductVariation(
+            product=product,
+            name=size,
+            price=product.price,
+            stock_quantity=5,
+            sku=f"{product.sku}-{size}",
+        )
+        for product in product_objs
+        for size in ("M", "L")
+    ], batch_size=1000)
+    ProductReview.objects.bulk_create([
+        ProductReview(product=product, user=user, rating=1 + (product.pk + n) % 5, comment="Solid product.")
+        for product in product_objs
+        for n, user in enumerate(reviewer_users)
+    ], batch_size=1000)
+    rebuild_rating_aggregates()
+    get_search_backend().rebuild()
+
+    HeroBanner.objects.bulk_create([
+        HeroBanner(title=f"Banner {i}", image=f"banners/banner-{i}.jpg", display_order=i) for i in range(5)
+    ])
+    HeroSlide.objects.bulk_create([
+        HeroSlide(title=f"Slide {i}", image=f"hero/slides/images/slide-{i}.jpg", order=i) for i in range(5)
+    ])
+
+    # --- Shipping ---
+    method = ShippingMethod.objects.create(name="Standard Delivery", base_cost=Decimal("300.00"))
+    ShippingMethod.objects.create(name="Pickup", base_cost=Decimal("0.00"))
+    address = ShippingAddress.objects.create(
+        user=customer, full_name="Store Customer", phone_number="0700000000",
+        city="Nairobi", street_address="1 Trail Road", is_default=True,
+    )
+
+    # --- Orders, payments, shipments ---
+    order_objs = Order.objects.bulk_create([
+        Order(
+            user=customer,
+            email=customer.email,
+            full_name=customer.full_name,
+            shipping_address=address,
+            shipping_method=method,
+            status="paid",
+            subtotal=Decimal("1000.00"),
+            shipping_cost=method.base_cost,
+            total=Decimal("1300.00"),
+        )
+        for _ in range(orders)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=product_objs[(n * items_per_order + k) % len(product_objs)],
+            quantity=1,
+            price=product_objs[(n * items_per_order + k) % len(product_objs)].price,
+            subtotal=product_objs[(n * items_per_order + k) % len(product_objs)].price,
+        )
+        for n, order in enumerate(order_objs)
+        for k in range(items_per_order)
+    ])
+    OrderHistory.objects.bulk_create([
+        OrderHistory(order=order, status=status, note="Seeded")
+        for order in order_objs
+        for status in ("pending", "paid")
+    ])
+    payment_objs = Payment.objects.bulk_create([
+        Payment(order=order, user=customer, method="mpesa", amount=order.total, status="successful")
+        for order in order_objs
+    ])
+    shipment_objs = Shipment.objects.bulk_create([
+        Shipment(order=order, address=address, method=method, status="processing")
+        for order in order_objs
+    ])
+    ShipmentHistory.objects.bulk_create([
+        ShipmentHistory(shipment=shipment, old_status="pending", new_status="processing")
+        for shipment in shipment_objs
+    ])
+
+    # --- Cart ---
+    cart = Cart.objects.create(user=customer)
+    cart_lines = CartItem.objects.bulk_create([
+        CartItem(cart=cart, product=product, quantity=1 + n % 3, price=product.price, added_at=timezone.now())
+        for n, product in enumerate(product_objs[:cart_items])
+    ])
+    # bulk_create skips the signals that maintain the stored totals
+    cart.item_count = sum(line.quantity for line in cart_lines)
+    cart.subtotal = sum(line.subtotal for line in cart_lines)
+    cart.save(update_fields=["item_count", "subtotal"])
+
+    return SimpleNamespace(
+        staff=staff,
+        customer=customer,
+        category=roots[0],
+        brand=brand_objs[0],
+        product=product_objs[0],
+        banner=HeroBanner.objects.first(),
+        slide=HeroSlide.objects.first(),
+        shipping_method=method,
+        address=address,
+        order=order_objs[0],
+        payment=payment_objs[0],
+        shipment=shipment_objs[0],
+        cart=cart,
+    )
@@ -0,0 +1,373 @@
+"""
+Query-count and payload-size budgets for every public API route.
+
+Each row of ENDPOINT_BUDGETS names a route, how to call it and the most
+queries / response bytes it may cost against the `seed_catalog()` dataset.
+Tighten a budget when an endpoint gets cheaper; a regression (an N+1 or an
+unexpectedly nested serializer) fails the suite instead of reaching production.
+"""
+import base64
+import json
+import math
+import time
+from collections import namedtuple
+from decimal import Decimal
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+from django.utils.http import parse_http_date
+from rest_framework.test import APIClient
+
+from hero.models import HeroSlide
+from products.models import Category, Product
+
+from .cache import bump_generation, get_generations
+from .testing import seed_catalog
+
+# Route modules guarded by the budget table
+BUDGETED_URLCONFS = ["products", "cart", "orders", "payments", "shipping", "hero", "analytics"]
+
+Endpoint = namedtuple(
+    "Endpoint", ["route", "max_queries", "max_bytes", "user", "method", "kwargs", "data"],
+    defaults=[None, "get", None, None],
+)
+
+# route: namespaced URL name
+# user: None (anonymous), "customer" or "staff"
+# kwargs / data: callables receiving the seeded fixture namespace
+ENDPOINT_BUDGETS = [
+    # --- products ---
+    # list and detail counts include the cold-cache sale clock query (products.pricing.expire_sale_windows)
+    Endpoint("products:product-list", 4, 10_000),
+    Endpoint("products:product-list", 3, 10_000, data=lambda fx: {"count": "false", "sort": "price-low"}),
+    Endpoint("products:product-list", 4, 10_000, data=lambda fx: {"search": "product 12", "max_price": "9000"}),
+    Endpoint("products:product-list", 5, 10_000, data=lambda fx: {"category": str(fx.category.pk)}),
+    Endpoint("products:product-facets", 6, 4_000),
+    Endpoint("products:product-detail", 7, 3_000, kwargs=lambda fx: {"slug": fx.product.slug}),
+    Endpoint("products:product-reviews", 2, 1_000, kwargs=lambda fx: {"product_id": fx.product.pk}),
+    Endpoint("products:category-list", 1, 6_000),
+    Endpoint("products:category-detail", 2, 1_000, kwargs=lambda fx: {"id": fx.category.pk}),
+    Endpoint("products:brand-list", 1, 1_500),
+    Endpoint("products:brand-detail", 1, 200, kwargs=lambda fx: {"id": fx.brand.pk}),
+    Endpoint("products:hero-banner-list", 1, 1_000),
+    Endpoint("products:hero-banner-detail", 1, 300, kwargs=lambda fx: {"id": fx.banner.pk}),
+    # --- cart ---
+    Endpoint("cart:cart-detail", 3, 4_000, user="customer"),
+    Endpoint("cart:cart-detail", 7, 25_000, user="customer", data=lambda fx: {"expand": "product"}),
+    Endpoint(
+        "cart:cart-add-item", 10, 4_000, user="customer", method="post",
+        data=lambda fx: {"product_id": fx.product.pk, "quantity": 1},
+    ),
+    Endpoint(
+        "cart:cart-batch", 14, 4_000, user="customer", method="post",
+        data=lambda fx: {"ops": [
+            {"op": "add", "product_id": fx.product.pk, "quantity": 1},
+            {"op": "update", "item_id": fx.cart.items.first().pk, "quantity": 2},
+        ]},
+    ),
+    # --- orders ---
+    Endpoint("orders:orders-list", 2, 3_000, user="customer"),
+    Endpoint(
+        "orders:orders-list", 2, 3_000, user="staff",
+        data=lambda fx: {"status": "pending,paid", "email": fx.order.email.upper()},
+    ),
+    Endpoint("orders:orders-detail", 4, 1_000, user="customer", kwargs=lambda fx: {"pk": fx.order.pk}),
+    Endpoint("orders:orders-history", 3, 300, user="customer", kwargs=lambda fx: {"pk": fx.order.pk}),
+    # --- payments ---
+    Endpoint("payments:payments-list", 3, 10_000, user="customer"),
+    Endpoint("payments:payments-detail", 2, 500, user="customer", kwargs=lambda fx: {"pk": fx.payment.pk}),
+    # --- shipping ---
+    Endpoint("shipping:shipping-address-list", 1, 400, user="customer"),
+    Endpoint("shipping:shipping-address-detail", 1, 400, user="customer", kwargs=lambda fx: {"pk": fx.address.pk}),
+    Endpoint("shipping:shipping-method-list", 1, 400),
+    Endpoint("shipping:shipment-list", 2, 26_000, user="customer"),
+    Endpoint("shipping:shipment-detail", 2, 1_000, user="customer", kwargs=lambda fx: {"pk": fx.shipment.pk}),
+    Endpoint(
+        "shipping:shipment-history-list", 1, 200, user="customer",
+        kwargs=lambda fx: {"shipment_id": fx.shipment.pk},
+    ),
+    # --- hero ---
+    Endpoint("hero:hero-slide-list", 1, 2_500),
+    Endpoint("hero:hero-slide-detail", 1, 500, kwargs=lambda fx: {"pk": fx.slide.pk}),
+    # --- analytics ---
+    Endpoint("analytics:analytics-overview", 4, 200, user="staff"),
+    Endpoint("analytics:analytics-sales", 1, 200, user="staff"),
+    Endpoint("analytics:analytics-recent-orders", 1, 1_500, user="staff"),
+]
+
+# Routes deliberately left out of the table, with the reason
+UNBUDGETED_ROUTES = {
+    "api-root": "DRF router index",
+    "products:product-create": "admin write",
+    "products:product-update": "admin write",
+    "products:product-delete": "admin write",
+    "products:product-import": "admin bulk write",
+    "products:product-export": "admin streaming download",
+    "products:product-price-stock": "admin bulk write",
+    "products:category-create": "admin write",
+    "products:category-update": "admin write",
+    "products:category-delete": "admin write",
+    "products:hero-banner-create": "admin write",
+    "products:hero-banner-update": "admin write",
+    "products:hero-banner-delete": "admin write",
+    "cart:cart-manage-item": "single-line write; shares the cart-add-item serializer path",
+    "cart:cart-clear": "write",
+    "cart:cart-apply-coupon": "needs a coupon fixture; shares the cart-detail serializer path",
+    "cart:cart-remove-coupon": "write; shares the cart-detail serializer path",
+    "orders:orders-cancel": "write",
+    "orders:orders-update-status": "admin write",
+    "orders:orders-bulk-transition": "admin write",
+    "payments:mpesa-initiate": "calls the Daraja API",
+    "payments:mpesa-callback": "Safaricom webhook",
+    "payments:bank-transfer": "file upload write",
+    "shipping:shipping-address-set-default": "write",
+    "shipping:shipment-update-status": "admin write",
+}
+
+
+def _route_names(patterns, namespace):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _route_names(pattern.url_patterns, namespace)
+        elif pattern.name:
+            yield "api-root" if pattern.name == "api-root" else f"{namespace}:{pattern.name}"
+
+
+class EndpointBudgetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fx = seed_catalog()
+
+    def _call(self, endpoint):
+        cache.clear()  # budgets are measured on a cold cache
+        client = APIClient()
+        if endpoint.user:
+            client.force_authenticate(getattr(self.fx, endpoint.user))
+        kwargs = endpoint.kwargs(self.fx) if endpoint.kwargs else None
+        data = endpoint.data(self.fx) if endpoint.data else None
+        url = reverse(endpoint.route, kwargs=kwargs)
+        return getattr(client, endpoint.method)(url, data, format="json")
+
+    def test_endpoints_stay_within_budget(self):
+        for endpoint in ENDPOINT_BUDGETS:
+            with self.subTest(route=endpoint.route):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self._call(endpoint)
+
+                self.assertLess(response.status_code, 300, response.content[:500])
+                self.assertLessEqual(
+                    len(queries), endpoint.max_queries,
+                    f"{endpoint.route} ran {len(queries)} queries (budget {endpoint.max_queries})",
+                )
+                self.assertLessEqual(
+                    len(response.content), endpoint.max_bytes,
+                    f"{endpoint.route} returned {len(response.content)} bytes (budget {endpoint.max_bytes})",
+                )
+
+    def test_every_route_is_budgeted(self):
+        from importlib import import_module
+
+        budgeted = {endpoint.route for endpoint in ENDPOINT_BUDGETS}
+        for app in BUDGETED_URLCONFS:
+            for name in _route_names(import_module(f"{app}.urls").urlpatterns, app):
+                with self.subTest(route=name):
+                    self.assertTrue(
+                        name in budgeted or name in UNBUDGETED_ROUTES,
+                        f"{name} has no entry in ENDPOINT_BUDGETS",
+                    )
+
+
+class KeysetPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Shoes")
+        # Repeated prices force the pk tie-breaker to do its job
+        Product.objects.bulk_create([
+            Product(
+                name=f"Product {i}", slug=f"product-{i}", description="", category=category,
+                price=Decimal(100 + i % 3),
+            )
+            for i in range(25)
+        ])
+
+    def _walk(self, **params):
+        ids, url, data = [], reverse("products:product-list"), {"page_size": 4, **params}
+        while url:
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            ids += [card["id"] for card in body["results"]]
+            url, data = body["next"], None
+        return ids
+
+    def test_pages_cover_every_row_once_in_order(self):
+        expected = list(Product.objects.order_by("price", "id").values_list("id", flat=True))
+        self.assertEqual(self._walk(sort="price-low"), expected)
+
+        expected = list(Product.objects.order_by("-price", "-id").values_list("id", flat=True))
+        self.assertEqual(self._walk(sort="price-high"), expected)
+
+    def test_later_pages_cost_the_same_as_the_first(self):
+        url = reverse("products:product-list")
+        first = self.client.get(url, {"page_size": 4, "count": "false"}).json()
+        with self.assertNumQueries(2):
+            response = self.client.get(first["next"])
+        self.assertEqual(len(response.json()["results"]), 4)
+
+    def test_count_can_be_skipped(self):
+        body = self.client.get(reverse("products:product-list"), {"count": "false"}).json()
+        self.assertNotIn("count", body)
+        self.assertEqual(self.client.get(reverse("products:product-list")).json()["count"], 25)
+
+    def test_invalid_or_foreign_cursor_is_rejected(self):
+        url = reverse("products:product-list")
+        self.assertEqual(self.client.get(url, {"cursor": "garbage"}).status_code, 404)
+
+        cursor = self.client.get(url, {"page_size": 4, "sort": "price-low"}).json()["next"].split("cursor=")[1]
+        self.assertEqual(self.client.get(url, {"cursor": cursor, "sort": "newest"}).status_code, 404)
+
+        # Right signature, values of the wrong type
+        cursor = parse_qs(urlsplit(self.client.get(url, {"sort": "price-low"}).json()["next"]).query)["cursor"][0]
+        decoded = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        for values in (["cheap", decoded["v"][1]], [decoded["v"][0], None], [decoded["v"][0], [1]]):
+            tampered = base64.urlsafe_b64encode(json.dumps({"o": decoded["o"], "v": values}).encode()).decode()
+            self.assertEqual(self.client.get(url, {"cursor": tampered, "sort": "price-low"}).status_code, 404, values)
+
+
+class ResponseCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Shoes")
+        self.product = Product.objects.create(
+            name="Trail Runner", slug="trail-runner", description="", category=self.category, price=Decimal("120.00"),
+        )
+
+    def test_anonymous_reads_are_served_from_cache(self):
+        url = reverse("products:product-list")
+        first = self.client.get(url, {"sort": "price-low", "brand": ""})
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {"brand": "", "sort": "price-low"})
+        self.assertEqual(first.json(), second.json())
+
+    def test_writes_bump_generation_and_invalidate(self):
+        url = reverse("products:product-detail", args=[self.product.slug])
+        self.client.get(url)
+        before = get_generations([Product])
+
+        self.product.name = "Trail Runner II"
+        with self.captureOnCommitCallbacks(execute=True):  # generations move on commit
+            self.product.save()
+
+        self.assertNotEqual(get_generations([Product]), before)
+        self.assertEqual(self.client.get(url).json()["name"], "Trail Runner II")
+
+    def test_rolled_back_writes_keep_the_generation(self):
+        before = get_generations([Product])
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.product.name = "Never committed"
+                self.product.save()
+                raise RuntimeError
+        self.assertEqual(get_generations([Product]), before)
+
+    def test_related_model_writes_invalidate(self):
+        url = reverse("products:product-list")
+        self.client.get(url)
+        self.category.name = "Footwear"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertEqual(self.client.get(url).json()["results"][0]["category"]["name"], "Footwear")
+
+    def test_evicted_generation_does_not_resurrect_old_entries(self):
+        url = reverse("products:category-list")
+        self.client.get(url)
+        Category.objects.filter(pk=self.category.pk).update(name="Footwear")  # no signal
+        cache.delete("gen:products.category")
+        self.assertEqual(self.client.get(url).json()[0]["name"], "Footwear")
+
+    def test_bulk_writes_can_bump_explicitly(self):
+        url = reverse("products:category-list")
+        self.client.get(url)
+        Category.objects.filter(pk=self.category.pk).update(name="Footwear")
+        bump_generation(Category)
+        self.assertEqual(self.client.get(url).json()[0]["name"], "Footwear")
+
+    def test_authenticated_requests_bypass_cache(self):
+        HeroSlide.objects.create(title="Hidden", image="hero/slides/images/hidden.jpg", is_active=False)
+        staff = get_user_model().objects.create_user(
+            email="staff@example.com", full_name="Staff", password="password123", is_staff=True
+        )
+        url = reverse("hero:hero-slide-list")
+        self.assertEqual(self.client.get(url).json(), [])
+
+        client = APIClient()
+        client.force_authenticate(staff)
+        self.assertEqual(len(client.get(url).json()), 1)
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Shoes")
+        self.product = Product.objects.create(
+            name="Trail Runner", slug="trail-runner", description="", category=self.category, price=Decimal("120.00"),
+        )
+        self.url = reverse("products:product-detail", args=[self.product.slug])
+
+    def test_matching_etag_returns_304_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b"")
+
+    def test_if_modified_since_returns_304(self):
+        response = self.client.get(reverse("products:category-list"))
+        with self.assertNumQueries(0):
+            revalidated = self.client.get(
+                reverse("products:category-list"), HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            )
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_write_bursts_keep_last_modified_at_the_clock(self):
+        url = reverse("products:category-list")
+        response = self.client.get(url)
+        for _ in range(5):
+            bump_generation(Category)
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        # Same-second writes are told apart by the ETag; the date never runs ahead
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertLessEqual(parse_http_date(revalidated["Last-Modified"]), math.ceil(time.time()))
+
+    def test_write_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.reviews.create(
+                user=get_user_model().objects.create_user(
+                    email="r@example.com", full_name="Reviewer", password="password123"
+                ),
+                rating=5,
+                comment="Great",
+            )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()["reviews"]), 1)
+
+    def test_etag_differs_per_query(self):
+        url = reverse("products:brand-list")
+        self.assertNotEqual(self.client.get(url)["ETag"], self.client.get(url, {"search": "x"})["ETag"])
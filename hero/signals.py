@@ -0,0 +1,9 @@
+from core.cache import track_generations
+
+from .models import HeroSlide
+
+
+# ----------------------------
+# RESPONSE CACHE GENERATIONS
+# ----------------------------
+track_generations(HeroSlide)
@@ -1,9 +1,10 @@
 from rest_framework import viewsets, permissions
+from core.cache import CachedResponseMixin, ConditionalGetMixin
 from .models import HeroSlide
 from .serializers import HeroSlideSerializer
 
 
-class HeroSlideViewSet(viewsets.ModelViewSet):
+class HeroSlideViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing Hero Slides.
     - Admins can create/update/delete
@@ -11,6 +12,7 @@ class HeroSlideViewSet(viewsets.ModelViewSet):
     """
     serializer_class = HeroSlideSerializer
     permission_classes = [permissions.AllowAny]  # Allow read-only for public
+    cache_models = (HeroSlide,)
 
     def get_queryset(self):
         """
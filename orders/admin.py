@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Order, OrderItem, OrderHistory
+from .models import IdempotencyKey, Order, OrderItem, OrderHistory, StockReservation
 
 
 # ----------------------------
@@ -9,8 +9,8 @@ from .models import Order, OrderItem, OrderHistory
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
-    readonly_fields = ("product", "price", "subtotal")
-    fields = ("product", "quantity", "price", "subtotal")
+    readonly_fields = ("product", "variation_name", "variation_sku", "price", "subtotal")
+    fields = ("product", "variation_name", "variation_sku", "quantity", "price", "subtotal")
     can_delete = False
 
 
@@ -111,3 +111,26 @@ class OrderHistoryAdmin(admin.ModelAdmin):
     list_filter = ("status", "changed_at")
     search_fields = ("order__id", "status", "note")
     ordering = ("-changed_at",)
+
+
+# ----------------------------
+# STOCK RESERVATION ADMIN
+# ----------------------------
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("order", "product", "variation", "quantity", "status", "expires_at")
+    list_filter = ("status", "expires_at")
+    search_fields = ("order__id", "product__name", "variation__sku")
+    ordering = ("-created_at",)
+
+
+# ----------------------------
+# IDEMPOTENCY KEY ADMIN
+# ----------------------------
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ("key", "scope", "owner", "status_code", "created_at", "expires_at")
+    list_filter = ("scope", "status_code")
+    search_fields = ("key", "owner")
+    readonly_fields = ("key", "scope", "owner", "fingerprint", "status_code", "response_body", "created_at", "expires_at")
+    ordering = ("-created_at",)
@@ -0,0 +1,42 @@
+import django_filters
+from django.db.models.functions import Lower
+
+from .models import Order
+
+
+# ----------------------------
+# ORDER FILTER
+# ----------------------------
+class OrderFilter(django_filters.FilterSet):
+    """
+    Order list filters. Every filter combines with the newest-first ordering
+    through an index ending on (created_at, id); see Order.Meta.indexes.
+
+    - status: one or more statuses, comma-separated (`?status=pending,paid`)
+    - created_after / created_before: date or datetime bounds (inclusive / exclusive)
+    - email: exact customer email, case-insensitive
+    - search: an order id, or a customer email
+    """
+    status = django_filters.CharFilter(method="filter_status")
+    created_after = django_filters.DateTimeFilter(field_name="created_at", lookup_expr="gte")
+    created_before = django_filters.DateTimeFilter(field_name="created_at", lookup_expr="lt")
+    email = django_filters.CharFilter(method="filter_email")
+    search = django_filters.CharFilter(method="filter_search")
+
+    class Meta:
+        model = Order
+        fields = ["status", "created_after", "created_before", "email"]
+
+    def filter_status(self, queryset, name, value):
+        statuses = [v.strip() for v in value.split(",") if v.strip()]
+        return queryset.filter(status__in=statuses) if statuses else queryset
+
+    def filter_email(self, queryset, name, value):
+        # Compare lower(email) so the functional index applies; iexact compiles to UPPER()/LIKE
+        return queryset.alias(email_lower=Lower("email")).filter(email_lower=value.strip().lower())
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if value.isdigit():
+            return queryset.filter(pk=value)
+        return self.filter_email(queryset, name, value)
@@ -0,0 +1,143 @@
+"""
+`Idempotency-Key` support for POST endpoints that must not run twice.
+
+A client that retries checkout or a payment request sends the same
+`Idempotency-Key` header. The first request claims the key (a unique
+IdempotencyKey row) and runs inside the transaction that inserted it, so a
+concurrent duplicate blocks on that row until the first one commits and then
+gets the stored response replayed. Reusing a key with a different body is
+rejected with 422. If the view raises, the transaction rolls back and the key
+is free again; 5xx responses are not stored either.
+
+Keys belong to the user, or for guests to their session; a guest without a
+session has nothing to tie a key to, so the header is refused.
+
+Requests without the header behave exactly as before.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+def idempotency_ttl():
+    return timedelta(hours=getattr(settings, "IDEMPOTENCY_KEY_TTL_HOURS", 24))
+
+
+def _canonical(value):
+    """JSON-friendly form of request data; uploaded files are reduced to name, size and content hash."""
+    if isinstance(value, UploadedFile):
+        digest = hashlib.sha256()
+        for chunk in value.chunks():
+            digest.update(chunk)
+        value.seek(0)
+        return {"file": value.name, "size": value.size, "sha256": digest.hexdigest()}
+    if hasattr(value, "getlist"):
+        return {name: [_canonical(item) for item in value.getlist(name)] for name in value}
+    if isinstance(value, dict):
+        return {name: _canonical(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def request_fingerprint(request):
+    """sha256 of method, path and the parsed body (not the raw bytes: multipart boundaries change per retry)."""
+    raw = json.dumps(
+        [request.method, request.path, _canonical(request.data)], sort_keys=True, default=str,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _owner(request):
+    """Who a key belongs to: the user, the guest's session, or None when there is neither."""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    session_key = request.session.session_key
+    return f"session:{session_key}" if session_key else None
+
+
+def idempotent(scope):
+    """
+    Decorate a view handler (`post`, `create`, ...) so a repeated `Idempotency-Key`
+    replays the first response. `scope` names the endpoint; keys are unique per
+    scope and user (or guest session).
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {"error": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            owner = _owner(request)
+            if owner is None:
+                return Response(
+                    {"error": f"{IDEMPOTENCY_HEADER} needs a signed-in user or a guest session"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            fingerprint = request_fingerprint(request)
+            now = timezone.now()
+            with transaction.atomic():
+                record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+                    scope=scope, owner=owner, key=key,
+                    defaults={"fingerprint": fingerprint, "expires_at": now + idempotency_ttl()},
+                )
+                if not created and record.expires_at <= now:
+                    # An expired key is a new request
+                    record.fingerprint = fingerprint
+                    record.status_code = record.response_body = None
+                    record.expires_at = now + idempotency_ttl()
+                    record.save(update_fields=["fingerprint", "status_code", "response_body", "expires_at"])
+                elif not created:
+                    return _replay(record, fingerprint)
+
+                response = handler(view, request, *args, **kwargs)
+                if response.status_code >= 500:
+                    record.delete()
+                else:
+                    record.status_code = response.status_code
+                    record.response_body = response.data
+                    record.save(update_fields=["status_code", "response_body"])
+                return response
+        return wrapper
+    return decorator
+
+
+def _replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response(
+            {"error": f"{IDEMPOTENCY_HEADER} was already used with a different request"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.status_code is None:
+        # Only reachable on databases without row locks; the first request has not finished
+        return Response(
+            {"error": "A request with this Idempotency-Key is still being processed"},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return Response(record.response_body, status=record.status_code, headers={REPLAYED_HEADER: "true"})
+
+
+def purge_expired_keys(now=None):
+    """Delete keys past their window. Returns the number deleted."""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
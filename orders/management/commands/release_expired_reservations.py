@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from orders.reservations import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Return stock held by unpaid orders whose reservation expired, and cancel those orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-orders", action="store_true",
+            help="Release the stock but leave the orders pending.",
+        )
+
+    def handle(self, *args, **options):
+        released, cancelled = release_expired_reservations(cancel_orders=not options["keep_orders"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Released {released} reservation(s), cancelled {cancelled} order(s)."
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_idempotency_key'),
+        ('products', '0007_product_sale_window'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='variation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='products.productvariation'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='variation_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='variation_sku',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
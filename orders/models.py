@@ -1,7 +1,9 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.functions import Lower
 from django.utils import timezone
-from products.models import Product
+from products.models import Product, ProductVariation
 
 User = settings.AUTH_USER_MODEL
 
@@ -41,6 +43,15 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        # Lists are newest first and keyset-paginated on (created_at, id): each
+        # filter the order list offers has an index ending on those columns.
+        # See orders.filters.OrderFilter.
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="order_created_idx"),
+            models.Index(fields=["user", "created_at", "id"], name="order_user_created_idx"),
+            models.Index(fields=["status", "created_at", "id"], name="order_status_created_idx"),
+            models.Index(Lower("email"), "created_at", "id", name="order_email_created_idx"),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.full_name} ({self.status})"
@@ -49,6 +60,10 @@ class Order(models.Model):
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
+    variation = models.ForeignKey(ProductVariation, on_delete=models.SET_NULL, null=True, blank=True)
+    # Snapshot of the variation as bought, kept if it is later renamed or deleted
+    variation_name = models.CharField(max_length=100, blank=True)
+    variation_sku = models.CharField(max_length=100, blank=True)
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)  # snapshot price
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
@@ -66,3 +81,58 @@ class OrderHistory(models.Model):
 
     def __str__(self):
         return f"Order {self.order.id} → {self.status} at {self.changed_at}"
+
+
+class StockReservation(models.Model):
+    """
+    Units taken off Product / ProductVariation stock at checkout.
+    Held until the order is paid (committed) or the hold expires unpaid and the
+    sweeper puts the units back (released). See orders.reservations.
+    """
+    STATUS_CHOICES = [
+        ("held", "Held"),
+        ("committed", "Committed"),
+        ("released", "Released"),
+    ]
+
+    order = models.ForeignKey(Order, related_name="reservations", on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name="reservations", on_delete=models.CASCADE)
+    variation = models.ForeignKey(
+        ProductVariation, related_name="reservations", on_delete=models.CASCADE, null=True, blank=True
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="held")
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "expires_at"])]
+
+    def __str__(self):
+        return f"{self.quantity} × {self.product_id} for order {self.order_id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client-supplied `Idempotency-Key` and the response it produced, so a
+    retried checkout / payment request is answered without doing the work
+    twice. See orders.idempotency.
+    """
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=100)  # which endpoint the key was used on
+    owner = models.CharField(max_length=64)  # "user:<pk>" or "session:<guest session key>"
+    fingerprint = models.CharField(max_length=64)  # sha256 of method, path and body
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "owner", "key"], name="idempotency_key_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.owner})"
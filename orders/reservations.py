@@ -0,0 +1,210 @@
+"""
+Stock reservations for checkout.
+
+`reserve_stock()` takes the whole cart off stock with one conditional UPDATE
+per model
+
+    UPDATE ... SET stock_quantity = stock_quantity - CASE id WHEN ... END
+    WHERE id IN (...) AND stock_quantity >= CASE id WHEN ... END
+
+so two checkouts can never both take the last unit: the database decides, not
+a read-then-write in Python, and the query count does not grow with the cart.
+If fewer rows match than were asked for, that savepoint is rolled back and the
+lines are retried one by one to find the short ones; the caller's transaction
+must then roll back, which `InsufficientStock` forces.
+
+Reservations stay `held` until the order is paid (`commit_reservations`) or
+they expire unpaid and `release_expired_reservations()` puts the units back.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from core.cache import bump_generation
+from products.models import Product, ProductVariation
+
+from .models import Order, StockReservation
+
+# Payment states that mean "never going to complete" for the sweeper
+UNPAID_PAYMENT_STATUSES = ("initiated", "failed")
+
+
+class _ShortStock(Exception):
+    pass
+
+
+class InsufficientStock(Exception):
+    """Raised when one or more lines cannot be reserved; `failures` lists them."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__(f"{len(failures)} line(s) out of stock")
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, "STOCK_RESERVATION_MINUTES", 15))
+
+
+def _lock_order(item):
+    # Variations first, then products, each by id: every checkout locks rows in the same order
+    (product_id, variation_id), _ = item
+    return (variation_id is None, variation_id or 0, product_id)
+
+
+def _merge_lines(lines):
+    """{(product_id, variation_id): quantity}, summing repeated lines."""
+    merged = defaultdict(int)
+    for product_id, variation_id, quantity in lines:
+        merged[(product_id, variation_id)] += quantity
+    return merged
+
+
+def _by_model(merged):
+    """[(model, {pk: quantity}), ...], variations first so every checkout locks rows in the same order."""
+    by_model = {ProductVariation: {}, Product: {}}
+    for (product_id, variation_id), quantity in merged.items():
+        if variation_id:
+            by_model[ProductVariation][variation_id] = quantity
+        else:
+            by_model[Product][product_id] = quantity
+    return [(model, quantities) for model, quantities in by_model.items() if quantities]
+
+
+def _per_row(quantities):
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in sorted(quantities.items())],
+        output_field=IntegerField(),
+    )
+
+
+def _take_stock(merged):
+    """Take every line in one UPDATE per model; False (and nothing taken) if any row is short."""
+    try:
+        with transaction.atomic():
+            for model, quantities in _by_model(merged):
+                requested = _per_row(quantities)
+                taken = model.objects.filter(pk__in=quantities, stock_quantity__gte=requested).update(
+                    stock_quantity=F("stock_quantity") - requested
+                )
+                if taken != len(quantities):
+                    raise _ShortStock
+    except _ShortStock:
+        return False
+    return True
+
+
+def _take_stock_by_line(merged):
+    """Slow path after a short batch: take lines one at a time and return the ones that fail."""
+    failures = []
+    for (product_id, variation_id), quantity in sorted(merged.items(), key=_lock_order):
+        model, pk = (ProductVariation, variation_id) if variation_id else (Product, product_id)
+        taken = model.objects.filter(pk=pk, stock_quantity__gte=quantity).update(
+            stock_quantity=F("stock_quantity") - quantity
+        )
+        if not taken:
+            failures.append({"product_id": product_id, "variation_id": variation_id, "requested": quantity})
+    return failures
+
+
+def reserve_stock(order, lines):
+    """
+    Decrement stock for `lines` ((product_id, variation_id or None, quantity), ...)
+    and record held reservations for `order`. Must run inside transaction.atomic();
+    raises InsufficientStock listing every short line (nothing is reserved then).
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError("reserve_stock() must run inside transaction.atomic().")
+
+    merged = _merge_lines(lines)
+    if not _take_stock(merged):
+        failures = _take_stock_by_line(merged)
+        if failures:
+            _fill_available(failures)
+            raise InsufficientStock(failures)
+
+    _stock_changed(merged)
+    expires_at = timezone.now() + reservation_ttl()
+    return StockReservation.objects.bulk_create([
+        StockReservation(
+            order=order, product_id=product_id, variation_id=variation_id, quantity=quantity, expires_at=expires_at,
+        )
+        for (product_id, variation_id), quantity in merged.items()
+    ])
+
+
+def _stock_changed(merged):
+    # Cached catalog responses show stock; invalidate once the change is committed
+    models = {ProductVariation if variation_id else Product for _, variation_id in merged}
+    transaction.on_commit(lambda: bump_generation(*models))
+
+
+def _fill_available(failures):
+    product_ids = [failure["product_id"] for failure in failures if not failure["variation_id"]]
+    variation_ids = [failure["variation_id"] for failure in failures if failure["variation_id"]]
+    products = dict(Product.objects.filter(pk__in=product_ids).values_list("pk", "stock_quantity"))
+    variations = dict(ProductVariation.objects.filter(pk__in=variation_ids).values_list("pk", "stock_quantity"))
+    for failure in failures:
+        if failure["variation_id"]:
+            failure["available"] = variations.get(failure["variation_id"], 0)
+        else:
+            failure["available"] = products.get(failure["product_id"], 0)
+
+
+def commit_reservations(*orders):
+    """The orders (instances or ids) are paid: their held units are sold for good."""
+    return StockReservation.objects.filter(order__in=orders, status="held").update(status="committed")
+
+
+def release_reservations(reservations, statuses=("held",)):
+    """
+    Put the units of `reservations` (a queryset) back on stock and mark them released.
+    Only rows in `statuses` are touched: held by default; cancelling a paid order
+    also passes "committed" so sold units return to stock.
+    Rows are locked first so a concurrent sweeper or payment cannot release or commit them twice.
+    Returns the number of reservations released.
+    """
+    with transaction.atomic():
+        held = list(
+            reservations.filter(status__in=statuses).select_for_update().order_by("pk")
+            .values_list("pk", "product_id", "variation_id", "quantity")
+        )
+        if not held:
+            return 0
+        restock = _merge_lines((product_id, variation_id, quantity) for _, product_id, variation_id, quantity in held)
+        for model, quantities in _by_model(restock):
+            model.objects.filter(pk__in=quantities).update(stock_quantity=F("stock_quantity") + _per_row(quantities))
+        _stock_changed(restock)
+        return StockReservation.objects.filter(pk__in=[row[0] for row in held]).update(status="released")
+
+
+def release_expired_reservations(now=None, cancel_orders=True):
+    """
+    Release held reservations past their expiry whose order was never paid
+    (no payment yet, or the payment is stuck initiated / failed) and cancel
+    those orders. Pending bank transfers awaiting review keep their hold.
+    Returns (reservations released, orders cancelled).
+    """
+    now = now or timezone.now()
+    expired = StockReservation.objects.filter(status="held", expires_at__lt=now).filter(
+        Q(order__payment__isnull=True) | Q(order__payment__status__in=UNPAID_PAYMENT_STATUSES)
+    )
+    order_ids = list(expired.values_list("order_id", flat=True).distinct())
+    if not order_ids:
+        return 0, 0
+
+    with transaction.atomic():
+        released = release_reservations(StockReservation.objects.filter(pk__in=expired.values("pk")))
+        cancelled = 0
+        if cancel_orders:
+            # orders.workflow builds on this module, so it is imported here
+            from .workflow import transition_orders
+
+            cancelled = len(transition_orders(
+                Order.objects.filter(pk__in=order_ids, status="pending"), "cancelled",
+                note="Stock reservation expired before payment",
+            ))
+    return released, cancelled
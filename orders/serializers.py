@@ -1,20 +1,52 @@
-from rest_framework import serializers
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
 from .models import Order, OrderItem, OrderHistory
-from cart.models import Cart
+from .reservations import InsufficientStock, reserve_stock
+from cart.coupons import CouponError, redeem_coupon, registry as coupon_registry
+from cart.models import Cart, CartItem
+from products.pricing import PriceResolver
 from shipping.models import ShippingAddress, ShippingMethod
 
 
+class OutOfStock(APIException):
+    """409 listing the short lines as InsufficientStock reports them (ids and counts stay numbers)."""
+    status_code = status.HTTP_409_CONFLICT
+    default_code = "out_of_stock"
+
+    def __init__(self, failures):
+        # APIException would turn every leaf into an ErrorDetail string
+        self.detail = {"stock": failures}
+
+
 # ----------------------------
 # ORDER ITEM
 # ----------------------------
 class OrderItemSerializer(serializers.ModelSerializer):
     # Flatten product details for frontend
     name = serializers.CharField(source="product.name", read_only=True)
-    image = serializers.ImageField(source="product.image", read_only=True)
+    image = serializers.SerializerMethodField()
+
+    variation = serializers.CharField(source="variation_name", read_only=True)
 
     class Meta:
         model = OrderItem
-        fields = ["id", "name", "price", "quantity", "image"]
+        fields = ["id", "name", "variation", "price", "quantity", "image"]
+
+    def get_image(self, obj):
+        """The product's featured image; expects `featured_images` prefetched (see OrderViewSet)."""
+        if obj.product is None:
+            return None
+        images = getattr(obj.product, "featured_images", None)
+        if images is None:
+            images = obj.product.images.filter(is_featured=True)[:1]
+        for image in images:
+            request = self.context.get("request")
+            return request.build_absolute_uri(image.image.url) if request else image.image.url
+        return None
 
 
 # ----------------------------
@@ -30,14 +62,23 @@ class OrderHistorySerializer(serializers.ModelSerializer):
 # SHIPPING ADDRESS (nested)
 # ----------------------------
 class ShippingAddressSerializer(serializers.ModelSerializer):
-    firstName = serializers.CharField(source="first_name")
-    lastName = serializers.CharField(source="last_name")
+    # ShippingAddress stores a single full_name; split it for the frontend
+    firstName = serializers.SerializerMethodField()
+    lastName = serializers.SerializerMethodField()
+    address = serializers.CharField(source="street_address")
     postalCode = serializers.CharField(source="postal_code")
 
     class Meta:
         model = ShippingAddress
         fields = ["firstName", "lastName", "address", "city", "postalCode"]
 
+    def get_firstName(self, obj):
+        return obj.full_name.split(" ", 1)[0]
+
+    def get_lastName(self, obj):
+        parts = obj.full_name.split(" ", 1)
+        return parts[1] if len(parts) > 1 else ""
+
 
 # ----------------------------
 # ORDER (READ-ONLY)
@@ -70,6 +111,29 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+# ----------------------------
+# ORDER SUMMARY (LIST)
+# ----------------------------
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Order list row; expects `item_count` annotated (see OrderViewSet.get_queryset)."""
+    itemCount = serializers.IntegerField(source="item_count", read_only=True)
+    createdAt = serializers.DateTimeField(source="created_at", read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ["id", "status", "total", "itemCount", "createdAt"]
+        read_only_fields = fields
+
+
+# ----------------------------
+# BULK TRANSITION
+# ----------------------------
+class BulkTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    note = serializers.CharField(required=False, allow_blank=True, default="")
+
+
 # ----------------------------
 # ORDER CREATE (CHECKOUT)
 # ----------------------------
@@ -90,6 +154,7 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             "shipping_method_id",
         ]
 
+    @transaction.atomic
     def create(self, validated_data):
         cart_id = validated_data.pop("cart_id")
         shipping_address_id = validated_data.pop("shipping_address_id")
@@ -101,12 +166,6 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             else None
         )
 
-        # ✅ Get cart
-        try:
-            cart = Cart.objects.get(id=cart_id, is_active=True)
-        except Cart.DoesNotExist:
-            raise serializers.ValidationError("Invalid or inactive cart.")
-
         # ✅ Get shipping address
         try:
             shipping_address = ShippingAddress.objects.get(
@@ -123,38 +182,73 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         except ShippingMethod.DoesNotExist:
             raise serializers.ValidationError("Invalid shipping method.")
 
-        # ✅ Create order
+        # ✅ Claim the cart: only one checkout can deactivate it, a second one sees it inactive
+        if not Cart.objects.filter(id=cart_id, is_active=True).update(is_active=False, updated_at=timezone.now()):
+            raise serializers.ValidationError("Invalid or inactive cart.")
+        coupon_id = Cart.objects.filter(id=cart_id).values_list("coupon_id", flat=True).first()
+        # product__category: scoped coupons match lines on the category path
+        lines = list(
+            CartItem.objects.filter(cart_id=cart_id).select_related("product__category", "variation").order_by("pk")
+        )
+        if not lines:
+            raise serializers.ValidationError("Cart is empty.")
+        # ✅ Charge current prices: a sale may have started or ended since a line was added
+        prices = PriceResolver.for_request(self.context.get("request"))
+        for line in lines:
+            line.price = prices.price(line.product, line.variation).unit
+
+        # ✅ Calculate totals in one pass over the lines
+        subtotal = sum((line.subtotal for line in lines), Decimal("0"))
+        discount = self._redeem_coupon(coupon_id, lines) if coupon_id else Decimal("0")
+        shipping_cost = shipping_method.base_cost
+
         order = Order.objects.create(
             user=user,
             shipping_address=shipping_address,
             shipping_method=shipping_method,
+            subtotal=subtotal,
+            discount=discount,
+            shipping_cost=shipping_cost,
+            total=subtotal - discount + shipping_cost,
             **validated_data,
         )
-
-        # ✅ Calculate totals
-        subtotal = 0
-        for item in cart.items.all():
-            subtotal += item.subtotal
-            OrderItem.objects.create(
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=item.price,
-                subtotal=item.subtotal,
+                product_id=line.product_id,
+                variation=line.variation,
+                variation_name=line.variation.name if line.variation else "",
+                variation_sku=line.variation.sku if line.variation else "",
+                quantity=line.quantity,
+                price=line.price,
+                subtotal=line.subtotal,
             )
+            for line in lines
+        ])
 
-        discount = cart.coupon.discount_amount if hasattr(cart, "coupon") and cart.coupon else 0
-        shipping_cost = shipping_method.base_cost
-        total = subtotal - discount + shipping_cost
-
-        order.subtotal = subtotal
-        order.discount = discount
-        order.shipping_cost = shipping_cost
-        order.total = total
-        order.save()
-
-        # ✅ Clear cart
-        cart.is_active = False
-        cart.save()
+        # ✅ Take the units off stock; any short line rolls the whole checkout back
+        try:
+            reserve_stock(order, [(line.product_id, line.variation_id, line.quantity) for line in lines])
+        except InsufficientStock as exc:
+            raise OutOfStock(exc.failures)
+
+        # ✅ Log initial history
+        OrderHistory.objects.create(
+            order=order,
+            status=order.status,
+            note="Order created during checkout",
+        )
 
         return order
+
+    def _redeem_coupon(self, coupon_id, lines):
+        """Discount of the cart's coupon, counting one use; any problem fails the checkout."""
+        coupon = coupon_registry.get_by_id(coupon_id)
+        try:
+            if coupon is None:
+                raise CouponError("Coupon is expired or inactive")
+            discount = coupon.discount(lines)
+            redeem_coupon(coupon_id)
+        except CouponError as exc:
+            raise serializers.ValidationError({"coupon": str(exc)})
+        return discount
@@ -1,3 +1,601 @@
-from django.test import TestCase
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from cart.models import Cart, CartItem, Coupon
+from payments.models import Payment
+from products.models import Category, Product, ProductImage, ProductVariation
+from shipping.models import Shipment, ShipmentHistory, ShippingAddress, ShippingMethod
+
+from .idempotency import idempotent
+from .models import IdempotencyKey, Order, OrderHistory, OrderItem, StockReservation
+from .reservations import InsufficientStock, release_expired_reservations, reserve_stock
+from .workflow import transition_order
+
+User = get_user_model()
+
+
+def make_product(category, name="Trail Runner", stock=5, **kwargs):
+    return Product.objects.create(
+        name=name, description="", category=category, price=Decimal("100.00"), stock_quantity=stock, **kwargs
+    )
+
+
+class StockReservationTest(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Shoes")
+        self.runner = make_product(self.category, stock=5)
+        self.boot = make_product(self.category, name="Hiking Boot", stock=1)
+        self.variation = ProductVariation.objects.create(
+            product=self.boot, name="42", price=Decimal("100.00"), sku="HB-42", stock_quantity=2,
+        )
+        self.order = Order.objects.create(email="c@example.com", full_name="Customer")
+
+    def test_reserve_decrements_stock_and_holds(self):
+        with transaction.atomic():
+            reserve_stock(self.order, [(self.runner.pk, None, 2), (self.runner.pk, None, 1), (self.boot.pk, self.variation.pk, 2)])
+
+        self.runner.refresh_from_db()
+        self.variation.refresh_from_db()
+        self.boot.refresh_from_db()
+        self.assertEqual((self.runner.stock_quantity, self.variation.stock_quantity, self.boot.stock_quantity), (2, 0, 1))
+        self.assertEqual(
+            sorted(self.order.reservations.values_list("product_id", "quantity", "status")),
+            sorted([(self.runner.pk, 3, "held"), (self.boot.pk, 2, "held")]),
+        )
+
+    def test_short_lines_are_reported_and_nothing_is_taken(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            with transaction.atomic():
+                reserve_stock(self.order, [(self.runner.pk, None, 2), (self.boot.pk, None, 3)])
+
+        self.assertEqual(
+            raised.exception.failures,
+            [{"product_id": self.boot.pk, "variation_id": None, "requested": 3, "available": 1}],
+        )
+        self.runner.refresh_from_db()
+        self.assertEqual(self.runner.stock_quantity, 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_sweeper_releases_only_unpaid_expired_holds(self):
+        paid_by_bank = Order.objects.create(email="b@example.com", full_name="Bank Customer")
+        stuck = Order.objects.create(email="s@example.com", full_name="Stuck Customer")
+        with transaction.atomic():
+            reserve_stock(self.order, [(self.runner.pk, None, 1)])
+            reserve_stock(paid_by_bank, [(self.runner.pk, None, 1)])
+            reserve_stock(stuck, [(self.runner.pk, None, 1)])
+        Payment.objects.create(order=paid_by_bank, method="bank", amount=Decimal("100.00"), status="pending")
+        Payment.objects.create(order=stuck, method="mpesa", amount=Decimal("100.00"), status="initiated")
+        user = User.objects.create_user(email="sweep@example.com", full_name="Sweep", password="password123")
+        address = ShippingAddress.objects.create(
+            user=user, full_name="Sweep", phone_number="0700000000", city="Nairobi", street_address="1 Road",
+        )
+        Shipment.objects.create(order=stuck, address=address)
+
+        self.assertEqual(release_expired_reservations(), (0, 0))  # nothing expired yet
+
+        later = timezone.now() + timedelta(hours=1)
+        self.assertEqual(release_expired_reservations(now=later), (2, 2))
+        self.runner.refresh_from_db()
+        self.assertEqual(self.runner.stock_quantity, 4)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "cancelled")
+        self.assertEqual(self.order.history.get().status, "cancelled")
+        self.assertEqual(paid_by_bank.reservations.get().status, "held")
+        # Cancelled through the workflow: the shipment follows
+        self.assertEqual(Shipment.objects.get(order=stuck).status, "cancelled")
+
+    def test_sweeper_command(self):
+        with transaction.atomic():
+            reserve_stock(self.order, [(self.runner.pk, None, 1)])
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        out = StringIO()
+        call_command("release_expired_reservations", stdout=out)
+        self.assertIn("Released 1 reservation(s), cancelled 1 order(s).", out.getvalue())
+
+
+class CheckoutStockTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="c@example.com", full_name="Customer", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name="Shoes")
+        self.product = make_product(category, stock=2)
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=3, price=self.product.price)
+        self.address = ShippingAddress.objects.create(
+            user=self.user, full_name="Customer", phone_number="0700000000", city="Nairobi", street_address="1 Road",
+        )
+        self.method = ShippingMethod.objects.create(name="Standard", base_cost=Decimal("300.00"))
+
+    def _checkout(self):
+        return self.client.post(reverse("orders:orders-list"), {
+            "cart_id": self.cart.pk, "email": "c@example.com", "full_name": "Customer",
+            "shipping_address_id": self.address.pk, "shipping_method_id": self.method.pk,
+        }, format="json")
+
+    def test_out_of_stock_checkout_rolls_back(self):
+        response = self._checkout()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["stock"][0]["available"], 2)
+        self.assertEqual(response.json()["stock"][0]["product_id"], self.product.pk)
+        self.assertFalse(Order.objects.exists())
+        self.cart.refresh_from_db()
+        self.assertTrue(self.cart.is_active)
+
+    def test_checkout_reserves_and_cancel_releases(self):
+        self.cart.items.update(quantity=2)
+        response = self._checkout()
+        self.assertEqual(response.status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+
+        order = Order.objects.get()
+        self.client.post(reverse("orders:orders-cancel", args=[order.pk]))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 2)
+        self.assertEqual(order.reservations.get().status, "released")
+
+
+class CheckoutQueryCountTest(TestCase):
+    """Checkout is one transaction whose query count does not depend on the cart size."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="c@example.com", full_name="Customer", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="Shoes")
+        self.address = ShippingAddress.objects.create(
+            user=self.user, full_name="Customer", phone_number="0700000000", city="Nairobi", street_address="1 Road",
+        )
+        self.method = ShippingMethod.objects.create(name="Standard", base_cost=Decimal("300.00"))
+
+    def _checkout(self, lines):
+        cart = Cart.objects.create(user=self.user)
+        for index in range(lines):
+            product = make_product(self.category, name=f"Product {lines}-{index}", stock=10)
+            CartItem.objects.create(cart=cart, product=product, quantity=2, price=product.price)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("orders:orders-list"), {
+                "cart_id": cart.pk, "email": "c@example.com", "full_name": "Customer",
+                "shipping_address_id": self.address.pk, "shipping_method_id": self.method.pk,
+            }, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return len(queries), Order.objects.get(pk=response.json()["id"])
+
+    def test_queries_are_constant_in_cart_size(self):
+        counts = {}
+        for lines in (1, 5, 25):
+            counts[lines], order = self._checkout(lines)
+            self.assertEqual(order.items.count(), lines)
+            self.assertEqual(order.subtotal, Decimal("200.00") * lines)
+            self.assertEqual(order.total, Decimal("200.00") * lines + Decimal("300.00"))
+            self.assertEqual(order.history.get().note, "Order created during checkout")
+        self.assertEqual(len(set(counts.values())), 1, counts)
+
+    def test_coupon_is_redeemed_at_checkout(self):
+        cache.clear()
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code="SAVE10", discount_percent=Decimal("10"), usage_limit=1,
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+        )
+        Cart.objects.filter(user=self.user).delete()
+
+        for attempt in range(2):
+            cart = Cart.objects.create(user=self.user, coupon=coupon)
+            product = make_product(self.category, name=f"Coupon Product {attempt}", stock=10)
+            CartItem.objects.create(cart=cart, product=product, quantity=1, price=product.price)
+            response = self.client.post(reverse("orders:orders-list"), {
+                "cart_id": cart.pk, "email": "c@example.com", "full_name": "Customer",
+                "shipping_address_id": self.address.pk, "shipping_method_id": self.method.pk,
+            }, format="json")
+            if attempt == 0:
+                self.assertEqual(response.status_code, 201)
+                order = Order.objects.get(pk=response.json()["id"])
+                self.assertEqual((order.discount, order.total), (Decimal("10.00"), Decimal("390.00")))
+            else:
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("coupon", response.json())
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.times_used, 1)
+
+    def test_checkout_copies_the_variation(self):
+        cart = Cart.objects.create(user=self.user)
+        product = make_product(self.category, name="Sized Product", stock=0)
+        size = ProductVariation.objects.create(
+            product=product, name="42", price=Decimal("110.00"), sku="SP-42", stock_quantity=3,
+        )
+        CartItem.objects.create(cart=cart, product=product, variation=size, quantity=2, price=size.price)
+
+        response = self.client.post(reverse("orders:orders-list"), {
+            "cart_id": cart.pk, "email": "c@example.com", "full_name": "Customer",
+            "shipping_address_id": self.address.pk, "shipping_method_id": self.method.pk,
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        item = Order.objects.get(pk=response.json()["id"]).items.get()
+        self.assertEqual(
+            (item.variation_id, item.variation_name, item.variation_sku, item.price), (size.pk, "42", "SP-42", size.price),
+        )
+        size.refresh_from_db()
+        self.assertEqual(size.stock_quantity, 1)
+
+    def test_checkout_charges_the_current_price(self):
+        cart = Cart.objects.create(user=self.user)
+        product = make_product(self.category, name="Sale Product", stock=10)
+        CartItem.objects.create(cart=cart, product=product, quantity=2, price=product.price)
+        product.discount_price = Decimal("60.00")
+        product.save()
+
+        response = self.client.post(reverse("orders:orders-list"), {
+            "cart_id": cart.pk, "email": "c@example.com", "full_name": "Customer",
+            "shipping_address_id": self.address.pk, "shipping_method_id": self.method.pk,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.json()["id"])
+        self.assertEqual(order.items.get().price, Decimal("60.00"))
+        self.assertEqual(order.subtotal, Decimal("120.00"))
+
+    def test_cart_cannot_be_checked_out_twice(self):
+        cart = Cart.objects.create(user=self.user, is_active=False)
+        response = self.client.post(reverse("orders:orders-list"), {
+            "cart_id": cart.pk, "email": "c@example.com", "full_name": "Customer",
+            "shipping_address_id": self.address.pk, "shipping_method_id": self.method.pk,
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderListTest(TestCase):
+
+    def setUp(self):
+        self.customer = User.objects.create_user(email="c@example.com", full_name="Customer", password="password123")
+        self.staff = User.objects.create_user(
+            email="s@example.com", full_name="Staff", password="password123", is_staff=True,
+        )
+        self.product = make_product(Category.objects.create(name="Shoes"))
+        ProductImage.objects.create(product=self.product, image="products/runner.jpg", is_featured=True)
+        now = timezone.now()
+        self.orders = []
+        rows = [(1, "pending", "C@Example.com"), (5, "paid", "c@example.com"), (9, "shipped", "x@example.com")]
+        for days, status, email in rows:
+            order = Order.objects.create(
+                user=self.customer, email=email, full_name="Customer", status=status,
+                total=Decimal("200.00"), created_at=now - timedelta(days=days),
+            )
+            OrderItem.objects.create(
+                order=order, product=self.product, quantity=2, price=Decimal("100.00"), subtotal=Decimal("200.00"),
+            )
+            OrderItem.objects.create(
+                order=order, product=None, quantity=1, price=Decimal("5.00"), subtotal=Decimal("5.00"),
+            )
+            self.orders.append(order)
+        self.client = APIClient()
+
+    def _list(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse("orders:orders-list"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_list_returns_summaries(self):
+        rows = self._list(self.customer)
+        self.assertEqual([row["id"] for row in rows], [order.pk for order in self.orders])
+        self.assertEqual(set(rows[0]), {"id", "status", "total", "itemCount", "createdAt"})
+        self.assertEqual(rows[0]["itemCount"], 3)
+
+    def test_staff_filters(self):
+        other = User.objects.create_user(email="o@example.com", full_name="Other", password="password123")
+        self.assertEqual(self._list(other), [])
+
+        ids = lambda rows: [row["id"] for row in rows]
+        first, second, third = (order.pk for order in self.orders)
+        self.assertEqual(ids(self._list(self.staff, status="paid,shipped")), [second, third])
+        self.assertEqual(ids(self._list(self.staff, email="c@EXAMPLE.com")), [first, second])
+        self.assertEqual(ids(self._list(self.staff, search=str(third))), [third])
+        after = (timezone.now() - timedelta(days=6)).isoformat()
+        self.assertEqual(ids(self._list(self.staff, created_after=after, status="pending")), [first])
+
+    def test_detail_nests_items_with_featured_image(self):
+        self.client.force_authenticate(self.customer)
+        with self.assertNumQueries(4):  # order, items + products, featured images, history
+            response = self.client.get(reverse("orders:orders-detail", args=[self.orders[0].pk]))
+        items = response.json()["items"]
+        self.assertTrue(any(item["image"] and item["image"].endswith("runner.jpg") for item in items))
+        self.assertIn(None, [item["image"] for item in items])
+
+
+class OrderWorkflowTest(TestCase):
+
+    def setUp(self):
+        self.customer = User.objects.create_user(email="c@example.com", full_name="Customer", password="password123")
+        self.staff = User.objects.create_user(
+            email="s@example.com", full_name="Staff", password="password123", is_staff=True,
+        )
+        self.address = ShippingAddress.objects.create(
+            user=self.customer, full_name="Customer", phone_number="0700000000", city="Nairobi", street_address="1 Road",
+        )
+        self.product = make_product(Category.objects.create(name="Shoes"), stock=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def _orders(self, count, status="paid", shipment=True):
+        orders = []
+        for _ in range(count):
+            order = Order.objects.create(user=self.customer, email="c@example.com", full_name="Customer", status=status)
+            if shipment:
+                Shipment.objects.create(order=order, address=self.address)
+            orders.append(order)
+        return orders
+
+    def _bulk(self, orders, status):
+        return self.client.post(
+            reverse("orders:orders-bulk-transition"),
+            {"ids": [order.pk for order in orders], "status": status, "note": "Batch 7"}, format="json",
+        )
+
+    def test_bulk_ship_moves_orders_shipments_and_history(self):
+        counts = {}
+        for size in (3, 40):
+            orders = self._orders(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self._bulk(orders, "shipped")
+            self.assertEqual(response.json(), {"status": "shipped", "updated": size})
+            counts[size] = len(queries)
+
+            ids = [order.pk for order in orders]
+            self.assertEqual(set(Order.objects.filter(pk__in=ids).values_list("status", flat=True)), {"shipped"})
+            shipments = Shipment.objects.filter(order_id__in=ids)
+            self.assertFalse(shipments.exclude(status="shipped").exists())
+            self.assertFalse(shipments.filter(shipped_at__isnull=True).exists())
+            self.assertEqual(OrderHistory.objects.filter(order_id__in=ids, note="Batch 7").count(), size)
+            self.assertEqual(ShipmentHistory.objects.filter(shipment__order_id__in=ids).count(), size)
+        self.assertEqual(counts[3], counts[40])
+
+    def test_bulk_is_all_or_nothing(self):
+        orders = self._orders(2) + self._orders(1, status="pending")
+        response = self._bulk(orders + [Order(pk=999999)], "shipped")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()["errors"]), {str(orders[2].pk)})
+        self.assertFalse(Order.objects.filter(status="shipped").exists())
+
+        response = self._bulk(orders[:2] + [Order(pk=999999)], "shipped")
+        self.assertEqual(set(response.json()["errors"]), {"999999"})
+        self.assertFalse(Order.objects.filter(status="shipped").exists())
+
+    def test_cancelling_a_paid_order_restocks_and_flags_the_payment(self):
+        (order,) = self._orders(1, status="pending")
+        with transaction.atomic():
+            reserve_stock(order, [(self.product.pk, None, 4)])
+        payment = Payment.objects.create(order=order, method="mpesa", amount=Decimal("400.00"), status="successful")
+        transition_order(order, "paid")
+        self.assertEqual(order.reservations.get().status, "committed")
+
+        self.client.force_authenticate(self.customer)
+        response = self.client.post(reverse("orders:orders-cancel", args=[order.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("cancelled", [entry["status"] for entry in response.json()["history"]])
+
+        self.product.refresh_from_db()
+        payment.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 100)
+        self.assertEqual(order.reservations.get().status, "released")
+        self.assertTrue(payment.reversal_requested)
+        self.assertEqual(Shipment.objects.get(order=order).status, "cancelled")
+
+        response = self.client.post(reverse("orders:orders-cancel", args=[order.pk]))
+        self.assertEqual(response.status_code, 400)
+
+    def test_orders_cannot_be_deleted_through_the_api(self):
+        (order,) = self._orders(1, status="pending")
+        with transaction.atomic():
+            reserve_stock(order, [(self.product.pk, None, 4)])
+
+        response = self.client.delete(reverse("orders:orders-detail", args=[order.pk]))
+
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(order.reservations.get().status, "held")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 96)
+
+    def test_update_status_rejects_illegal_moves(self):
+        (order,) = self._orders(1, status="pending", shipment=False)
+        url = reverse("orders:orders-update-status", args=[order.pk])
+        self.assertEqual(self.client.post(url, {"status": "delivered"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"status": "paid"}).json()["status"], "paid")
+
+    def test_shipment_updates_move_the_order(self):
+        (order,) = self._orders(1)
+        url = reverse("shipping:shipment-update-status", args=[order.shipment.pk])
+        for status, order_status in [("in_transit", "paid"), ("shipped", "shipped"), ("delivered", "delivered")]:
+            response = self.client.post(url, {"status": status})
+            order.refresh_from_db()
+            self.assertEqual(order.status, order_status, response.content)
+
+        (unpaid,) = self._orders(1, status="pending")
+        url = reverse("shipping:shipment-update-status", args=[unpaid.shipment.pk])
+        self.assertEqual(self.client.post(url, {"status": "shipped"}).status_code, 400)
+        self.assertEqual(Shipment.objects.get(order=unpaid).status, "pending")
+
+
+class IdempotencyTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="c@example.com", full_name="Customer", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = make_product(Category.objects.create(name="Shoes"), stock=5)
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2, price=self.product.price)
+        self.address = ShippingAddress.objects.create(
+            user=self.user, full_name="Customer", phone_number="0700000000", city="Nairobi", street_address="1 Road",
+        )
+        self.method = ShippingMethod.objects.create(name="Standard", base_cost=Decimal("300.00"))
+        self.order = Order.objects.create(user=self.user, email="c@example.com", full_name="Customer", total=500)
+
+    def _checkout(self, key, **overrides):
+        payload = {
+            "cart_id": self.cart.pk, "email": "c@example.com", "full_name": "Customer",
+            "shipping_address_id": self.address.pk, "shipping_method_id": self.method.pk, **overrides,
+        }
+        return self.client.post(reverse("orders:orders-list"), payload, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def _receipt(self):
+        buffer = BytesIO()
+        Image.new("RGB", (2, 2)).save(buffer, format="PNG")
+        return SimpleUploadedFile("receipt.png", buffer.getvalue(), content_type="image/png")
+
+    def test_retried_checkout_replays_the_first_order(self):
+        first = self._checkout("checkout-1")
+        retry = self._checkout("checkout-1")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.filter(items__isnull=False).count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+
+    def test_guest_keys_are_scoped_to_their_session(self):
+        class GuestView(APIView):
+            permission_classes = [AllowAny]
+
+            @idempotent("tests:guest")
+            def post(self, request):
+                return Response({"email": request.data["email"]}, status=201)
+
+        def post(email, session_key=None):
+            request = APIRequestFactory().post("/", {"email": email}, format="json", HTTP_IDEMPOTENCY_KEY="same-key")
+            request.session = SessionStore(session_key)
+            return GuestView.as_view()(request)
+
+        first, second = SessionStore(), SessionStore()
+        first.create(), second.create()
+        responses = [post("one@example.com", first.session_key), post("two@example.com", second.session_key)]
+        # Neither guest sees the other's response, nor a 422 for "their" reused key
+        self.assertEqual([r.data["email"] for r in responses], ["one@example.com", "two@example.com"])
+        self.assertNotIn("Idempotent-Replayed", responses[1])
+        self.assertEqual(post("one@example.com", first.session_key)["Idempotent-Replayed"], "true")
+
+        sessionless = post("three@example.com")
+        self.assertEqual(sessionless.status_code, 400)
+        self.assertIn("guest session", sessionless.data["error"])
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        self._checkout("checkout-1")
+        response = self._checkout("checkout-1", full_name="Someone Else")
+        self.assertEqual(response.status_code, 422)
+
+    def test_failed_request_frees_the_key(self):
+        self.cart.is_active = False
+        self.cart.save()
+        self.assertEqual(self._checkout("checkout-1").status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        self.cart.is_active = True
+        self.cart.save()
+        self.assertEqual(self._checkout("checkout-1").status_code, 201)
+
+    def test_expired_key_runs_again(self):
+        self._checkout("checkout-1")
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        # The cart is used up, so a fresh run fails instead of replaying the order
+        self.assertEqual(self._checkout("checkout-1").status_code, 400)
+
+        out = StringIO()
+        call_command("purge_idempotency_keys", stdout=out)
+        self.assertIn("Deleted 1 expired idempotency key(s).", out.getvalue())
+
+    @mock.patch("payments.views.MpesaClient")
+    def test_retried_stk_push_is_sent_once(self, client_class):
+        client_class.return_value.stk_push.return_value = {"MerchantRequestID": "m-1", "CheckoutRequestID": "c-1"}
+        payload = {"order": self.order.pk, "amount": "500.00", "phone_number": "254700000000"}
+        url = reverse("payments:mpesa-initiate")
+
+        first = self.client.post(url, payload, format="json", HTTP_IDEMPOTENCY_KEY="pay-1")
+        retry = self.client.post(url, payload, format="json", HTTP_IDEMPOTENCY_KEY="pay-1")
+
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json(), first.json())
+        client_class.return_value.stk_push.assert_called_once()
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_retried_bank_transfer_is_recorded_once(self):
+        url = reverse("payments:bank-transfer")
+        for _ in range(2):
+            response = self.client.post(url, {
+                "order": self.order.pk, "amount": "500.00", "reference_number": "REF1", "receipt_image": self._receipt(),
+            }, format="multipart", HTTP_IDEMPOTENCY_KEY="bank-1")
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(Payment.objects.filter(order=self.order).count(), 1)
+
+
+class ConcurrentReservationTest(TransactionTestCase):
+    """Many threads race for the last units; the conditional UPDATE must never oversell."""
+
+    THREADS = 12
+    STOCK = 5
+
+    def setUp(self):
+        category = Category.objects.create(name="Shoes")
+        self.product = make_product(category, stock=self.STOCK)
+        self.orders = [Order.objects.create(email=f"c{i}@example.com", full_name="Customer") for i in range(self.THREADS)]
+
+    def _checkout(self, order, outcomes, barrier):
+        try:
+            barrier.wait()
+            for _ in range(200):
+                try:
+                    with transaction.atomic():
+                        reserve_stock(order, [(self.product.pk, None, 1)])
+                    outcomes.append("reserved")
+                    return
+                except InsufficientStock:
+                    outcomes.append("sold out")
+                    return
+                except OperationalError:
+                    continue  # SQLite table lock held by another writer: retry
+            outcomes.append("gave up")
+        finally:
+            connection.close()
+
+    def test_last_units_are_sold_exactly_once(self):
+        outcomes, barrier = [], threading.Barrier(self.THREADS)
+        threads = [
+            threading.Thread(target=self._checkout, args=(order, outcomes, barrier)) for order in self.orders
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.product.refresh_from_db()
+        self.assertEqual(outcomes.count("reserved"), self.STOCK)
+        self.assertEqual(outcomes.count("sold out"), self.THREADS - self.STOCK)
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertEqual(StockReservation.objects.count(), self.STOCK)
@@ -1,59 +1,94 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-
-from .models import Order, OrderHistory
+from django.db import transaction
+from django.db.models import Prefetch, Sum
+from django.db.models.functions import Coalesce
+
+from core.pagination import KeysetPagination
+from products.models import ProductImage
+from .filters import OrderFilter
+from .idempotency import idempotent
+from .models import Order, OrderItem
 from .serializers import (
+    BulkTransitionSerializer,
     OrderSerializer,
+    OrderSummarySerializer,
     OrderCreateSerializer,
     OrderHistorySerializer,
 )
+from .workflow import TransitionError, transition_order, transition_orders
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.UpdateModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
     """
     Handles checkout and order management.
-    - Users can list and view their orders.
+    - Users can list and view their orders (staff see every order). Lists return
+      compact summaries, filterable by status, date range and email
+      (see orders.filters.OrderFilter); retrieve returns the full order.
     - Checkout converts cart -> order.
     - Admins can update order status.
+    - Orders are never deleted: that would drop their stock reservations without
+      putting the units back. Cancel them instead (orders.workflow).
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
+    filterset_class = OrderFilter
 
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return Order.objects.all()
-        if user.is_authenticated:
-            return (
-                Order.objects.filter(user=user)
-                .select_related("shipping_address", "shipping_method")
-                .prefetch_related("items", "history")
-            )
-        return Order.objects.none()
+            queryset = Order.objects.all()
+        elif user.is_authenticated:
+            queryset = Order.objects.filter(user=user)
+        else:
+            return Order.objects.none()
+
+        if self.action == "list":
+            # Summaries only: units per order in the same query as the page
+            return queryset.annotate(item_count=Coalesce(Sum("items__quantity"), 0))
+        if self.action == "history":
+            return queryset
+        return queryset.select_related("shipping_address", "shipping_method").prefetch_related(
+            Prefetch(
+                "items",
+                queryset=OrderItem.objects.select_related("product").prefetch_related(
+                    Prefetch(
+                        "product__images",
+                        queryset=ProductImage.objects.filter(is_featured=True),
+                        to_attr="featured_images",
+                    )
+                ),
+            ),
+            "history",
+        )
 
     def get_serializer_class(self):
         if self.action == "create":
             return OrderCreateSerializer
+        if self.action == "list":
+            return OrderSummarySerializer
         return OrderSerializer
 
-    def perform_create(self, serializer):
-        """Create order during checkout"""
-        order = serializer.save()
-        # ✅ Log initial history
-        OrderHistory.objects.create(
-            order=order,
-            status=order.status,
-            note="Order created during checkout",
-        )
+    @idempotent("orders:checkout")
+    def create(self, request, *args, **kwargs):
+        """Checkout; a retry with the same Idempotency-Key returns the first order"""
+        return super().create(request, *args, **kwargs)
 
     # ----------------------------
     # Custom actions
     # ----------------------------
     @action(detail=True, methods=["post"], permission_classes=[IsAdminUser])
     def update_status(self, request, pk=None):
-        """Admins can update the order status"""
+        """Admins move an order along the workflow (see orders.workflow)"""
         order = self.get_object()
         new_status = request.data.get("status")
         valid_statuses = dict(Order.STATUS_CHOICES).keys()
@@ -64,17 +99,38 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        order.status = new_status
-        order.save()
-
-        # Save history
-        OrderHistory.objects.create(
-            order=order,
-            status=new_status,
-            note="Status updated by admin",
-        )
-
-        return Response(OrderSerializer(order).data)
+        try:
+            transition_order(order, new_status, note=request.data.get("note") or "Status updated by admin")
+        except TransitionError as exc:
+            return Response({"error": exc.errors[order.pk]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Re-read: the history prefetched by get_object() predates the move
+        return Response(OrderSerializer(self.get_object(), context=self.get_serializer_context()).data)
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAdminUser], url_path="bulk-transition")
+    def bulk_transition(self, request):
+        """
+        Move many orders at once, e.g. a warehouse batch marked shipped:
+        {"ids": [1, 2, 3], "status": "shipped", "note": "Batch 42"}.
+        One transaction: if any order cannot make the move nothing changes
+        and the errors are keyed by order id.
+        """
+        serializer = BulkTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = set(serializer.validated_data["ids"])
+        target = serializer.validated_data["status"]
+
+        try:
+            with transaction.atomic():
+                moved = transition_orders(
+                    Order.objects.filter(pk__in=ids), target, note=serializer.validated_data["note"],
+                )
+                missing = ids - {order.pk for order in moved}
+                if missing:
+                    raise TransitionError({pk: f"Order {pk} does not exist." for pk in sorted(missing)})
+        except TransitionError as exc:
+            return Response({"errors": exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"status": target, "updated": len(moved)})
 
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
     def history(self, request, pk=None):
@@ -94,20 +150,15 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        if order.status in ["shipped", "delivered", "cancelled"]:
+        # Releases the reserved stock and flags a successful payment for reversal
+        try:
+            transition_order(order, "cancelled", note="Order cancelled by user")
+        except TransitionError:
             return Response(
                 {"error": "Order cannot be cancelled at this stage"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        order.status = "cancelled"
-        order.save()
-
-        # Save history
-        OrderHistory.objects.create(
-            order=order,
-            status="cancelled",
-            note="Order cancelled by user",
+        return Response(
+            OrderSerializer(self.get_object(), context=self.get_serializer_context()).data, status=status.HTTP_200_OK,
         )
-
-        return Response(OrderSerializer(order).data, status=status.HTTP_200_OK)
@@ -0,0 +1,176 @@
+"""
+Order and shipment status workflow.
+
+Allowed moves are declared in ORDER_TRANSITIONS / SHIPMENT_TRANSITIONS, and
+every status change goes through `transition_orders()` or
+`transition_shipments()`. They move a whole batch at once: the rows are
+locked, every move is validated before anything is written, and then one
+UPDATE per status, one history insert and the side effects run in a single
+transaction. The query count does not depend on how many orders move.
+
+Side effects of an order move:
+- paid:      held stock reservations are committed;
+- cancelled: held and committed reservations go back on stock, and
+             successful payments are flagged `reversal_requested` for
+             finance to refund;
+- shipped / delivered / cancelled: the order's shipment follows
+  (ORDER_TO_SHIPMENT), when that is a legal shipment move.
+
+A shipment move also carries its order along (SHIPMENT_TO_ORDER), so the two
+never drift: a shipment can only be shipped once its order is paid.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from payments.models import Payment
+from shipping.models import Shipment, ShipmentHistory
+
+from .models import Order, OrderHistory, StockReservation
+from .reservations import commit_reservations, release_reservations
+
+ORDER_TRANSITIONS = {
+    "pending": {"paid", "cancelled"},
+    "paid": {"shipped", "cancelled"},
+    "shipped": {"delivered"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+SHIPMENT_TRANSITIONS = {
+    "pending": {"processing", "shipped", "cancelled"},
+    "processing": {"shipped", "cancelled"},
+    "shipped": {"in_transit", "out_for_delivery", "delivered"},
+    "in_transit": {"out_for_delivery", "delivered"},
+    "out_for_delivery": {"delivered"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+# Shipment status an order move pushes its shipment to, and the other way round
+ORDER_TO_SHIPMENT = {"shipped": "shipped", "delivered": "delivered", "cancelled": "cancelled"}
+SHIPMENT_TO_ORDER = {
+    "shipped": "shipped", "in_transit": "shipped", "out_for_delivery": "shipped", "delivered": "delivered",
+}
+
+# Lock and write at most this many rows per statement
+BATCH_SIZE = 500
+
+
+class TransitionError(Exception):
+    """One or more rows cannot make the move; `errors` maps row id to a message safe to show staff."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid transition(s)")
+
+
+def can_transition(transitions, current, target):
+    return target in transitions.get(current, ())
+
+
+def _locked(queryset):
+    return list(queryset.select_for_update().order_by("pk"))
+
+
+def _check(rows, transitions, target, label):
+    errors = {
+        row.pk: f"{label} {row.pk} cannot move from {row.status} to {target}."
+        for row in rows
+        if not can_transition(transitions, row.status, target)
+    }
+    if errors:
+        raise TransitionError(errors)
+
+
+# ----------------------------
+# ORDERS
+# ----------------------------
+@transaction.atomic
+def transition_orders(orders, target, note="", sync_shipments=True):
+    """
+    Move every order in `orders` (a queryset) to `target` with its side effects.
+    All or nothing: raises TransitionError listing every order that cannot move.
+    Returns the moved orders, locked and updated in memory.
+    """
+    rows = _locked(orders)
+    _check(rows, ORDER_TRANSITIONS, target, "Order")
+    if not rows:
+        return rows
+
+    now = timezone.now()
+    ids = [order.pk for order in rows]
+    Order.objects.filter(pk__in=ids).update(status=target, updated_at=now)
+    OrderHistory.objects.bulk_create(
+        [OrderHistory(order_id=pk, status=target, note=note) for pk in ids], batch_size=BATCH_SIZE,
+    )
+    for order in rows:
+        order.status, order.updated_at = target, now
+
+    if target == "paid":
+        commit_reservations(*ids)
+    elif target == "cancelled":
+        # Held units and, for orders already paid, committed ones go back on stock
+        release_reservations(StockReservation.objects.filter(order_id__in=ids), statuses=("held", "committed"))
+        Payment.objects.filter(order_id__in=ids, status="successful").update(reversal_requested=True)
+    if sync_shipments and target in ORDER_TO_SHIPMENT:
+        _follow(
+            Shipment.objects.filter(order_id__in=ids), ORDER_TO_SHIPMENT[target], note or f"Order {target}",
+        )
+    return rows
+
+
+def transition_order(order, target, note=""):
+    """Move one order; `order` is updated in place and returned."""
+    (moved,) = transition_orders(Order.objects.filter(pk=order.pk), target, note)
+    order.status, order.updated_at = moved.status, moved.updated_at
+    return order
+
+
+# ----------------------------
+# SHIPMENTS
+# ----------------------------
+def _move_shipments(rows, target, note, now):
+    ids = [shipment.pk for shipment in rows]
+    stamps = {}
+    if target == "shipped":
+        stamps["shipped_at"] = Coalesce(F("shipped_at"), now)
+    elif target == "delivered":
+        stamps["delivered_at"] = Coalesce(F("delivered_at"), now)
+    Shipment.objects.filter(pk__in=ids).update(status=target, **stamps)
+    ShipmentHistory.objects.bulk_create(
+        [ShipmentHistory(shipment_id=s.pk, old_status=s.status, new_status=target, note=note) for s in rows],
+        batch_size=BATCH_SIZE,
+    )
+    for shipment in rows:
+        shipment.status = target
+
+
+def _follow(shipments, target, note):
+    """Move the shipments an order move drags along; ones that cannot make the move are left alone."""
+    rows = [s for s in _locked(shipments) if can_transition(SHIPMENT_TRANSITIONS, s.status, target)]
+    if rows:
+        _move_shipments(rows, target, note, timezone.now())
+
+
+@transaction.atomic
+def transition_shipments(shipments, target, note=""):
+    """
+    Move every shipment in `shipments` (a queryset) to `target`, and their orders
+    along with them (SHIPMENT_TO_ORDER). All or nothing: raises TransitionError
+    if a shipment, or an order that has to follow, cannot make the move.
+    Returns the moved shipments.
+    """
+    rows = _locked(shipments)
+    _check(rows, SHIPMENT_TRANSITIONS, target, "Shipment")
+    if not rows:
+        return rows
+
+    order_target = SHIPMENT_TO_ORDER.get(target)
+    if order_target:
+        # Orders already there (e.g. the second leg of a shipped -> in_transit move) stay as they are
+        orders = Order.objects.filter(pk__in=[s.order_id for s in rows]).exclude(status=order_target)
+        transition_orders(orders, order_target, note or f"Shipment {target}", sync_shipments=False)
+    _move_shipments(rows, target, note, timezone.now())
+    return rows
@@ -1,4 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
+
+from orders.models import Order
+from orders.workflow import transition_orders
 from .models import Payment, PaymentLog
 
 
@@ -18,10 +22,11 @@ class PaymentAdmin(admin.ModelAdmin):
         "method",
         "amount",
         "status",
+        "reversal_requested",
         "transaction_id",
         "created_at",
     )
-    list_filter = ("method", "status", "created_at")
+    list_filter = ("method", "status", "reversal_requested", "created_at")
     search_fields = (
         "transaction_id",
         "reference_number",
@@ -72,7 +77,12 @@ class PaymentAdmin(admin.ModelAdmin):
     actions = ["mark_successful", "mark_failed"]
 
     def mark_successful(self, request, queryset):
-        updated = queryset.update(status="successful")
+        with transaction.atomic():
+            updated = queryset.update(status="successful")
+            # Their pending orders are now paid, which commits the held stock
+            transition_orders(
+                Order.objects.filter(payment__in=queryset, status="pending"), "paid", note="Payment approved by admin",
+            )
         self.message_user(request, f"{updated} payment(s) marked as successful.")
     mark_successful.short_description = "Mark selected payments as successful"
 
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='reversal_requested',
+            field=models.BooleanField(default=False),
+        ),
+    ]
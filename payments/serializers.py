@@ -68,7 +68,7 @@ class MpesaPaymentInitSerializer(serializers.ModelSerializer):
         order = attrs.get("order")
         amount = attrs.get("amount")
 
-        if order.payment:  # One-to-one relation, ensure no duplicate
+        if hasattr(order, "payment"):  # One-to-one relation, ensure no duplicate
             raise serializers.ValidationError("This order already has a payment.")
 
         if amount <= 0:
@@ -90,7 +90,7 @@ class BankTransferSerializer(serializers.ModelSerializer):
         order = attrs.get("order")
         amount = attrs.get("amount")
 
-        if order.payment:
+        if hasattr(order, "payment"):
             raise serializers.ValidationError("This order already has a payment.")
 
         if amount <= 0:
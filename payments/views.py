@@ -2,9 +2,13 @@ from rest_framework import generics, status, viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django_daraja.mpesa.core import MpesaClient
 
+from core.pagination import KeysetPagination
+from orders.idempotency import idempotent
+from orders.workflow import transition_order
 from .models import Payment, PaymentLog
 from .serializers import (
     PaymentSerializer,
@@ -18,9 +22,10 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
     """
     View payments (for users/admin).
     """
-    queryset = Payment.objects.all().select_related("order", "user")
+    queryset = Payment.objects.all().select_related("order", "user").prefetch_related("logs")
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # Normal users see only their own payments
@@ -36,6 +41,7 @@ class MpesaPaymentInitView(APIView):
 
     permission_classes = [IsAuthenticated]
 
+    @idempotent("payments:mpesa-initiate")
     def post(self, request):
         serializer = MpesaPaymentInitSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -107,10 +113,21 @@ class MpesaCallbackView(APIView):
             else:
                 payment.status = "failed"
 
-            payment.save()
+            with transaction.atomic():
+                payment.save()
+                if payment.status == "successful":
+                    self._mark_order_paid(payment)
 
         return Response({"ResultCode": 0, "ResultDesc": "Accepted"})
 
+    def _mark_order_paid(self, payment):
+        if payment.order.status == "pending":
+            transition_order(payment.order, "paid", note="M-Pesa payment confirmed")
+        elif payment.order.status == "cancelled":
+            # Paid after the order was cancelled (e.g. its reservation expired): refund it
+            payment.reversal_requested = True
+            payment.save(update_fields=["reversal_requested", "updated_at"])
+
 
 class BankTransferView(APIView):
     """
@@ -119,6 +136,7 @@ class BankTransferView(APIView):
 
     permission_classes = [IsAuthenticated]
 
+    @idempotent("payments:bank-transfer")
     def post(self, request):
         serializer = BankTransferSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
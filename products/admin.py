@@ -16,10 +16,11 @@ from .models import (
 # ----------------------------
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ("name", "parent", "is_active", "created_at")
+    list_display = ("name", "parent", "depth", "is_active", "created_at")
     list_filter = ("is_active", "created_at")
     search_fields = ("name", "description")
     prepopulated_fields = {"slug": ("name",)}
+    readonly_fields = ("path", "depth")
     ordering = ("name",)
 
 
@@ -70,9 +71,12 @@ class ProductAdmin(admin.ModelAdmin):
         "brand",
         "price",
         "discount_price",
+        "sale_starts_at",
+        "sale_ends_at",
         "stock_quantity",
         "availability",
-        "average_rating",
+        "rating_avg",
+        "rating_count",
         "is_active",
         "is_featured",
         "is_on_sale",
@@ -89,7 +93,7 @@ class ProductAdmin(admin.ModelAdmin):
     )
     search_fields = ("name", "description", "sku")
     prepopulated_fields = {"slug": ("name",)}
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = ("rating_avg", "rating_count", "rating_sum", "created_at", "updated_at")
     ordering = ("-created_at",)
     inlines = [ProductImageInline, ProductVariationInline]
 
@@ -0,0 +1,476 @@
+"""
+Bulk catalog import / export.
+
+Import reads CSV or JSONL as a stream, validates each product with
+ProductImportSerializer and upserts products and variations by `sku` in
+`bulk_create(update_conflicts=True)` batches. Categories and brands are
+resolved by slug from maps loaded once. A bad row is reported and skipped;
+if a batch still hits an integrity error it is replayed row by row so only
+the offending products fail. A file that stops decoding or parsing part way
+is reported as one error; the products read before that point are kept.
+
+CSV carries one row per variation, repeating the product columns (consecutive
+rows with the same `sku` form one product); `images` is a `|`-separated list.
+JSONL carries one product per line with nested `variations` / `images` lists.
+
+Export streams the same formats back out in primary-key batches, so the
+result can be fed straight back into import.
+
+Price / stock syncs (`apply_price_stock_updates`) patch products and
+variations by sku with chunked bulk_update calls in one transaction. Rows are
+locked while patched and only the fields a record supplies are written, so a
+price-only sync never writes back a stock count checkout has since decremented.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from itertools import groupby
+
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Sum
+from django.utils import timezone
+from django.utils.text import slugify
+
+from core.cache import bump_generation
+
+from .models import Brand, Category, Product, ProductImage, ProductVariation
+from .search import get_search_backend
+from .serializers import PriceStockUpdateSerializer, ProductImportSerializer
+
+FORMATS = ("csv", "jsonl")
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+PRODUCT_COLUMNS = [
+    "sku", "name", "slug", "description", "category", "brand", "price", "discount_price",
+    "stock_quantity", "availability", "is_active", "is_featured", "seo_title", "seo_description", "images",
+]
+VARIATION_COLUMNS = ["sku", "name", "price", "stock_quantity", "is_active"]
+CSV_COLUMNS = PRODUCT_COLUMNS + [f"variation_{column}" for column in VARIATION_COLUMNS]
+
+PRODUCT_UPDATE_FIELDS = [
+    "name", "slug", "description", "category", "brand", "price", "discount_price", "is_on_sale",
+    "stock_quantity", "availability", "is_active", "is_featured", "seo_title", "seo_description", "updated_at",
+]
+VARIATION_UPDATE_FIELDS = ["product", "name", "price", "stock_quantity", "is_active"]
+
+
+def detect_format(filename, default="csv"):
+    extension = filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    return default
+
+
+# ----------------------------
+# READERS: (line number, raw product dict)
+# ----------------------------
+def _present(row):
+    """Drop empty CSV cells so serializer defaults apply."""
+    return {key: value for key, value in row.items() if key and value not in ("", None)}
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    rows = ((reader.line_num, _present(row)) for row in reader)
+    for sku, group in groupby(rows, key=lambda item: item[1].get("sku")):
+        group = list(group)
+        line, product = group[0][0], {}
+        variations = []
+        for _, row in group:
+            for column in PRODUCT_COLUMNS:
+                if column in row:
+                    product.setdefault(column, row[column])
+            variation = {
+                column: row[f"variation_{column}"] for column in VARIATION_COLUMNS if f"variation_{column}" in row
+            }
+            if variation:
+                variations.append(variation)
+        if "images" in product:
+            product["images"] = [image.strip() for image in product["images"].split("|") if image.strip()]
+        if variations:
+            product["variations"] = variations
+        yield line, product
+
+
+def read_jsonl(stream):
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            product = json.loads(text)
+        except ValueError as exc:
+            yield line, ValueError(f"Invalid JSON: {exc}")
+            continue
+        yield line, product if isinstance(product, dict) else ValueError("Each line must be a JSON object.")
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+# ----------------------------
+# IMPORT
+# ----------------------------
+class ProductImporter:
+    """
+    Stream products from a text file object into the catalog.
+
+        result = ProductImporter().run(open("catalog.csv", newline=""), "csv")
+
+    Returns {"created", "updated", "failed", "errors": [{"line", "sku", "errors"}]}.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.categories = dict(Category.objects.values_list("slug", "id"))
+        self.brands = dict(Brand.objects.values_list("slug", "id"))
+        # slug -> sku of every stored product, to keep generated slugs unique
+        self.slug_owners = dict(Product.objects.values_list("slug", "sku").iterator())
+        self.existing_skus = {sku for sku in self.slug_owners.values() if sku}
+        self.result = {"created": 0, "updated": 0, "failed": 0, "errors": []}
+        self.touched_ids = []
+
+    def run(self, stream, file_format):
+        batch, batch_skus, line = [], set(), 0
+        try:
+            for line, raw in READERS[file_format](stream):
+                record = self.clean(line, raw)
+                if record is None:
+                    continue
+                # An upsert may touch each sku once per statement
+                if record["product"].sku in batch_skus or len(batch) >= self.batch_size:
+                    self.write(batch)
+                    batch, batch_skus = [], set()
+                batch.append(record)
+                batch_skus.add(record["product"].sku)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # Nothing past this point can be read; keep what was
+            self.error(None, None, [f"File unreadable after line {line}: {exc}"])
+        if batch:
+            self.write(batch)
+
+        if self.touched_ids:
+            get_search_backend().index_products(self.touched_ids)
+            bump_generation(Product, ProductVariation, ProductImage)
+        return self.result
+
+    def error(self, line, sku, errors):
+        self.result["failed"] += 1
+        if len(self.result["errors"]) < MAX_REPORTED_ERRORS:
+            self.result["errors"].append({"line": line, "sku": sku, "errors": errors})
+
+    def clean(self, line, raw):
+        if isinstance(raw, Exception):
+            self.error(line, None, [str(raw)])
+            return None
+        serializer = ProductImportSerializer(data=raw)
+        if not serializer.is_valid():
+            self.error(line, raw.get("sku"), serializer.errors)
+            return None
+        data = serializer.validated_data
+
+        category_id = self.categories.get(data["category"])
+        brand_id = self.brands.get(data["brand"]) if data.get("brand") else None
+        if category_id is None or (data.get("brand") and brand_id is None):
+            missing = "category" if category_id is None else "brand"
+            self.error(line, data["sku"], {missing: [f"Unknown {missing} slug."]})
+            return None
+
+        slug = data.get("slug") or slugify(data["name"])
+        if slug in self.slug_owners and self.slug_owners[slug] != data["sku"]:
+            slug = slugify(f"{slug}-{data['sku']}")
+        self.slug_owners[slug] = data["sku"]
+
+        discount = data.get("discount_price")
+        product = Product(
+            sku=data["sku"],
+            name=data["name"],
+            slug=slug,
+            description=data["description"],
+            category_id=category_id,
+            brand_id=brand_id,
+            price=data["price"],
+            discount_price=discount,
+            # Same rule as Product.save(), which bulk writes bypass
+            is_on_sale=bool(discount and discount < data["price"]),
+            stock_quantity=data["stock_quantity"],
+            availability=data["availability"],
+            is_active=data["is_active"],
+            is_featured=data["is_featured"],
+            seo_title=data["seo_title"],
+            seo_description=data["seo_description"],
+        )
+        variations = [
+            ProductVariation(
+                sku=variation["sku"],
+                name=variation["name"],
+                price=variation.get("price", data["price"]),
+                stock_quantity=variation["stock_quantity"],
+                is_active=variation["is_active"],
+            )
+            for variation in data.get("variations", [])
+        ]
+        return {"line": line, "product": product, "variations": variations, "images": data.get("images")}
+
+    def write(self, batch):
+        try:
+            with transaction.atomic():
+                self.save(batch)
+        except IntegrityError:
+            # Isolate the offending rows (e.g. a variation name clash) instead of dropping the batch
+            for record in batch:
+                for obj in [record["product"], *record["variations"]]:
+                    obj.pk = None  # ids assigned inside the rolled-back batch are void
+                try:
+                    with transaction.atomic():
+                        self.save([record])
+                except IntegrityError as exc:
+                    self.error(record["line"], record["product"].sku, [str(exc)])
+                    continue
+                self.count([record])
+            return
+        self.count(batch)
+
+    def count(self, batch):
+        for record in batch:
+            sku = record["product"].sku
+            self.result["updated" if sku in self.existing_skus else "created"] += 1
+            self.existing_skus.add(sku)
+
+    def save(self, batch):
+        products = [record["product"] for record in batch]
+        Product.objects.bulk_create(
+            products, update_conflicts=True, unique_fields=["sku"], update_fields=PRODUCT_UPDATE_FIELDS,
+        )
+        # Upserts don't report ids reliably on every backend; one lookup maps them back
+        ids = dict(Product.objects.filter(sku__in=[product.sku for product in products]).values_list("sku", "id"))
+
+        variations = []
+        for record in batch:
+            for variation in record["variations"]:
+                variation.product_id = ids[record["product"].sku]
+                variations.append(variation)
+        if variations:
+            ProductVariation.objects.bulk_create(
+                variations, update_conflicts=True, unique_fields=["sku"], update_fields=VARIATION_UPDATE_FIELDS,
+            )
+
+        with_images = [record for record in batch if record["images"] is not None]
+        if with_images:
+            # Listed images replace the product's gallery; the first one is featured
+            ProductImage.objects.filter(product_id__in=[ids[r["product"].sku] for r in with_images]).delete()
+            ProductImage.objects.bulk_create([
+                ProductImage(product_id=ids[record["product"].sku], image=image, is_featured=position == 0)
+                for record in with_images
+                for position, image in enumerate(record["images"])
+            ])
+
+        self.touched_ids.extend(ids.values())
+
+
+def import_products(stream, file_format="csv", batch_size=DEFAULT_BATCH_SIZE):
+    return ProductImporter(batch_size=batch_size).run(stream, file_format)
+
+
+# ----------------------------
+# EXPORT
+# ----------------------------
+def _export_batches(batch_size):
+    """Products with category, brand, variations and images, walked in primary-key batches."""
+    queryset = (
+        Product.objects.select_related("category", "brand")
+        .prefetch_related(
+            Prefetch("variations", queryset=ProductVariation.objects.order_by("name")),
+            Prefetch("images", queryset=ProductImage.objects.order_by("-is_featured", "id")),
+        )
+        .order_by("pk")
+    )
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].pk
+
+
+def _product_row(product):
+    return {
+        "sku": product.sku or "",
+        "name": product.name,
+        "slug": product.slug,
+        "description": product.description,
+        "category": product.category.slug,
+        "brand": product.brand.slug if product.brand else None,
+        "price": str(product.price),
+        "discount_price": str(product.discount_price) if product.discount_price is not None else None,
+        "stock_quantity": product.stock_quantity,
+        "availability": product.availability,
+        "is_active": product.is_active,
+        "is_featured": product.is_featured,
+        "seo_title": product.seo_title,
+        "seo_description": product.seo_description,
+        "images": [image.image.name for image in product.images.all()],
+    }
+
+
+def _variation_row(variation):
+    return {
+        "sku": variation.sku,
+        "name": variation.name,
+        "price": str(variation.price),
+        "stock_quantity": variation.stock_quantity,
+        "is_active": variation.is_active,
+    }
+
+
+def export_csv(batch_size=DEFAULT_BATCH_SIZE):
+    """Yield the catalog as CSV text chunks (header first)."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writeheader()
+    yield flush()
+    for batch in _export_batches(batch_size):
+        for product in batch:
+            row = _product_row(product)
+            row["images"] = "|".join(row["images"])
+            variations = [_variation_row(variation) for variation in product.variations.all()] or [{}]
+            for variation in variations:
+                writer.writerow({**row, **{f"variation_{key}": value for key, value in variation.items()}})
+        yield flush()
+
+
+def export_jsonl(batch_size=DEFAULT_BATCH_SIZE):
+    """Yield the catalog as JSON lines, one product per line."""
+    for batch in _export_batches(batch_size):
+        yield "".join(
+            json.dumps({
+                **_product_row(product),
+                "variations": [_variation_row(variation) for variation in product.variations.all()],
+            }) + "\n"
+            for product in batch
+        )
+
+
+EXPORTERS = {"csv": export_csv, "jsonl": export_jsonl}
+
+
+# ----------------------------
+# PRICE / STOCK SYNC
+# ----------------------------
+PRICE_STOCK_FIELDS = ("price", "discount_price", "stock_quantity")
+VARIATION_PRICE_STOCK_FIELDS = ("price", "stock_quantity")
+
+
+def _held_units(model, rows):
+    """{pk: units} of `rows` still held by unpaid checkouts (orders.reservations)."""
+    held = {"reservations__status": "held"}
+    if model is Product:
+        held["reservations__variation__isnull"] = True  # variation holds come off the variation
+    return dict(
+        model.objects.filter(pk__in=[row.pk for row in rows], **held)
+        .annotate(held=Sum("reservations__quantity")).values_list("pk", "held")
+    )
+
+
+def _bulk_update_supplied(model, rows, fields_of):
+    """bulk_update `rows` grouped by the fields each one was given, writing only those."""
+    groups = defaultdict(list)
+    for row in rows:
+        groups[fields_of(row)].append(row)
+    for fields, group in groups.items():
+        model.objects.bulk_update(group, list(fields))
+
+
+def apply_price_stock_updates(records, chunk_size=DEFAULT_BATCH_SIZE):
+    """
+    Apply `{sku, price, discount_price, stock_quantity}` records to products and
+    variations (a sku is looked up on Product first, then ProductVariation).
+    Invalid records are reported and skipped; the valid ones are written in one
+    transaction with a locked lookup + bulk_update per chunk and set of supplied
+    fields, and the catalog cache generation is bumped once.
+
+    `stock_quantity` is the count on hand: units held by unpaid checkouts are
+    taken off it, as they were when those checkouts reserved them. Variations
+    have no discount price, so a variation record carrying one is rejected.
+
+    Returns {"products", "variations", "not_found": [sku, ...], "errors": [{"index", "sku", "errors"}]}.
+    """
+    result = {"products": 0, "variations": 0, "not_found": [], "errors": []}
+    updates, positions = {}, {}
+    for index, record in enumerate(records):
+        serializer = PriceStockUpdateSerializer(data=record)
+        if not serializer.is_valid():
+            sku = record.get("sku") if isinstance(record, dict) else None
+            result["errors"].append({"index": index, "sku": sku, "errors": serializer.errors})
+            continue
+        data = dict(serializer.validated_data)
+        sku = data.pop("sku")
+        updates.setdefault(sku, {}).update(data)  # later records for a sku win
+        positions[sku] = index
+
+    skus = list(updates)
+    now = timezone.now()
+    with transaction.atomic():
+        for start in range(0, len(skus), chunk_size):
+            chunk = skus[start:start + chunk_size]
+
+            products = list(
+                Product.objects.filter(sku__in=chunk).select_for_update().only("id", "sku", *PRICE_STOCK_FIELDS)
+            )
+            held = _held_units(Product, [p for p in products if "stock_quantity" in updates[p.sku]])
+            for product in products:
+                for field, value in updates[product.sku].items():
+                    setattr(product, field, value)
+                if "stock_quantity" in updates[product.sku]:
+                    product.stock_quantity = max(0, product.stock_quantity - (held.get(product.pk) or 0))
+                # Same rule as Product.save(), which bulk_update bypasses
+                product.is_on_sale = bool(product.discount_price and product.discount_price < product.price)
+                product.updated_at = now
+            _bulk_update_supplied(Product, products, lambda product: (
+                *(field for field in PRICE_STOCK_FIELDS if field in updates[product.sku]),
+                *(("is_on_sale",) if updates[product.sku].keys() & {"price", "discount_price"} else ()),
+                "updated_at",
+            ))
+
+            found = {product.sku for product in products}
+            variations = []
+            for variation in (
+                ProductVariation.objects.filter(sku__in=[sku for sku in chunk if sku not in found])
+                .select_for_update().only("id", "sku", *VARIATION_PRICE_STOCK_FIELDS)
+            ):
+                found.add(variation.sku)
+                if "discount_price" in updates[variation.sku]:
+                    result["errors"].append({
+                        "index": positions[variation.sku], "sku": variation.sku,
+                        "errors": {"discount_price": ["Variations have no discount price."]},
+                    })
+                else:
+                    variations.append(variation)
+            held = _held_units(ProductVariation, [v for v in variations if "stock_quantity" in updates[v.sku]])
+            for variation in variations:
+                for field, value in updates[variation.sku].items():
+                    setattr(variation, field, value)
+                if "stock_quantity" in updates[variation.sku]:
+                    variation.stock_quantity = max(0, variation.stock_quantity - (held.get(variation.pk) or 0))
+            _bulk_update_supplied(ProductVariation, variations, lambda variation: tuple(
+                field for field in VARIATION_PRICE_STOCK_FIELDS if field in updates[variation.sku]
+            ))
+
+            result["products"] += len(products)
+            result["variations"] += len(variations)
+            result["not_found"] += [sku for sku in chunk if sku not in found]
+
+    if result["products"] or result["variations"]:
+        bump_generation(Product, ProductVariation)
+    return result
@@ -0,0 +1,71 @@
+"""
+Category tree helpers built on Category.path (materialized path).
+
+The whole tree is read with one query and nested in memory; descendant
+filtering is a range predicate on the indexed path column.
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+from core.cache import bump_generation
+
+from .models import Category
+
+
+def children_map(categories):
+    """{parent_id: [child, ...]} for an iterable of categories, preserving its order."""
+    children = defaultdict(list)
+    for category in categories:
+        children[category.parent_id].append(category)
+    return children
+
+
+def subtree_q(paths, field="path"):
+    """Q matching every row whose `field` lies in the subtree of any of `paths`."""
+    query = Q()
+    for path in paths:
+        query |= Q(**{f"{field}__gte": path, f"{field}__lt": path + Category.PATH_END})
+    return query
+
+
+def filter_by_category_subtree(queryset, categories):
+    """Restrict a Product queryset to the given categories and all their descendants."""
+    paths = [path for path in categories.values_list("path", flat=True) if path]
+    if not paths:
+        return queryset.none()
+    return queryset.filter(subtree_q(paths, field="category__path"))
+
+
+def rebuild_category_paths():
+    """
+    Recompute path/depth for every category from parent links (one read, one bulk update).
+    Categories caught in a parent cycle are treated as roots. Returns the number of rows changed.
+    """
+    categories = {category.pk: category for category in Category.objects.only("id", "parent_id", "path", "depth")}
+    children = children_map(categories.values())
+    width, separator = Category.PATH_SEGMENT_WIDTH, Category.PATH_SEPARATOR
+
+    changed = []
+    seen = set()
+    pending = [(category, "") for category in children[None]]
+    while pending or len(seen) < len(categories):
+        if not pending:
+            # Whatever is left is a cycle: break it at the lowest id
+            root = min(pk for pk in categories if pk not in seen)
+            pending.append((categories[root], ""))
+        category, parent_path = pending.pop()
+        if category.pk in seen:
+            continue
+        seen.add(category.pk)
+        path = f"{parent_path}{category.pk:0{width}d}{separator}"
+        depth = path.count(separator) - 1
+        if (category.path, category.depth) != (path, depth):
+            category.path, category.depth = path, depth
+            changed.append(category)
+        pending += [(child, path) for child in children[category.pk]]
+
+    Category.objects.bulk_update(changed, ["path", "depth"], batch_size=500)
+    if changed:
+        bump_generation(Category)
+    return len(changed)
@@ -0,0 +1,136 @@
+"""
+Facet counts for the catalog filter sidebar.
+
+For the active filter set, each facet is counted with one grouped aggregate
+query that applies every filter except the facet's own, so the UI can show
+"what would I get if I picked this value" counts. Results are cached per
+normalized filter signature.
+"""
+import hashlib
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Value
+from django.db.models.functions import Floor
+
+from core.cache import get_generations
+
+from .filters import CATALOG_FILTER_PARAMS, filter_catalog, split_param
+from .models import Brand, Category, Product, ProductReview
+from .search import get_search_backend
+
+DEFAULT_PRICE_INTERVAL = 1000
+MAX_PRICE_BUCKETS = 100
+
+# Params that affect facet counts; anything else (sort, page, ...) is ignored
+SIGNATURE_PARAMS = [param for params in CATALOG_FILTER_PARAMS.values() for param in params]
+SIGNATURE_PARAMS += ["search", "price_interval"]
+
+# Models whose writes change facet counts (review writes move rating_avg)
+FACET_MODELS = (Product, Category, Brand, ProductReview)
+
+
+def facet_signature(params):
+    """
+    Stable cache key for a filter set: order and duplicates in multi-selects don't matter.
+    Catalog generations are part of the key, so any catalog write invalidates it.
+    """
+    normalized = {}
+    for name in SIGNATURE_PARAMS:
+        value = params.get(name)
+        if not value:
+            continue
+        if name in ("brand", "category", "availability"):
+            normalized[name] = sorted(set(split_param(value)))
+        else:
+            normalized[name] = value.strip().lower() if name == "search" else value.strip()
+    normalized["generations"] = get_generations(FACET_MODELS)
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    return f"catalog-facets:{digest}"
+
+
+def price_interval(params):
+    try:
+        interval = Decimal(params.get("price_interval") or DEFAULT_PRICE_INTERVAL)
+    except ArithmeticError:
+        return Decimal(DEFAULT_PRICE_INTERVAL)
+    if not interval.is_finite() or interval <= 0:
+        return Decimal(DEFAULT_PRICE_INTERVAL)
+    return interval
+
+
+def _base_queryset(params):
+    queryset = Product.objects.filter(is_active=True)
+    search = (params.get("search") or "").strip()
+    if search:
+        queryset = get_search_backend().filter(queryset, search)
+    return queryset.order_by()
+
+
+def compute_facets(params):
+    base = _base_queryset(params)
+
+    def without(facet):
+        return filter_catalog(base, params, exclude=(facet,))
+
+    brands = [
+        {"id": row["brand_id"], "name": row["brand__name"], "count": row["count"]}
+        for row in without("brand").exclude(brand__isnull=True)
+        .values("brand_id", "brand__name").annotate(count=Count("id")).order_by("-count", "brand__name")
+    ]
+    categories = [
+        {"id": row["category_id"], "name": row["category__name"], "count": row["count"]}
+        for row in without("category")
+        .values("category_id", "category__name").annotate(count=Count("id")).order_by("-count", "category__name")
+    ]
+
+    labels = dict(Product.AVAILABILITY_CHOICES)
+    availability = [
+        {"value": row["availability"], "label": labels.get(row["availability"], row["availability"]),
+         "count": row["count"]}
+        for row in without("availability").values("availability").annotate(count=Count("id")).order_by("availability")
+    ]
+
+    # Star buckets are cumulative ("4 & up"), derived from one floor(rating) grouping
+    per_star = {
+        int(star): count
+        for star, count in without("rating").annotate(star=Floor("rating_avg"))
+        .values("star").annotate(count=Count("id")).values_list("star", "count")
+    }
+    ratings = [
+        {"min_rating": star, "count": sum(count for bucket, count in per_star.items() if bucket >= star)}
+        for star in (4, 3, 2, 1)
+    ]
+
+    interval = price_interval(params)
+    buckets = (
+        without("price").annotate(index=Floor(F("price") / Value(interval)))
+        .values("index").annotate(count=Count("id")).order_by("index")[:MAX_PRICE_BUCKETS]
+    )
+    price = {
+        "interval": interval,
+        "buckets": [
+            {"min": int(row["index"]) * interval, "max": (int(row["index"]) + 1) * interval, "count": row["count"]}
+            for row in buckets
+        ],
+    }
+
+    return {
+        "total": filter_catalog(base, params).count(),
+        "brands": brands,
+        "categories": categories,
+        "availability": availability,
+        "ratings": ratings,
+        "price": price,
+    }
+
+
+def get_facets(params):
+    key = facet_signature(params)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(params)
+        cache.set(key, facets, getattr(settings, "CATALOG_FACETS_CACHE_TIMEOUT", 300))
+    return facets
@@ -1,6 +1,74 @@
 import django_filters
-from django.db.models import Q, Avg
+from rest_framework.filters import BaseFilterBackend
+from .categories import filter_by_category_subtree
 from .models import Product, Category, HeroBanner
+from .pricing import on_sale_q
+from .search import get_search_backend
+
+
+# ----------------------------
+# CATALOG LISTING FILTERS
+# ----------------------------
+# Facet names understood by filter_catalog(); each maps to the query params it reads
+CATALOG_FILTER_PARAMS = {
+    "brand": ("brand",),
+    "category": ("category",),
+    "availability": ("availability",),
+    "price": ("min_price", "max_price"),
+    "rating": ("min_rating",),
+}
+
+
+def split_param(value):
+    """Split a comma-separated multi-select param into clean values."""
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def filter_catalog(queryset, params, exclude=()):
+    """
+    Apply the storefront listing filters (brand, category, availability,
+    price range, minimum rating) from `params` to a Product queryset.
+    Facet names in `exclude` are skipped, which is how facet counts ignore
+    their own selection.
+    """
+    # --- Multi-select filters (comma-separated) ---
+    brand = params.get("brand")
+    if brand and "brand" not in exclude:
+        values = split_param(brand)
+        if all(v.isdigit() for v in values):
+            queryset = queryset.filter(brand_id__in=values)
+        else:
+            queryset = queryset.filter(brand__name__in=values)
+
+    # Categories match their whole subtree
+    category = params.get("category")
+    if category and "category" not in exclude:
+        values = split_param(category)
+        if all(v.isdigit() for v in values):
+            selected = Category.objects.filter(id__in=values)
+        else:
+            selected = Category.objects.filter(name__in=values)
+        queryset = filter_by_category_subtree(queryset, selected)
+
+    availability = params.get("availability")
+    if availability and "availability" not in exclude:
+        queryset = queryset.filter(availability__in=split_param(availability))
+
+    # --- Price range ---
+    if "price" not in exclude:
+        min_price = params.get("min_price")
+        max_price = params.get("max_price")
+        if min_price:
+            queryset = queryset.filter(price__gte=min_price)
+        if max_price:
+            queryset = queryset.filter(price__lte=max_price)
+
+    # --- Minimum rating ---
+    min_rating = params.get("min_rating")
+    if min_rating and "rating" not in exclude:
+        queryset = queryset.filter(rating_avg__gte=min_rating)
+
+    return queryset
 
 
 # ----------------------------
@@ -20,6 +88,10 @@ class ProductFilter(django_filters.FilterSet):
     # Rating filter (e.g., show products with >= rating)
     min_rating = django_filters.NumberFilter(method="filter_by_min_rating")
 
+    # On sale right now (sale window open), as the serialized is_on_sale reports it;
+    # the stored flag only says a discount is configured
+    is_on_sale = django_filters.BooleanFilter(method="filter_on_sale")
+
     # Availability filter (direct from model choices)
     availability = django_filters.CharFilter(field_name="availability", lookup_expr="iexact")
 
@@ -38,23 +110,44 @@ class ProductFilter(django_filters.FilterSet):
 
     def filter_by_category(self, queryset, name, value):
         if value.isdigit():
-            return queryset.filter(category__id=value)
-        return queryset.filter(category__slug=value)
+            return filter_by_category_subtree(queryset, Category.objects.filter(id=value))
+        return filter_by_category_subtree(queryset, Category.objects.filter(slug=value))
 
     def filter_by_brand(self, queryset, name, value):
         if value.isdigit():
             return queryset.filter(brand__id=value)
         return queryset.filter(brand__slug=value)
 
+    def filter_on_sale(self, queryset, name, value):
+        return queryset.filter(on_sale_q()) if value else queryset.exclude(on_sale_q())
+
     def filter_by_min_rating(self, queryset, name, value):
-        return queryset.annotate(avg_rating=Avg("reviews__rating")).filter(avg_rating__gte=value)
+        return queryset.filter(rating_avg__gte=value)
 
     def filter_by_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(name__icontains=value)
-            | Q(description__icontains=value)
-            | Q(sku__icontains=value)
-        )
+        return get_search_backend().filter(queryset, value)
+
+
+# ----------------------------
+# PRODUCT SEARCH BACKEND (DRF)
+# ----------------------------
+class ProductSearchFilter(BaseFilterBackend):
+    """
+    Full-text `?search=` for product listings via products.search.
+    Results are ordered by relevance unless the client asked for an explicit sort.
+    """
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, "").strip()
+        if not term:
+            return queryset
+        queryset = get_search_backend().filter(queryset, term)
+        if "search_rank" in queryset.query.annotations and not (
+            request.query_params.get("sort") or request.query_params.get("ordering")
+        ):
+            queryset = queryset.order_by("-search_rank", "-created_at")
+        return queryset
 
 
 # ----------------------------
@@ -0,0 +1,132 @@
+"""
+EXPLAIN-based benchmark for the storefront listing queries.
+
+Builds a throwaway test database, seeds it with `core.testing.seed_catalog()`,
+then runs the querysets ProductListView really produces for common filter/sort
+combinations, first without and then with the partial listing indexes declared
+on Product.Meta. For each shape it prints the query plan and the median time of
+the page query and the count query.
+
+    python manage.py benchmark_product_listing --products 20000 --repeat 20
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.pagination import KeysetPagination
+from core.testing import seed_catalog
+from products.models import Product
+from products.views import ProductListView
+
+
+def listing_shapes(fixtures):
+    """(label, query params) pairs mirroring what the storefront sends."""
+    return [
+        ("default (newest)", {}),
+        ("sort=price-low", {"sort": "price-low"}),
+        ("sort=price-high", {"sort": "price-high"}),
+        ("sort=rating", {"sort": "rating"}),
+        ("category subtree", {"category": str(fixtures.category.pk)}),
+        ("brand", {"brand": str(fixtures.brand.pk)}),
+        ("brand + price range, price-low", {
+            "brand": str(fixtures.brand.pk), "min_price": "1000", "max_price": "5000", "sort": "price-low",
+        }),
+        ("availability", {"availability": "preorder"}),
+        ("min_rating, sort=rating", {"min_rating": "3", "sort": "rating"}),
+    ]
+
+
+def listing_indexes():
+    """The partial indexes that exist to serve the listing (is_active=True) queries."""
+    return [index for index in Product._meta.indexes if index.condition is not None]
+
+
+class Command(BaseCommand):
+    help = "Report EXPLAIN plans and timings of ProductListView queries with and without the listing indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=20000, help="Number of products to seed.")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query (median is reported).")
+        parser.add_argument("--no-plans", action="store_true", help="Only print timings.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"Seeding {options['products']} products...")
+            fixtures = seed_catalog(products=options["products"])
+            self.analyze()
+            shapes = listing_shapes(fixtures)
+
+            with connection.schema_editor() as editor:
+                for index in listing_indexes():
+                    editor.remove_index(Product, index)
+            self.analyze()
+            before = self.run_shapes("WITHOUT listing indexes", shapes, options)
+
+            with connection.schema_editor() as editor:
+                for index in listing_indexes():
+                    editor.add_index(Product, index)
+            self.analyze()
+            after = self.run_shapes("WITH listing indexes", shapes, options)
+
+            self.report(shapes, before, after)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    # ----------------------------
+    # Measurement
+    # ----------------------------
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def build_querysets(self, params):
+        """The page and count querysets ProductListView + KeysetPagination execute for `params`."""
+        request = Request(APIRequestFactory().get("/api/products/", params))
+        view = ProductListView(request=request, kwargs={}, format_kwarg=None)
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = KeysetPagination()
+        ordering = paginator.get_ordering(queryset)
+        page = queryset.order_by(*ordering)[:paginator.page_size + 1]
+        return page, queryset.order_by()
+
+    def time_query(self, evaluate, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            evaluate()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def run_shapes(self, title, shapes, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== {title} ==="))
+        results = {}
+        for label, params in shapes:
+            page, count = self.build_querysets(params)
+            page_ms = self.time_query(lambda: list(page.all()), options["repeat"])
+            count_ms = self.time_query(lambda: count.count(), options["repeat"])
+            results[label] = (page_ms, count_ms)
+
+            self.stdout.write(self.style.SUCCESS(f"\n{label}  {params or ''}"))
+            self.stdout.write(f"  page {page_ms:.2f} ms, count {count_ms:.2f} ms")
+            if not options["no_plans"]:
+                for line in page.explain().splitlines():
+                    self.stdout.write(f"    {line}")
+        return results
+
+    def report(self, shapes, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING("\n=== Summary (median ms: page / count) ==="))
+        width = max(len(label) for label, _ in shapes)
+        self.stdout.write(f"{'shape'.ljust(width)}  {'before':>17}  {'after':>17}")
+        for label, _ in shapes:
+            (page_before, count_before), (page_after, count_after) = before[label], after[label]
+            self.stdout.write(
+                f"{label.ljust(width)}  {page_before:8.2f} / {count_before:6.2f}  {page_after:8.2f} / {count_after:6.2f}"
+            )
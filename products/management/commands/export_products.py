@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from products.bulk import DEFAULT_BATCH_SIZE, EXPORTERS, FORMATS
+
+
+class Command(BaseCommand):
+    help = "Stream the product catalog (with variations and images) as CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--type", choices=FORMATS, default="csv", help="Output format.")
+        parser.add_argument("--output", help="File to write (default: stdout).")
+        parser.add_argument(
+            "--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+            help="Products loaded per query.",
+        )
+
+    def handle(self, *args, **options):
+        chunks = EXPORTERS[options["type"]](batch_size=options["batch_size"])
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(options["output"], "w", encoding="utf-8", newline="") as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}."))
@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import DEFAULT_BATCH_SIZE, FORMATS, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = "Upsert products (by sku) with their variations and images from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import.")
+        parser.add_argument("--type", choices=FORMATS, help="File format (default: from the file extension).")
+        parser.add_argument(
+            "--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+            help="Products written per bulk upsert.",
+        )
+
+    def handle(self, *args, **options):
+        file_format = options["type"] or detect_format(options["path"])
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+                result = import_products(stream, file_format, batch_size=options["batch_size"])
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for error in result["errors"]:
+            self.stderr.write(f"line {error['line']} ({error['sku']}): {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']}, updated {result['updated']}, failed {result['failed']} product(s)."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.categories import rebuild_category_paths
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized path and depth of every category from its parent links."
+
+    def handle(self, *args, **options):
+        changed = rebuild_category_paths()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt paths for {changed} categor{'y' if changed == 1 else 'ies'}."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored rating aggregates on every product from its reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of products recomputed per aggregate query / bulk update.",
+        )
+
+    def handle(self, *args, **options):
+        processed = rebuild_rating_aggregates(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates for {processed} product(s)."))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:11
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductReview = apps.get_model('products', 'ProductReview')
+    totals = (
+        ProductReview.objects.values('product_id')
+        .annotate(total=Sum('rating'), count=Count('id'))
+        .order_by()
+    )
+    products = [
+        Product(
+            pk=row['product_id'],
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            rating_avg=row['total'] / row['count'],
+        )
+        for row in totals
+    ]
+    Product.objects.bulk_update(products, ['rating_sum', 'rating_count', 'rating_avg'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_brand_product_availability_product_brand_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+SOURCE_SQL = (
+    "FROM products_product p "
+    "LEFT JOIN products_brand b ON b.id = p.brand_id "
+    "LEFT JOIN products_category c ON c.id = p.category_id"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts USING fts5("
+            "name, description, sku, brand, category, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO products_product_fts (rowid, name, description, sku, brand, category) "
+            "SELECT p.id, p.name, p.description, COALESCE(p.sku, ''), COALESCE(b.name, ''), "
+            "COALESCE(c.name, '') " + SOURCE_SQL
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS products_product_search ("
+            "product_id bigint PRIMARY KEY REFERENCES products_product (id) ON DELETE CASCADE "
+            "DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS products_product_search_document_gin "
+            "ON products_product_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO products_product_search (product_id, document) SELECT p.id, "
+            "setweight(to_tsvector('simple', p.name), 'A') || "
+            "setweight(to_tsvector('simple', COALESCE(p.sku, '')), 'A') || "
+            "setweight(to_tsvector('simple', COALESCE(b.name, '')), 'B') || "
+            "setweight(to_tsvector('simple', COALESCE(c.name, '')), 'B') || "
+            "setweight(to_tsvector('simple', p.description), 'D') " + SOURCE_SQL
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS products_product_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS products_product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:27
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    categories = list(Category.objects.only('id', 'parent_id'))
+    children = defaultdict(list)
+    for category in categories:
+        children[category.parent_id].append(category)
+
+    pending = [(category, '') for category in children[None]]
+    while pending:
+        category, parent_path = pending.pop()
+        category.path = f'{parent_path}{category.pk:08d}/'
+        category.depth = category.path.count('/') - 1
+        pending += [(child, category.path) for child in children[category.pk]]
+    Category.objects.bulk_update(categories, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_category_paths, migrations.RunPython.noop),
+    ]
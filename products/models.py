@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.text import slugify
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -9,6 +11,12 @@ from accounts.models import CustomUser
 # CATEGORY
 # ----------------------------
 class Category(models.Model):
+    # Materialized path: one zero-padded id segment per ancestor, root first,
+    # e.g. "00000003/00000017/". A subtree is the range [path, path + PATH_END).
+    PATH_SEGMENT_WIDTH = 8
+    PATH_SEPARATOR = "/"
+    PATH_END = "~"  # sorts after digits and the separator
+
     name = models.CharField(max_length=255, unique=True)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     parent = models.ForeignKey(
@@ -16,6 +24,8 @@ class Category(models.Model):
     )
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
+    path = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -26,8 +36,31 @@ class Category(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+
+        parent_path = ""
+        if self.parent_id:
+            parent_path = Category.objects.values_list("path", flat=True).get(pk=self.parent_id)
+        old_path, old_depth = self.path, self.depth
+        if old_path and parent_path.startswith(old_path):
+            raise ValueError("A category cannot be moved into its own subtree.")
+
         super().save(*args, **kwargs)
 
+        self.path = f"{parent_path}{self.pk:0{self.PATH_SEGMENT_WIDTH}d}{self.PATH_SEPARATOR}"
+        self.depth = self.path.count(self.PATH_SEPARATOR) - 1
+        if self.path != old_path:
+            Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+            if old_path:
+                # Re-parented: rewrite the prefix of the whole subtree in one UPDATE
+                Category.objects.filter(path__gt=old_path, path__lt=old_path + self.PATH_END).update(
+                    path=Concat(Value(self.path), Substr("path", len(old_path) + 1), output_field=models.CharField()),
+                    depth=F("depth") + (self.depth - old_depth),
+                )
+
+    def subtree(self):
+        """This category and all of its descendants (one indexed range scan)."""
+        return Category.objects.filter(path__gte=self.path, path__lt=self.path + self.PATH_END)
+
     def __str__(self):
         return self.name
 
@@ -73,6 +106,9 @@ class Product(models.Model):
     discount_price = models.DecimalField(
         max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(0)]
     )
+    # Optional sale window for discount_price; an open end means "no limit". See products.pricing
+    sale_starts_at = models.DateTimeField(null=True, blank=True)
+    sale_ends_at = models.DateTimeField(null=True, blank=True)
     sku = models.CharField(max_length=100, unique=True, null=True, blank=True)
     stock_quantity = models.PositiveIntegerField(default=0)
     availability = models.CharField(max_length=20, choices=AVAILABILITY_CHOICES, default="in_stock")
@@ -81,22 +117,50 @@ class Product(models.Model):
     is_on_sale = models.BooleanField(default=False)
     seo_title = models.CharField(max_length=255, blank=True)
     seo_description = models.TextField(blank=True)
+    # Denormalized review aggregates, kept in sync by products.signals with
+    # in-database increments; save() never writes them back (see RATING_FIELDS)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
+        # `slug` needs no extra index (unique already creates one). The partial
+        # indexes cover storefront listings, which always filter is_active=True:
+        # one per sort key, ending on id so keyset pages are index range scans in
+        # either direction, plus category/brand composites that return rows
+        # already in newest-first order. See `manage.py benchmark_product_listing`.
         indexes = [
-            models.Index(fields=['slug']),
             models.Index(fields=['name']),
+            models.Index(fields=['created_at', 'id'], condition=Q(is_active=True), name='product_active_created_idx'),
+            models.Index(fields=['price', 'id'], condition=Q(is_active=True), name='product_active_price_idx'),
+            models.Index(fields=['rating_avg', 'id'], condition=Q(is_active=True), name='product_active_rating_idx'),
+            models.Index(
+                fields=['category', 'created_at', 'id'], condition=Q(is_active=True), name='product_active_category_idx'
+            ),
+            models.Index(
+                fields=['brand', 'created_at', 'id'], condition=Q(is_active=True), name='product_active_brand_idx'
+            ),
         ]
 
+    RATING_FIELDS = ("rating_sum", "rating_count", "rating_avg")
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        # Automatically set is_on_sale flag
+        # Automatically set is_on_sale flag: a sale price is configured. Whether it
+        # applies right now depends on the sale window; products.pricing decides that
         self.is_on_sale = bool(self.discount_price and self.discount_price < self.price)
+        if not self._state.adding:
+            # The loaded rating aggregates may be stale by now: a review committed
+            # since would be overwritten, so updates leave them to the database
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs["update_fields"] = [name for name in update_fields if name not in self.RATING_FIELDS]
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -104,14 +168,11 @@ class Product(models.Model):
 
     @property
     def average_rating(self):
-        reviews = self.reviews.all()
-        if reviews.exists():
-            return round(reviews.aggregate(models.Avg("rating"))["rating__avg"], 1)
-        return 0
+        return round(self.rating_avg, 1)
 
     @property
     def review_count(self):
-        return self.reviews.count()
+        return self.rating_count
 
 
 # ----------------------------
@@ -185,5 +246,22 @@ class ProductReview(models.Model):
         unique_together = ("product", "user")
         ordering = ["-created_at"]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so rating aggregates can be shifted by the delta on save
+        instance._loaded_rating = instance.__dict__.get("rating")
+        instance._loaded_product_id = instance.__dict__.get("product_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and None in (
+            getattr(self, "_loaded_rating", None), getattr(self, "_loaded_product_id", None),
+        ):
+            # Loaded with rating or product deferred: read the stored values the delta starts from
+            stored = ProductReview.objects.filter(pk=self.pk).values_list("rating", "product_id").first()
+            self._loaded_rating, self._loaded_product_id = stored or (None, None)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.product.name} - {self.rating}⭐"
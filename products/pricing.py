@@ -0,0 +1,169 @@
+"""
+Effective unit prices.
+
+Every price a customer sees or pays is resolved here, so catalog listings,
+product detail, cart lines and checkout always agree:
+
+- the base price is the variation's own price when a variation is given,
+  otherwise Product.price;
+- Product.discount_price is the sale price while the sale window
+  (sale_starts_at <= now < sale_ends_at, either end open) contains now.
+  On a variation the sale takes the same fraction off the variation's price;
+- coupons are cart-level and are applied on top of these unit prices by
+  cart.coupons.
+
+`PriceResolver` memoizes prices by (product id, variation id) for one request
+(`PriceResolver.for_request`). Rows the caller already loaded are priced
+without touching the database; `prices()` loads whatever is missing with one
+query per model.
+
+A sale starting or ending changes prices without a write, so nothing bumps
+the Product cache generation. `expire_sale_windows()` does it instead: it
+remembers the earliest scheduled sale change and bumps the generation once
+that moment has passed, so cached responses, ETags and Last-Modified all move.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from core.cache import bump_generation, get_generations
+
+from .models import Product, ProductVariation
+
+CENT = Decimal("0.01")
+# Columns pricing reads, for callers that load products with .only()
+PRICE_FIELDS = ("id", "price", "discount_price", "sale_starts_at", "sale_ends_at")
+# (Product generation, next sale start or end) as of the last check
+SALE_CLOCK_KEY = "sale-clock:products.product"
+
+
+@dataclass(frozen=True)
+class Price:
+    base: Decimal
+    unit: Decimal
+    on_sale: bool
+    # Next time this price changes on its own (sale start or end), if scheduled
+    changes_at: datetime = None
+
+    @property
+    def saving(self):
+        return self.base - self.unit
+
+
+def sale_active(product, now):
+    """True when the product's discount_price applies at `now`."""
+    if product.discount_price is None or product.discount_price >= product.price:
+        return False
+    if product.sale_starts_at and now < product.sale_starts_at:
+        return False
+    if product.sale_ends_at and now >= product.sale_ends_at:
+        return False
+    return True
+
+
+def on_sale_q(now=None):
+    """Q for products whose sale price applies at `now`: sale_active() as a queryset filter."""
+    now = now or timezone.now()
+    return (
+        Q(discount_price__isnull=False, discount_price__lt=F("price"))
+        & (Q(sale_starts_at__isnull=True) | Q(sale_starts_at__lte=now))
+        & (Q(sale_ends_at__isnull=True) | Q(sale_ends_at__gt=now))
+    )
+
+
+def compute_price(product, variation=None, now=None):
+    """The Price of `product` (or one of its variations) at `now`, from already-loaded rows."""
+    now = now or timezone.now()
+    base = variation.price if variation is not None else product.price
+    changes_at = next(
+        (moment for moment in (product.sale_starts_at, product.sale_ends_at) if moment and moment > now), None,
+    ) if product.discount_price is not None else None
+
+    if not sale_active(product, now):
+        return Price(base=base, unit=base, on_sale=False, changes_at=changes_at)
+    if variation is None:
+        unit = product.discount_price
+    else:
+        unit = (base * product.discount_price / product.price).quantize(CENT, rounding=ROUND_HALF_UP)
+    return Price(base=base, unit=unit, on_sale=unit < base, changes_at=changes_at)
+
+
+class PriceResolver:
+    """Per-request memo of {(product id, variation id or None): Price}, all evaluated at one instant."""
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+        self._prices = {}
+
+    @classmethod
+    def for_request(cls, request):
+        """The resolver shared by everything serialized for `request` (a fresh one when there is none)."""
+        if request is None:
+            return cls()
+        resolver = getattr(request, "_price_resolver", None)
+        if resolver is None:
+            resolver = request._price_resolver = cls()
+        return resolver
+
+    def price(self, product, variation=None):
+        """Price of loaded instances; `variation.product` is not read, pass the product."""
+        key = (product.pk, variation.pk if variation is not None else None)
+        if key not in self._prices:
+            self._prices[key] = compute_price(product, variation, self.now)
+        return self._prices[key]
+
+    def prices(self, keys):
+        """
+        {key: Price} for (product_id, variation_id or None) pairs. Pairs not seen
+        yet are loaded in one query for products and one for variations;
+        unknown ids are left out.
+        """
+        keys = set(keys)
+        missing = keys - self._prices.keys()
+        variation_ids = {variation_id for _, variation_id in missing if variation_id is not None}
+        product_ids = {product_id for product_id, variation_id in missing if variation_id is None}
+        if variation_ids:
+            variations = ProductVariation.objects.filter(pk__in=variation_ids).select_related("product").only(
+                "id", "product_id", "price", *(f"product__{field}" for field in PRICE_FIELDS),
+            )
+            for variation in variations:
+                self.price(variation.product, variation)
+        if product_ids:
+            for product in Product.objects.filter(pk__in=product_ids).only(*PRICE_FIELDS):
+                self.price(product)
+        return {key: self._prices[key] for key in keys if key in self._prices}
+
+    def next_change(self):
+        """Earliest scheduled change among the prices resolved so far, or None."""
+        return min((price.changes_at for price in self._prices.values() if price.changes_at), default=None)
+
+
+def next_sale_change(now):
+    """Earliest sale start or end after `now` across all products, or None."""
+    moments = Product.objects.filter(discount_price__isnull=False).aggregate(
+        starts=Min("sale_starts_at", filter=Q(sale_starts_at__gt=now)),
+        ends=Min("sale_ends_at", filter=Q(sale_ends_at__gt=now)),
+    )
+    return min((moment for moment in moments.values() if moment), default=None)
+
+
+def expire_sale_windows(now=None):
+    """
+    Bump the Product generation once a scheduled sale start or end has passed.
+    Two cache reads per call; one query after each bump or product write, since
+    the remembered moment is tied to the generation it was computed at. A lost
+    clock bumps too, as a window may have passed while it was gone.
+    """
+    now = now or timezone.now()
+    (generation,) = get_generations([Product])
+    clock = cache.get(SALE_CLOCK_KEY)
+    if clock is not None and clock[0] == generation and (clock[1] is None or now < clock[1]):
+        return
+    if clock is None or (clock[1] is not None and now >= clock[1]):
+        bump_generation(Product)
+        (generation,) = get_generations([Product])
+    cache.set(SALE_CLOCK_KEY, (generation, next_sale_change(now)), timeout=None)
@@ -0,0 +1,68 @@
+from django.db.models import Case, Count, F, FloatField, Sum, When
+from django.db.models.functions import Cast
+
+from core.cache import bump_generation
+
+from .models import Product, ProductReview
+
+
+def apply_rating_delta(product_id, sum_delta, count_delta):
+    """
+    Shift a product's stored rating aggregates in a single UPDATE.
+    The average is recomputed from the new sum/count inside the same statement,
+    so concurrent reviews never read-modify-write stale values.
+    """
+    new_sum = F("rating_sum") + sum_delta
+    new_count = F("rating_count") + count_delta
+    return Product.objects.filter(pk=product_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        rating_avg=Case(
+            When(rating_count__gt=-count_delta, then=Cast(new_sum, FloatField()) / new_count),
+            default=0.0,
+            output_field=FloatField(),
+        ),
+    )
+
+
+def rebuild_rating_aggregates(batch_size=500):
+    """
+    Recompute rating_sum / rating_count / rating_avg for every product from its reviews.
+    Walks products in primary-key batches: one aggregate query + one bulk_update per batch.
+    Returns the number of products processed.
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Product.objects.filter(pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+
+        totals = {
+            row["product_id"]: (row["total"], row["count"])
+            for row in ProductReview.objects.filter(product_id__in=ids)
+            .values("product_id")
+            .annotate(total=Sum("rating"), count=Count("id"))
+            .order_by()
+        }
+
+        products = []
+        for product_id in ids:
+            total, count = totals.get(product_id, (0, 0))
+            products.append(Product(
+                pk=product_id,
+                rating_sum=total,
+                rating_count=count,
+                rating_avg=total / count if count else 0,
+            ))
+        Product.objects.bulk_update(products, ["rating_sum", "rating_count", "rating_avg"])
+
+        processed += len(ids)
+        last_id = ids[-1]
+
+    bump_generation(Product)  # bulk_update sends no signals
+    return processed
@@ -0,0 +1,227 @@
+"""
+Pluggable full-text search over the product catalog.
+
+Each backend keeps a side index of name / description / sku / brand / category
+per product and narrows a Product queryset to ranked matches:
+
+    queryset = get_search_backend().filter(queryset, "trail shoe")
+
+The returned queryset is annotated with `search_rank` (higher is better) and can
+be combined with any other filter. The backend is picked from the database vendor
+unless settings.PRODUCT_SEARCH_BACKEND names one explicitly.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+# Longer queries are truncated; each token is matched as a prefix
+MAX_QUERY_TOKENS = 8
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(term):
+    return TOKEN_RE.findall(term.lower())[:MAX_QUERY_TOKENS]
+
+
+def _documents(product_ids):
+    """(id, name, description, sku, brand, category) rows for the given products."""
+    return (
+        Product.objects.filter(pk__in=product_ids)
+        .values_list("pk", "name", "description", "sku", "brand__name", "category__name")
+        .order_by()
+    )
+
+
+# ----------------------------
+# BASE BACKEND
+# ----------------------------
+class BaseSearchBackend:
+    def filter(self, queryset, term):
+        """Restrict `queryset` to products matching `term`, annotated with `search_rank`."""
+        raise NotImplementedError
+
+    def index_products(self, product_ids):
+        """(Re)index the given products."""
+
+    def remove_products(self, product_ids):
+        """Drop the given products from the index."""
+
+    def rebuild(self):
+        """Rebuild the whole index from the Product table."""
+
+
+# ----------------------------
+# FALLBACK (no index)
+# ----------------------------
+class IContainsSearchBackend(BaseSearchBackend):
+    """Unindexed LIKE scan; used on databases without a full-text backend."""
+
+    def filter(self, queryset, term):
+        query = Q()
+        for token in tokenize(term):
+            query &= Q(name__icontains=token) | Q(description__icontains=token) | Q(sku__icontains=token)
+        return queryset.filter(query).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+# ----------------------------
+# SQLITE FTS5
+# ----------------------------
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    """
+    FTS5 virtual table keyed by product id (rowid), ranked with bm25
+    weighted towards name and sku.
+    """
+    table = "products_product_fts"
+    weights = "10.0, 1.0, 5.0, 3.0, 3.0"  # name, description, sku, brand, category
+
+    def build_query(self, term):
+        return " ".join(f'"{token}"*' for token in tokenize(term))
+
+    def filter(self, queryset, term):
+        match = self.build_query(term)
+        if not match:
+            return queryset
+        product_table = Product._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", (match,))
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT -bm25({self.table}, {self.weights}) FROM {self.table} "
+                f'WHERE {self.table} MATCH %s AND rowid = "{product_table}"."id"',
+                (match,),
+                output_field=FloatField(),
+            )
+        )
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        rows = [
+            (pk, name, description, sku or "", brand or "", category or "")
+            for pk, name, description, sku, brand, category in _documents(product_ids)
+        ]
+        with connection.cursor() as cursor:
+            self._delete(cursor, product_ids)
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, name, description, sku, brand, category) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, product_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, name, description, sku, brand, category) "
+                "SELECT p.id, p.name, p.description, COALESCE(p.sku, ''), COALESCE(b.name, ''), "
+                "COALESCE(c.name, '') FROM products_product p "
+                "LEFT JOIN products_brand b ON b.id = p.brand_id "
+                "LEFT JOIN products_category c ON c.id = p.category_id"
+            )
+
+    def _delete(self, cursor, product_ids):
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", product_ids)
+
+
+# ----------------------------
+# POSTGRESQL TSVECTOR
+# ----------------------------
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Weighted tsvector per product in a side table with a GIN index,
+    ranked with ts_rank.
+    """
+    table = "products_product_search"
+    document_sql = (
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'D')"
+    )  # name, sku, brand, category, description
+
+    def build_query(self, term):
+        return " & ".join(f"{token}:*" for token in tokenize(term))
+
+    def filter(self, queryset, term):
+        tsquery = self.build_query(term)
+        if not tsquery:
+            return queryset
+        product_table = Product._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT product_id FROM {self.table} WHERE document @@ to_tsquery('simple', %s)",
+                (tsquery,),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT ts_rank(document, to_tsquery('simple', %s)) FROM {self.table} "
+                f'WHERE product_id = "{product_table}"."id"',
+                (tsquery,),
+                output_field=FloatField(),
+            )
+        )
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        rows = [
+            (pk, name, sku or "", brand or "", category or "", description)
+            for pk, name, description, sku, brand, category in _documents(product_ids)
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (product_id, document) VALUES (%s, {self.document_sql}) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table} WHERE product_id = ANY(%s)", [product_ids])
+
+    def rebuild(self):
+        document = self.document_sql % (
+            "p.name", "COALESCE(p.sku, '')", "COALESCE(b.name, '')", "COALESCE(c.name, '')", "p.description"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (product_id, document) "
+                f"SELECT p.id, {document} FROM products_product p "
+                "LEFT JOIN products_brand b ON b.id = p.brand_id "
+                "LEFT JOIN products_category c ON c.id = p.category_id"
+            )
+
+
+BACKENDS_BY_VENDOR = {
+    "sqlite": SQLiteFTS5SearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    path = getattr(settings, "PRODUCT_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    return BACKENDS_BY_VENDOR.get(connection.vendor, IContainsSearchBackend)()
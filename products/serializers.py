@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .categories import children_map
 from .models import (
     Category,
     Product,
@@ -8,6 +9,7 @@ from .models import (
     Brand,
     ProductReview,
 )
+from .pricing import PriceResolver
 
 
 # ----------------------------
@@ -29,8 +31,33 @@ class CategorySerializer(serializers.ModelSerializer):
         ]
 
     def get_subcategories(self, obj):
-        subs = obj.subcategories.filter(is_active=True)
-        return CategorySerializer(subs, many=True, read_only=True).data
+        # Views that load the whole tree pass `category_children`; otherwise the
+        # active subtree of `obj` is read with one range query and nested in memory.
+        children = self.context.get("category_children")
+        if children is None:
+            children = children_map(obj.subtree().filter(is_active=True).order_by("name"))
+        context = {**self.context, "category_children": children}
+        return CategorySerializer(children.get(obj.pk, []), many=True, read_only=True, context=context).data
+
+    def validate_parent(self, parent):
+        if parent and self.instance and self.instance.path and parent.path.startswith(self.instance.path):
+            raise serializers.ValidationError("A category cannot be moved into its own subtree.")
+        return parent
+
+
+# ----------------------------
+# CATEGORY / BRAND SUMMARIES (list cards)
+# ----------------------------
+class CategorySummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name']
+
+
+class BrandSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Brand
+        fields = ['id', 'name']
 
 
 # ----------------------------
@@ -51,10 +78,43 @@ class ProductImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image', 'alt_text', 'is_featured']
 
 
+# ----------------------------
+# RESOLVED PRICE FIELDS
+# ----------------------------
+def resolve_price(obj, context):
+    """products.pricing Price of a Product or ProductVariation, memoized for the request."""
+    resolver = PriceResolver.for_request(context.get("request"))
+    if isinstance(obj, ProductVariation):
+        return resolver.price(obj.product, obj)
+    return resolver.price(obj)
+
+
+class EffectivePriceField(serializers.DecimalField):
+    """The price the customer pays now (sale and variation applied), read-only."""
+
+    def __init__(self, **kwargs):
+        super().__init__(max_digits=10, decimal_places=2, source="*", read_only=True, **kwargs)
+
+    def to_representation(self, obj):
+        return super().to_representation(resolve_price(obj, self.context).unit)
+
+
+class OnSaleField(serializers.BooleanField):
+    """Whether a sale price applies right now (the stored flag only says one is configured)."""
+
+    def __init__(self, **kwargs):
+        super().__init__(source="*", read_only=True, **kwargs)
+
+    def to_representation(self, obj):
+        return resolve_price(obj, self.context).on_sale
+
+
 # ----------------------------
 # PRODUCT VARIATION SERIALIZER
 # ----------------------------
 class ProductVariationSerializer(serializers.ModelSerializer):
+    effective_price = EffectivePriceField()
+
     class Meta:
         model = ProductVariation
         fields = [
@@ -62,6 +122,7 @@ class ProductVariationSerializer(serializers.ModelSerializer):
             'name',
             'sku',
             'price',
+            'effective_price',
             'stock_quantity',
             'is_active',
         ]
@@ -106,8 +167,10 @@ class ProductSerializer(serializers.ModelSerializer):
         required=False
     )
     rating = serializers.FloatField(source="average_rating", read_only=True)
-    review_count = serializers.IntegerField(source="review_count", read_only=True)
+    review_count = serializers.IntegerField(source="rating_count", read_only=True)
     reviews = ProductReviewSerializer(many=True, read_only=True)
+    effective_price = EffectivePriceField()
+    is_on_sale = OnSaleField()
 
     class Meta:
         model = Product
@@ -118,6 +181,9 @@ class ProductSerializer(serializers.ModelSerializer):
             'description',
             'price',
             'discount_price',
+            'sale_starts_at',
+            'sale_ends_at',
+            'effective_price',
             'is_on_sale',
             'is_featured',
             'stock_quantity',
@@ -143,6 +209,60 @@ class ProductSerializer(serializers.ModelSerializer):
             'review_count',
         ]
 
+    def validate(self, attrs):
+        starts = attrs.get("sale_starts_at", getattr(self.instance, "sale_starts_at", None))
+        ends = attrs.get("sale_ends_at", getattr(self.instance, "sale_ends_at", None))
+        if starts and ends and ends <= starts:
+            raise serializers.ValidationError({"sale_ends_at": "Sale must end after it starts."})
+        return attrs
+
+
+# ----------------------------
+# PRODUCT LIST SERIALIZER (cards)
+# ----------------------------
+class ProductListSerializer(serializers.ModelSerializer):
+    """
+    Compact product card used by ProductListView.
+    Expects the queryset to select_related category/brand and to prefetch
+    featured images into `featured_images`; see ProductListView.get_queryset.
+    """
+    category = CategorySummarySerializer(read_only=True)
+    brand = BrandSummarySerializer(read_only=True)
+    image = serializers.SerializerMethodField()
+    rating = serializers.FloatField(source="average_rating", read_only=True)
+    review_count = serializers.IntegerField(source="rating_count", read_only=True)
+    effective_price = EffectivePriceField()
+    is_on_sale = OnSaleField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id',
+            'name',
+            'slug',
+            'price',
+            'discount_price',
+            'effective_price',
+            'is_on_sale',
+            'is_featured',
+            'availability',
+            'stock_quantity',
+            'image',
+            'rating',
+            'review_count',
+            'category',
+            'brand',
+        ]
+        read_only_fields = fields
+
+    def get_image(self, obj):
+        images = getattr(obj, "featured_images", None)
+        if images is None:
+            images = obj.images.filter(is_featured=True)[:1]
+        for image in images:
+            return ProductImageSerializer(image, context=self.context).data
+        return None
+
 
 # ----------------------------
 # HERO / BANNER SERIALIZER
@@ -160,3 +280,61 @@ class HeroBannerSerializer(serializers.ModelSerializer):
             'is_active',
             'display_order',
         ]
+
+
+# ----------------------------
+# BULK IMPORT ROWS (see products.bulk)
+# ----------------------------
+class VariationImportSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=100)
+    name = serializers.CharField(max_length=100)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    stock_quantity = serializers.IntegerField(min_value=0, default=0)
+    is_active = serializers.BooleanField(default=True)
+
+
+class ProductImportSerializer(serializers.Serializer):
+    """
+    One product of an import file. Categories and brands are referenced by slug;
+    variations without a price inherit the product price.
+    """
+    sku = serializers.CharField(max_length=100)
+    name = serializers.CharField(max_length=255)
+    slug = serializers.SlugField(max_length=255, required=False)
+    description = serializers.CharField(default="", allow_blank=True)
+    category = serializers.SlugField(max_length=255)
+    brand = serializers.SlugField(max_length=120, required=False, allow_null=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    discount_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True
+    )
+    stock_quantity = serializers.IntegerField(min_value=0, default=0)
+    availability = serializers.ChoiceField(choices=Product.AVAILABILITY_CHOICES, default="in_stock")
+    is_active = serializers.BooleanField(default=True)
+    is_featured = serializers.BooleanField(default=False)
+    seo_title = serializers.CharField(max_length=255, default="", allow_blank=True)
+    seo_description = serializers.CharField(default="", allow_blank=True)
+    images = serializers.ListField(child=serializers.CharField(max_length=100), required=False)
+    variations = VariationImportSerializer(many=True, required=False)
+
+    def validate(self, attrs):
+        skus = [variation["sku"] for variation in attrs.get("variations", [])]
+        names = [variation["name"] for variation in attrs.get("variations", [])]
+        if len(set(skus)) != len(skus) or len(set(names)) != len(names):
+            raise serializers.ValidationError("Variation skus and names must be unique within a product.")
+        return attrs
+
+
+class PriceStockUpdateSerializer(serializers.Serializer):
+    """One `{sku, price, discount_price, stock_quantity}` record; omitted fields are left unchanged."""
+    sku = serializers.CharField(max_length=100)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    discount_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True
+    )
+    stock_quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError("Provide at least one of price, discount_price, stock_quantity.")
+        return attrs
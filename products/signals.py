@@ -0,0 +1,88 @@
+from django.db.models import F
+from django.db.models.functions import Substr
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import track_generations
+
+from .models import Brand, Category, HeroBanner, Product, ProductImage, ProductReview, ProductVariation
+from .ratings import apply_rating_delta
+from .search import get_search_backend
+
+
+# ----------------------------
+# REVIEW -> PRODUCT RATING AGGREGATES
+# ----------------------------
+@receiver(post_save, sender=ProductReview)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    old_rating = getattr(instance, "_loaded_rating", None)
+    old_product_id = getattr(instance, "_loaded_product_id", None)
+
+    if created:
+        apply_rating_delta(instance.product_id, instance.rating, 1)
+    elif old_product_id != instance.product_id:
+        apply_rating_delta(old_product_id, -old_rating, -1)
+        apply_rating_delta(instance.product_id, instance.rating, 1)
+    elif old_rating != instance.rating:
+        apply_rating_delta(instance.product_id, instance.rating - old_rating, 0)
+
+    instance._loaded_rating = instance.rating
+    instance._loaded_product_id = instance.product_id
+
+
+@receiver(post_delete, sender=ProductReview)
+def review_deleted(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Product) or getattr(origin, "model", None) is Product:
+        return  # the product itself is being deleted
+    rating = getattr(instance, "_loaded_rating", None)
+    if rating is None:
+        rating = instance.rating
+    product_id = getattr(instance, "_loaded_product_id", None) or instance.product_id
+    apply_rating_delta(product_id, -rating, -1)
+
+
+# ----------------------------
+# SEARCH INDEX SYNC
+# ----------------------------
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+def taxonomy_saved(sender, instance, created, raw=False, **kwargs):
+    # Brand/category names are part of each product's document
+    if raw or created:
+        return
+    product_ids = instance.products.values_list("pk", flat=True)
+    get_search_backend().index_products(product_ids)
+
+
+# ----------------------------
+# CATEGORY TREE PATHS
+# ----------------------------
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # `parent` is SET_NULL, so the children are now roots: strip the deleted prefix from their subtrees
+    if not instance.path:
+        return
+    Category.objects.filter(path__gt=instance.path, path__lt=instance.path + Category.PATH_END).update(
+        path=Substr("path", len(instance.path) + 1),
+        depth=F("depth") - (instance.depth + 1),
+    )
+
+
+# ----------------------------
+# RESPONSE CACHE GENERATIONS
+# ----------------------------
+track_generations(Product, Category, Brand, ProductImage, ProductVariation, ProductReview, HeroBanner)
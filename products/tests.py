@@ -1,3 +1,624 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .filters import ProductFilter
+from .models import Brand, Category, Product, ProductImage, ProductReview, ProductVariation
+from .pricing import PriceResolver, compute_price
+
+User = get_user_model()
+
+
+class ProductRatingAggregateTest(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Shoes")
+        self.product = Product.objects.create(
+            name="Trail Runner",
+            description="Lightweight trail shoe",
+            category=self.category,
+            price=Decimal("120.00"),
+        )
+        self.user1 = User.objects.create_user(email="one@example.com", full_name="One", password="password123")
+        self.user2 = User.objects.create_user(email="two@example.com", full_name="Two", password="password123")
+
+    def test_review_create_updates_aggregates(self):
+        ProductReview.objects.create(product=self.product, user=self.user1, rating=5)
+        ProductReview.objects.create(product=self.product, user=self.user2, rating=2)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 7)
+        self.assertEqual(self.product.rating_count, 2)
+        self.assertEqual(self.product.average_rating, 3.5)
+
+    def test_review_update_shifts_sum_only(self):
+        review = ProductReview.objects.create(product=self.product, user=self.user1, rating=5)
+        review = ProductReview.objects.get(pk=review.pk)
+        review.rating = 3
+        review.save()
+        review.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 3)
+        self.assertEqual(self.product.rating_count, 1)
+        self.assertEqual(self.product.rating_avg, 3.0)
+
+    def test_review_delete_resets_aggregates(self):
+        review = ProductReview.objects.create(product=self.product, user=self.user1, rating=4)
+        review.delete()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 0)
+        self.assertEqual(self.product.rating_count, 0)
+        self.assertEqual(self.product.rating_avg, 0)
+
+    def test_saving_a_deferred_review_shifts_by_the_stored_rating(self):
+        review = ProductReview.objects.create(product=self.product, user=self.user1, rating=5)
+        for deferred in (ProductReview.objects.only("id", "comment"), ProductReview.objects.defer("rating")):
+            review = deferred.get(pk=review.pk)
+            review.comment = "Still great"
+            review.save()
+        review.rating = 2
+        review.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (2, 1))
+
+    def test_product_saves_keep_reviews_committed_since_loading(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        ProductReview.objects.create(product=self.product, user=self.user1, rating=4)
+        stale.name = "Trail Runner II"
+        stale.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, "Trail Runner II")
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (4, 1))
+
+    def test_deleting_a_product_skips_per_review_updates(self):
+        ProductReview.objects.create(product=self.product, user=self.user1, rating=4)
+        ProductReview.objects.create(product=self.product, user=self.user2, rating=1)
+        with CaptureQueriesContext(connection) as queries:
+            self.product.delete()
+        self.assertFalse([q for q in queries if q["sql"].startswith('UPDATE "products_product"')])
+
+    def test_rebuild_command_repairs_drift(self):
+        ProductReview.objects.create(product=self.product, user=self.user1, rating=4)
+        ProductReview.objects.create(product=self.product, user=self.user2, rating=1)
+        Product.objects.filter(pk=self.product.pk).update(rating_sum=0, rating_count=0, rating_avg=0)
+
+        call_command("rebuild_product_ratings", stdout=StringIO())
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 5)
+        self.assertEqual(self.product.rating_count, 2)
+        self.assertEqual(self.product.rating_avg, 2.5)
+
+    def test_rating_properties_do_not_query(self):
+        ProductReview.objects.create(product=self.product, user=self.user1, rating=4)
+        product = Product.objects.get(pk=self.product.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(product.average_rating, 4.0)
+            self.assertEqual(product.review_count, 1)
+
+
+class ProductListViewTest(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Shoes")
+        self.brand = Brand.objects.create(name="Ridge")
+        for i in range(5):
+            product = Product.objects.create(
+                name=f"Trail Runner {i}",
+                description="Lightweight trail shoe",
+                category=self.category,
+                brand=self.brand,
+                price=Decimal("120.00"),
+            )
+            ProductImage.objects.create(product=product, image=f"products/runner-{i}.jpg", is_featured=True)
+            ProductImage.objects.create(product=product, image=f"products/runner-{i}-side.jpg")
+            ProductVariation.objects.create(product=product, name="42", price=Decimal("120.00"), sku=f"TR-{i}-42")
+
+    def test_list_query_count_is_constant(self):
+        # count, page, featured images
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("products:product-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 5)
+        self.assertEqual(len(response.json()["results"]), 5)
+
+    def test_list_returns_card_fields_only(self):
+        card = self.client.get(reverse("products:product-list")).json()["results"][0]
+
+        self.assertNotIn("variations", card)
+        self.assertNotIn("reviews", card)
+        self.assertNotIn("description", card)
+        self.assertEqual(card["brand"], {"id": self.brand.id, "name": "Ridge"})
+        self.assertEqual(card["category"], {"id": self.category.id, "name": "Shoes"})
+        self.assertTrue(card["image"]["image"].endswith(".jpg"))
+        self.assertTrue(card["image"]["is_featured"])
+
+    def test_detail_keeps_full_payload(self):
+        product = Product.objects.first()
+        response = self.client.get(reverse("products:product-detail", args=[product.slug]))
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(len(body["images"]), 2)
+        self.assertEqual(len(body["variations"]), 1)
+        self.assertIn("reviews", body)
+
+
+class ProductSearchTest(TestCase):
+
+    def setUp(self):
+        self.shoes = Category.objects.create(name="Shoes")
+        self.ridge = Brand.objects.create(name="Ridge")
+        self.summit = Brand.objects.create(name="Summit")
+        self.runner = Product.objects.create(
+            name="Trail Runner", description="Grippy outsole", category=self.shoes,
+            brand=self.ridge, price=Decimal("120.00"), sku="TR-100",
+        )
+        self.boot = Product.objects.create(
+            name="Hiking Boot", description="Waterproof boot for trail hiking", category=self.shoes,
+            brand=self.summit, price=Decimal("180.00"), sku="HB-200",
+        )
+        self.sock = Product.objects.create(
+            name="Wool Sock", description="Warm", category=self.shoes,
+            brand=self.ridge, price=Decimal("15.00"), sku="WS-300",
+        )
+
+    def _search(self, **params):
+        response = self.client.get(reverse("products:product-list"), params)
+        self.assertEqual(response.status_code, 200)
+        return [card["id"] for card in response.json()["results"]]
+
+    def test_prefix_match_ranks_name_above_description(self):
+        self.assertEqual(self._search(search="tra"), [self.runner.id, self.boot.id])
+
+    def test_search_composes_with_filters(self):
+        self.assertEqual(self._search(search="trail", brand=str(self.summit.id)), [self.boot.id])
+        self.assertEqual(self._search(search="trail", max_price="150"), [self.runner.id])
+
+    def test_search_matches_sku_brand_and_category(self):
+        self.assertEqual(self._search(search="ws-300"), [self.sock.id])
+        self.assertEqual(sorted(self._search(search="ridge")), sorted([self.runner.id, self.sock.id]))
+        self.assertEqual(len(self._search(search="shoes")), 3)
+
+    def test_index_follows_product_and_brand_changes(self):
+        self.sock.name = "Merino Crew"
+        with self.captureOnCommitCallbacks(execute=True):  # cached listings are invalidated on commit
+            self.sock.save()
+        self.assertEqual(self._search(search="merino"), [self.sock.id])
+        self.assertEqual(self._search(search="wool"), [])
+
+        self.summit.name = "Alpine"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.summit.save()
+        self.assertEqual(self._search(search="alpine"), [self.boot.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.boot.delete()
+        self.assertEqual(self._search(search="alpine"), [])
+
+    def test_explicit_sort_overrides_relevance(self):
+        self.assertEqual(self._search(search="tra", sort="price-high"), [self.boot.id, self.runner.id])
+
+
+class ProductFacetViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.shoes = Category.objects.create(name="Shoes")
+        self.socks = Category.objects.create(name="Socks")
+        self.ridge = Brand.objects.create(name="Ridge")
+        self.summit = Brand.objects.create(name="Summit")
+        Product.objects.create(
+            name="Trail Runner", description="Shoe", category=self.shoes, brand=self.ridge,
+            price=Decimal("1200.00"), rating_avg=4.5,
+        )
+        Product.objects.create(
+            name="Hiking Boot", description="Boot", category=self.shoes, brand=self.summit,
+            price=Decimal("2500.00"), availability="preorder", rating_avg=3.2,
+        )
+        Product.objects.create(
+            name="Wool Sock", description="Sock", category=self.socks, brand=self.ridge,
+            price=Decimal("300.00"), rating_avg=4.0,
+        )
+
+    def _facets(self, **params):
+        response = self.client.get(reverse("products:product-facets"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts_without_filters(self):
+        facets = self._facets()
+
+        self.assertEqual(facets["total"], 3)
+        self.assertEqual(
+            {b["name"]: b["count"] for b in facets["brands"]}, {"Ridge": 2, "Summit": 1}
+        )
+        self.assertEqual(
+            {a["value"]: a["count"] for a in facets["availability"]}, {"in_stock": 2, "preorder": 1}
+        )
+        self.assertEqual(
+            [(r["min_rating"], r["count"]) for r in facets["ratings"]], [(4, 2), (3, 3), (2, 3), (1, 3)]
+        )
+        self.assertEqual([b["count"] for b in facets["price"]["buckets"]], [1, 1, 1])
+
+    def test_facet_ignores_its_own_filter(self):
+        facets = self._facets(brand=str(self.ridge.id))
+
+        self.assertEqual(facets["total"], 2)
+        # Brand counts still show the alternatives...
+        self.assertEqual({b["name"]: b["count"] for b in facets["brands"]}, {"Ridge": 2, "Summit": 1})
+        # ...while the other facets are narrowed to Ridge
+        self.assertEqual({c["name"]: c["count"] for c in facets["categories"]}, {"Shoes": 1, "Socks": 1})
+
+    def test_results_cached_per_normalized_signature(self):
+        self._facets(brand=f"{self.ridge.id},{self.summit.id}")
+        with self.assertNumQueries(0):
+            self._facets(brand=f"{self.summit.id}, {self.ridge.id}", sort="price-low")
+
+
+class CategoryTreeTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.gear = Category.objects.create(name="Gear")
+        self.shoes = Category.objects.create(name="Shoes", parent=self.gear)
+        self.trail = Category.objects.create(name="Trail Shoes", parent=self.shoes)
+        self.apparel = Category.objects.create(name="Apparel")
+        self.boot = Product.objects.create(
+            name="Trail Boot", description="", category=self.trail, price=Decimal("150.00"),
+        )
+        self.jacket = Product.objects.create(
+            name="Shell Jacket", description="", category=self.apparel, price=Decimal("90.00"),
+        )
+
+    def test_paths_follow_parents(self):
+        self.trail.refresh_from_db()
+        self.assertEqual(self.trail.depth, 2)
+        self.assertEqual(self.trail.path, f"{self.gear.pk:08d}/{self.shoes.pk:08d}/{self.trail.pk:08d}/")
+        self.assertEqual(set(self.gear.subtree()), {self.gear, self.shoes, self.trail})
+
+    def test_reparenting_moves_the_subtree(self):
+        self.shoes.parent = self.apparel
+        self.shoes.save()
+        self.trail.refresh_from_db()
+        self.assertTrue(self.trail.path.startswith(self.apparel.path))
+        self.assertEqual(self.trail.depth, 2)
+
+        self.apparel.parent = self.trail
+        with self.assertRaises(ValueError):
+            self.apparel.save()
+
+    def test_deleting_a_parent_reroots_children(self):
+        self.gear.delete()
+        self.trail.refresh_from_db()
+        self.assertEqual(self.trail.depth, 1)
+        self.assertEqual(self.trail.path, f"{self.shoes.pk:08d}/{self.trail.pk:08d}/")
+
+    def test_list_returns_nested_tree_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("products:category-list"))
+        roots = response.json()
+        self.assertEqual([root["name"] for root in roots], ["Apparel", "Gear"])
+        shoes = roots[1]["subcategories"][0]
+        self.assertEqual(shoes["name"], "Shoes")
+        self.assertEqual(shoes["subcategories"][0]["name"], "Trail Shoes")
+
+    def test_inactive_category_hides_its_subtree(self):
+        self.shoes.is_active = False
+        self.shoes.save()
+        roots = self.client.get(reverse("products:category-list")).json()
+        self.assertEqual(roots[1]["subcategories"], [])
+
+    def test_category_filter_includes_descendants(self):
+        response = self.client.get(reverse("products:product-list"), {"category": str(self.gear.pk)})
+        self.assertEqual([card["id"] for card in response.json()["results"]], [self.boot.id])
+
+        response = self.client.get(reverse("products:product-list"), {"category": "Shoes,Apparel"})
+        self.assertEqual({card["id"] for card in response.json()["results"]}, {self.boot.id, self.jacket.id})
+
+    def test_rebuild_command_repairs_paths(self):
+        Category.objects.update(path="", depth=0)
+        call_command("rebuild_category_paths", stdout=StringIO())
+        self.trail.refresh_from_db()
+        self.assertEqual(self.trail.depth, 2)
+
+
+class ProductBulkImportExportTest(TestCase):
+
+    CSV = (
+        "sku,name,category,brand,price,discount_price,stock_quantity,images,"
+        "variation_sku,variation_name,variation_price,variation_stock_quantity\n"
+        "TR-1,Trail Runner,shoes,ridge,120.00,99.00,10,a.jpg|b.jpg,TR-1-42,42,,3\n"
+        "TR-1,Trail Runner,shoes,ridge,120.00,99.00,10,a.jpg|b.jpg,TR-1-43,43,125.00,2\n"
+        "HB-1,Hiking Boot,shoes,,180.00,,5,,,,,\n"
+        "BAD-1,Bad Price,shoes,,abc,,1,,,,,\n"
+        "BAD-2,No Category,hats,,10.00,,1,,,,,\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.shoes = Category.objects.create(name="Shoes")
+        self.ridge = Brand.objects.create(name="Ridge")
+        self.staff = User.objects.create_user(
+            email="staff@example.com", full_name="Staff", password="password123", is_staff=True
+        )
+
+    def _import(self, text, file_format="csv"):
+        from .bulk import import_products
+        return import_products(StringIO(text), file_format)
+
+    def test_csv_import_upserts_products_variations_and_images(self):
+        result = self._import(self.CSV)
+
+        self.assertEqual((result["created"], result["updated"], result["failed"]), (2, 0, 2))
+        self.assertEqual([error["sku"] for error in result["errors"]], ["BAD-1", "BAD-2"])
+        runner = Product.objects.get(sku="TR-1")
+        self.assertTrue(runner.is_on_sale)
+        self.assertEqual(runner.brand, self.ridge)
+        self.assertEqual(
+            list(runner.variations.values_list("sku", "price")),
+            [("TR-1-42", Decimal("120.00")), ("TR-1-43", Decimal("125.00"))],
+        )
+        self.assertEqual(list(runner.images.values_list("image", "is_featured")), [("a.jpg", True), ("b.jpg", False)])
+        self.assertEqual(self.client.get(reverse("products:product-list"), {"search": "runner"}).json()["count"], 1)
+
+        result = self._import('{"sku": "TR-1", "name": "Trail Runner 2", "category": "shoes", "price": "130.00"}\n', "jsonl")
+        self.assertEqual((result["created"], result["updated"]), (0, 1))
+        runner.refresh_from_db()
+        self.assertEqual((runner.name, runner.price, runner.is_on_sale), ("Trail Runner 2", Decimal("130.00"), False))
+        self.assertEqual(runner.images.count(), 2)  # images untouched when not listed
+
+    def test_slug_clash_gets_sku_suffix(self):
+        Product.objects.create(name="Trail Runner", description="", category=self.shoes, price=Decimal("1.00"))
+        self._import(self.CSV)
+        self.assertEqual(Product.objects.get(sku="TR-1").slug, "trail-runner-tr-1")
+
+    def test_integrity_errors_only_fail_their_row(self):
+        self._import('{"sku": "A", "name": "A", "category": "shoes", "price": "1.00", '
+                     '"variations": [{"sku": "A-M", "name": "M"}]}\n', "jsonl")
+        text = (
+            # New sku for an existing variation name: violates (product, name) uniqueness
+            '{"sku": "A", "name": "A", "category": "shoes", "price": "2.00", '
+            '"variations": [{"sku": "A-M-2", "name": "M"}]}\n'
+            '{"sku": "B", "name": "B", "category": "shoes", "price": "1.00", '
+            '"variations": [{"sku": "B-M", "name": "M"}]}\n'
+            "not json\n"
+        )
+        result = self._import(text, "jsonl")
+
+        self.assertEqual((result["created"], result["updated"], result["failed"]), (1, 0, 2))
+        self.assertEqual(sorted(error["line"] for error in result["errors"]), [1, 3])
+        self.assertTrue(Product.objects.filter(sku="B").exists())
+        self.assertEqual(Product.objects.get(sku="A").price, Decimal("1.00"))
+
+    def test_export_round_trips_through_import(self):
+        self._import(self.CSV)
+        client = APIClient()
+        client.force_authenticate(self.staff)
+
+        for file_format in ("csv", "jsonl"):
+            response = client.get(reverse("products:product-export"), {"type": file_format})
+            self.assertEqual(response.status_code, 200)
+            body = b"".join(response.streaming_content).decode()
+            result = self._import(body, file_format)
+            self.assertEqual((result["created"], result["updated"], result["failed"]), (0, 2, 0))
+
+        self.assertEqual(ProductVariation.objects.filter(product__sku="TR-1").count(), 2)
+
+    def test_unreadable_file_is_reported_with_the_rows_before_it(self):
+        result = self._import(self.CSV + "XL-1,Long,shoes,," + "9" * 200_000 + ",,1,,,,,\n")
+        # BAD-2 (line 6) is still being grouped when the oversized field stops the reader
+        self.assertEqual((result["created"], result["failed"]), (2, 2))
+        self.assertIsNone(result["errors"][-1]["line"])
+        self.assertIn("after line 5: field larger than field limit", result["errors"][-1]["errors"][0])
+
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        upload = SimpleUploadedFile("catalog.csv", b"sku,name\n\xff\xfe,x\n", content_type="text/csv")
+        response = client.post(reverse("products:product-import"), {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["created"], response.json()["failed"]), (0, 1))
+        self.assertIn("utf-8", response.json()["errors"][0]["errors"][0])
+
+    def test_upload_endpoint_is_admin_only(self):
+        url = reverse("products:product-import")
+        upload = SimpleUploadedFile("catalog.csv", self.CSV.encode(), content_type="text/csv")
+        self.assertIn(self.client.post(url, {"file": upload}).status_code, (401, 403))
+
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        upload.seek(0)
+        response = client.post(url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 2)
+
+
+class ProductPriceStockUpdateTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Shoes")
+        self.products = [
+            Product.objects.create(
+                name=f"Shoe {i}", description="", category=category, price=Decimal("100.00"), sku=f"S-{i}",
+            )
+            for i in range(5)
+        ]
+        self.variation = ProductVariation.objects.create(
+            product=self.products[0], name="42", price=Decimal("100.00"), sku="S-0-42", stock_quantity=1,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(
+            email="staff@example.com", full_name="Staff", password="password123", is_staff=True
+        ))
+        self.url = reverse("products:product-price-stock")
+
+    def test_batch_updates_products_and_variations(self):
+        payload = [
+            {"sku": "S-0", "discount_price": "80.00"},
+            {"sku": "S-1", "price": "120.00", "stock_quantity": 7},
+            {"sku": "S-0-42", "price": "110.00", "stock_quantity": 4},
+            {"sku": "NOPE", "stock_quantity": 1},
+            {"sku": "S-2"},
+            {"sku": "S-3", "price": "-1"},
+        ]
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["products"], body["variations"], body["not_found"]), (2, 1, ["NOPE"]))
+        self.assertEqual([error["index"] for error in body["errors"]], [4, 5])
+
+        first, second = Product.objects.get(sku="S-0"), Product.objects.get(sku="S-1")
+        self.assertTrue(first.is_on_sale)
+        self.assertEqual((second.price, second.stock_quantity, second.is_on_sale), (Decimal("120.00"), 7, False))
+        self.variation.refresh_from_db()
+        self.assertEqual((self.variation.price, self.variation.stock_quantity), (Decimal("110.00"), 4))
+
+    def test_query_count_does_not_grow_with_batch(self):
+        payload = [{"sku": f"S-{i}", "stock_quantity": i} for i in range(5)]
+        # savepoint, locked product lookup, held units, one bulk UPDATE, release
+        with self.assertNumQueries(5):
+            self.client.post(self.url, payload, format="json")
+
+    def test_only_supplied_fields_are_written(self):
+        Product.objects.filter(sku="S-1").update(stock_quantity=3)  # e.g. a checkout committed meanwhile
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, [{"sku": "S-1", "price": "90.00"}], format="json")
+        updates = [query["sql"] for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn("stock_quantity", updates[0])
+        self.assertEqual(Product.objects.get(sku="S-1").stock_quantity, 3)
+
+    def test_stock_sync_keeps_held_units_off_and_rejects_variation_discounts(self):
+        from orders.models import Order, StockReservation
+
+        order = Order.objects.create(email="c@example.com", full_name="Customer")
+        expires = timezone.now() + timedelta(minutes=15)
+        StockReservation.objects.create(order=order, product=self.products[1], quantity=2, expires_at=expires)
+        StockReservation.objects.create(
+            order=order, product=self.products[0], variation=self.variation, quantity=1, expires_at=expires,
+        )
+        body = self.client.post(self.url, [
+            {"sku": "S-1", "stock_quantity": 10},
+            {"sku": "S-0", "stock_quantity": 10},
+            {"sku": "S-0-42", "price": "90.00", "discount_price": "80.00"},
+        ], format="json").json()
+
+        self.assertEqual((body["products"], body["variations"], body["not_found"]), (2, 0, []))
+        self.assertEqual([error["sku"] for error in body["errors"]], ["S-0-42"])
+        self.assertEqual(Product.objects.get(sku="S-1").stock_quantity, 8)
+        self.assertEqual(Product.objects.get(sku="S-0").stock_quantity, 10)  # the hold is on the variation
+        self.variation.refresh_from_db()
+        self.assertEqual(self.variation.price, Decimal("100.00"))
+
+    def test_requires_admin(self):
+        self.assertIn(APIClient().post(self.url, [], format="json").status_code, (401, 403))
+
+
+class PricingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        category = Category.objects.create(name="Shoes")
+        self.product = Product.objects.create(
+            name="Trail Runner", description="", category=category,
+            price=Decimal("100.00"), discount_price=Decimal("80.00"),
+        )
+        self.variation = ProductVariation.objects.create(
+            product=self.product, name="XL", price=Decimal("120.00"), sku="TR-XL",
+        )
+
+    def _schedule(self, starts=None, ends=None):
+        self.product.sale_starts_at, self.product.sale_ends_at = starts, ends
+        self.product.save()
+
+    def test_sale_window_decides_the_price(self):
+        day = timedelta(days=1)
+        cases = [
+            (None, None, Decimal("80.00")),
+            (self.now - day, self.now + day, Decimal("80.00")),
+            (self.now + day, None, Decimal("100.00")),
+            (None, self.now - day, Decimal("100.00")),
+        ]
+        for starts, ends, expected in cases:
+            self._schedule(starts, ends)
+            price = compute_price(self.product, now=self.now)
+            self.assertEqual((price.unit, price.on_sale), (expected, expected < price.base))
+
+        self._schedule(self.now + day, self.now + 2 * day)
+        self.assertEqual(compute_price(self.product, now=self.now).changes_at, self.now + day)
+
+    def test_variation_gets_the_same_fraction_off(self):
+        price = compute_price(self.product, self.variation, now=self.now)
+        self.assertEqual((price.base, price.unit), (Decimal("120.00"), Decimal("96.00")))
+
+    def test_resolver_loads_once_and_memoizes(self):
+        resolver = PriceResolver()
+        keys = [(self.product.pk, None), (self.product.pk, self.variation.pk), (self.product.pk, 999)]
+        with self.assertNumQueries(2):
+            prices = resolver.prices(keys)
+        self.assertEqual(prices[keys[0]].unit, Decimal("80.00"))
+        self.assertEqual(prices[keys[1]].unit, Decimal("96.00"))
+        self.assertNotIn(keys[2], prices)
+        with self.assertNumQueries(0):
+            resolver.prices(keys[:2])
+
+    def test_listing_and_detail_show_the_effective_price(self):
+        self._schedule(ends=self.now - timedelta(days=1))
+        card = self.client.get(reverse("products:product-list")).json()["results"][0]
+        self.assertEqual((card["effective_price"], card["is_on_sale"]), ("100.00", False))
+
+        self._schedule(starts=self.now - timedelta(days=1))
+        detail = self.client.get(reverse("products:product-detail", args=[self.product.slug])).json()
+        self.assertEqual((detail["effective_price"], detail["is_on_sale"]), ("80.00", True))
+        self.assertEqual(detail["variations"][0]["effective_price"], "96.00")
+
+    def test_cached_listing_expires_at_the_next_sale_change(self):
+        self._schedule(starts=self.now + timedelta(seconds=30))
+        with patch("core.cache.cache.set", wraps=cache.set) as cache_set:
+            self.client.get(reverse("products:product-list"))
+        timeout = cache_set.call_args.args[2]
+        self.assertLessEqual(timeout, 31)
+
+    def test_on_sale_filter_follows_the_sale_window(self):
+        def on_sale(value):
+            return list(ProductFilter({"is_on_sale": value}, queryset=Product.objects.all()).qs)
+
+        self._schedule(starts=self.now + timedelta(days=1))
+        self.assertEqual((on_sale("true"), on_sale("false")), ([], [self.product]))
+        self._schedule(starts=self.now - timedelta(days=1), ends=self.now + timedelta(days=1))
+        self.assertEqual((on_sale("true"), on_sale("false")), ([self.product], []))
+        self._schedule(ends=self.now - timedelta(days=1))
+        self.assertEqual(on_sale("true"), [])
+
+    def test_detail_revalidation_crosses_a_sale_start(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._schedule(starts=self.now + timedelta(hours=1))
+        url = reverse("products:product-detail", args=[self.product.slug])
+        before = self.client.get(url)
+        self.assertEqual(before.json()["effective_price"], "100.00")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=before["ETag"]).status_code, 304)
+
+        with patch("django.utils.timezone.now", return_value=self.now + timedelta(hours=2)):
+            after = self.client.get(url, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.json()["effective_price"], "80.00")
+        self.assertNotEqual(after["ETag"], before["ETag"])
@@ -3,10 +3,14 @@ from django.urls import path
 from .views import (
     # Products
     ProductListView,
+    ProductFacetView,
     ProductDetailView,
     ProductCreateView,
     ProductUpdateView,
     ProductDeleteView,
+    ProductImportView,
+    ProductExportView,
+    ProductPriceStockUpdateView,
     # Reviews
     ProductReviewListCreateView,
     # Categories
@@ -31,6 +35,10 @@ urlpatterns = [
     # Products
     # --------------------
     path("products/", ProductListView.as_view(), name="product-list"),
+    path("products/facets/", ProductFacetView.as_view(), name="product-facets"),
+    path("products/import/", ProductImportView.as_view(), name="product-import"),
+    path("products/export/", ProductExportView.as_view(), name="product-export"),
+    path("products/price-stock/", ProductPriceStockUpdateView.as_view(), name="product-price-stock"),
     path("products/<slug:slug>/", ProductDetailView.as_view(), name="product-detail"),  # changed to slug
     path("products/create/", ProductCreateView.as_view(), name="product-create"),
     path("products/<int:id>/update/", ProductUpdateView.as_view(), name="product-update"),
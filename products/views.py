@@ -1,9 +1,24 @@
-from rest_framework import generics, permissions, filters
+import io
+
+from django.http import StreamingHttpResponse
+from rest_framework import generics, permissions, filters, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg, Q
-from .models import Product, Category, HeroBanner, Brand, ProductReview
+from django.db.models import F, Prefetch, Q
+from django.utils import timezone
+from core.cache import CachedResponseMixin, ConditionalGetMixin
+from core.pagination import KeysetPagination
+from .models import Product, ProductImage, ProductVariation, Category, HeroBanner, Brand, ProductReview
+from .bulk import EXPORTERS, apply_price_stock_updates, detect_format, import_products
+from .categories import children_map
+from .facets import get_facets
+from .filters import ProductSearchFilter, filter_catalog
+from .pricing import PriceResolver, expire_sale_windows
 from .serializers import (
     ProductSerializer,
+    ProductListSerializer,
     CategorySerializer,
     HeroBannerSerializer,
     BrandSerializer,
@@ -14,73 +29,85 @@ from .serializers import (
 # ------------------------------
 # Products
 # ------------------------------
-class ProductListView(generics.ListAPIView):
-    serializer_class = ProductSerializer
+class SaleWindowCacheMixin:
+    """Keep cached responses and validators from outliving a scheduled sale start or end."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        expire_sale_windows()
+
+    def get_cache_timeout(self):
+        timeout = super().get_cache_timeout()
+        changes_at = PriceResolver.for_request(self.request).next_change()
+        if changes_at:
+            timeout = max(1, min(timeout, int((changes_at - timezone.now()).total_seconds()) + 1))
+        return timeout
+
+
+class ProductListView(SaleWindowCacheMixin, CachedResponseMixin, generics.ListAPIView):
+    serializer_class = ProductListSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ["name", "description", "sku"]
+    pagination_class = KeysetPagination
+    cache_models = (Product, Category, Brand, ProductImage, ProductReview)
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, filters.OrderingFilter]
     ordering_fields = ["price", "created_at", "updated_at", "avg_rating"]
-    ordering = ["-created_at"]
+    # No view-level default `ordering`: it would override the `sort` param and
+    # search relevance. Product.Meta.ordering (-created_at) applies otherwise.
 
     def get_queryset(self):
-        queryset = Product.objects.filter(is_active=True).annotate(
-            avg_rating=Avg("reviews__rating")
+        # Cards only need category/brand names and the featured image:
+        # one query for the page plus one prefetch for images.
+        queryset = (
+            Product.objects.filter(is_active=True)
+            .select_related("category", "brand")
+            .prefetch_related(
+                Prefetch(
+                    "images",
+                    queryset=ProductImage.objects.filter(is_featured=True),
+                    to_attr="featured_images",
+                )
+            )
+            .annotate(avg_rating=F("rating_avg"))
         )
         params = self.request.query_params
-
-        # --- Multi-select filters (comma-separated) ---
-        brand = params.get("brand")
-        if brand:
-            values = [b.strip() for b in brand.split(",")]
-            if all(v.isdigit() for v in values):
-                queryset = queryset.filter(brand_id__in=values)
-            else:
-                queryset = queryset.filter(brand__name__in=values)
-
-        category = params.get("category")
-        if category:
-            values = [c.strip() for c in category.split(",")]
-            if all(v.isdigit() for v in values):
-                queryset = queryset.filter(category_id__in=values)
-            else:
-                queryset = queryset.filter(category__name__in=values)
-
-        availability = params.get("availability")
-        if availability:
-            statuses = [a.strip() for a in availability.split(",")]
-            queryset = queryset.filter(availability__in=statuses)
-
-        # --- Price range ---
-        min_price = params.get("min_price")
-        max_price = params.get("max_price")
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-
-        # --- Minimum rating ---
-        min_rating = params.get("min_rating")
-        if min_rating:
-            queryset = queryset.filter(avg_rating__gte=min_rating)
+        queryset = filter_catalog(queryset, params)
 
         # --- Sorting (frontend sends `sort` param) ---
+        # Every ordering ends on `id` (same direction as the sort key) so keyset
+        # pagination has a unique cursor and one (key, id) index serves both directions
         sort = params.get("sort")
         if sort == "price-low":
-            queryset = queryset.order_by("price")
+            queryset = queryset.order_by("price", "id")
         elif sort == "price-high":
-            queryset = queryset.order_by("-price")
+            queryset = queryset.order_by("-price", "-id")
         elif sort == "newest":
-            queryset = queryset.order_by("-created_at")
+            queryset = queryset.order_by("-created_at", "-id")
         elif sort == "rating":
-            queryset = queryset.order_by("-avg_rating")
+            queryset = queryset.order_by("-rating_avg", "-id")
 
         return queryset
 
 
-class ProductDetailView(generics.RetrieveAPIView):
-    queryset = Product.objects.filter(is_active=True)
+class ProductFacetView(APIView):
+    """
+    Facet counts (brand, category, availability, rating, price histogram)
+    for the same filter params ProductListView accepts.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        return Response(get_facets(request.query_params))
+
+
+class ProductDetailView(ConditionalGetMixin, SaleWindowCacheMixin, CachedResponseMixin, generics.RetrieveAPIView):
+    queryset = (
+        Product.objects.filter(is_active=True)
+        .select_related("category", "brand")
+        .prefetch_related("images", "variations", "reviews__user")
+    )
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Product, Category, Brand, ProductImage, ProductVariation, ProductReview)
     lookup_field = "slug"   # Use slug for SEO
 
 
@@ -104,16 +131,69 @@ class ProductDeleteView(generics.DestroyAPIView):
     lookup_field = "id"
 
 
+class ProductImportView(APIView):
+    """
+    Admin bulk upsert of products (by sku) from an uploaded CSV or JSONL `file`.
+    The file is read as a stream; rows that fail validation are reported, not fatal.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"file": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get("type") or detect_format(upload.name)
+        if file_format not in EXPORTERS:
+            return Response({"type": [f"Must be one of: {', '.join(EXPORTERS)}."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        result = import_products(stream, file_format)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class ProductExportView(APIView):
+    """Admin catalog export streamed as CSV (default) or JSONL (`?type=jsonl`)."""
+    permission_classes = [permissions.IsAdminUser]
+    content_types = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+    def get(self, request):
+        file_format = request.query_params.get("type", "csv")
+        if file_format not in EXPORTERS:
+            return Response({"type": [f"Must be one of: {', '.join(EXPORTERS)}."]}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(EXPORTERS[file_format](), content_type=self.content_types[file_format])
+        response["Content-Disposition"] = f'attachment; filename="products.{file_format}"'
+        return response
+
+
+class ProductPriceStockUpdateView(APIView):
+    """
+    Admin batch sync of price / discount / stock by sku, for products and variations:
+    a JSON list of `{sku, price, discount_price, stock_quantity}` records (or `{"updates": [...]}`).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        records = request.data.get("updates") if isinstance(request.data, dict) else request.data
+        if not isinstance(records, list):
+            return Response(
+                {"updates": ["Expected a list of {sku, price, discount_price, stock_quantity} records."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(apply_price_stock_updates(records))
+
+
 # ------------------------------
 # Product Reviews
 # ------------------------------
 class ProductReviewListCreateView(generics.ListCreateAPIView):
     serializer_class = ProductReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         product_id = self.kwargs.get("product_id")
-        return ProductReview.objects.filter(product_id=product_id)
+        return ProductReview.objects.filter(product_id=product_id).select_related("user")
 
     def perform_create(self, serializer):
         product_id = self.kwargs.get("product_id")
@@ -123,15 +203,38 @@ class ProductReviewListCreateView(generics.ListCreateAPIView):
 # ------------------------------
 # Categories
 # ------------------------------
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
+    """
+    The active category tree: root categories with nested `subcategories`,
+    built in memory from one query. With `?search=` the matching categories
+    are listed flat (each with its own subtree) instead of the roots.
+    """
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Category,)
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["name"]
     ordering_fields = ["name"]
     ordering = ["name"]
 
+    category_children = None
+
+    def filter_queryset(self, queryset):
+        nodes = list(super().filter_queryset(queryset))
+        if self.request.query_params.get("search"):
+            tree = filters.OrderingFilter().filter_queryset(self.request, queryset, self)
+            self.category_children = children_map(tree)
+            return nodes
+        self.category_children = children_map(nodes)
+        return self.category_children[None]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.category_children is not None:
+            context["category_children"] = self.category_children
+        return context
+
 
 class CategoryDetailView(generics.RetrieveAPIView):
     queryset = Category.objects.all()
@@ -163,10 +266,11 @@ class CategoryDeleteView(generics.DestroyAPIView):
 # ------------------------------
 # Brands
 # ------------------------------
-class BrandListView(generics.ListAPIView):
+class BrandListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
     queryset = Brand.objects.filter(is_active=True)
     serializer_class = BrandSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Brand,)
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["name"]
     ordering_fields = ["name"]
@@ -183,10 +287,11 @@ class BrandDetailView(generics.RetrieveAPIView):
 # ------------------------------
 # Hero Banners / Ads
 # ------------------------------
-class HeroBannerListView(generics.ListAPIView):
+class HeroBannerListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
     queryset = HeroBanner.objects.filter(is_active=True).order_by("display_order", "-created_at")
     serializer_class = HeroBannerSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (HeroBanner,)
 
 
 class HeroBannerDetailView(generics.RetrieveAPIView):
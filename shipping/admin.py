@@ -1,5 +1,6 @@
-from django.contrib import admin
-from django.utils import timezone
+from django.contrib import admin, messages
+
+from orders.workflow import TransitionError, transition_shipments
 from .models import ShippingAddress, ShippingMethod, Shipment, ShipmentHistory
 
 
@@ -76,56 +77,27 @@ class ShipmentAdmin(admin.ModelAdmin):
     # ------------------
     actions = ["mark_as_shipped", "mark_as_delivered", "mark_as_cancelled"]
 
+    def _transition(self, request, queryset, target):
+        # One transaction for the whole selection; the orders follow (see orders.workflow)
+        try:
+            moved = transition_shipments(queryset, target, note=f"Bulk action: Marked as {target}")
+        except TransitionError as exc:
+            self.message_user(request, " ".join(exc.errors.values()), level=messages.ERROR)
+            return
+        self.message_user(request, f"{len(moved)} shipments marked as {target}.")
+
     def mark_as_shipped(self, request, queryset):
-        updated = 0
-        for shipment in queryset:
-            old_status = shipment.status
-            shipment.status = "shipped"
-            shipment.shipped_at = timezone.now()
-            shipment.save()
-            ShipmentHistory.objects.create(
-                shipment=shipment,
-                old_status=old_status,
-                new_status="shipped",
-                note="Bulk action: Marked as shipped",
-            )
-            updated += 1
-        self.message_user(request, f"{updated} shipments marked as shipped.")
+        self._transition(request, queryset, "shipped")
 
     mark_as_shipped.short_description = "Mark selected shipments as Shipped"
 
     def mark_as_delivered(self, request, queryset):
-        updated = 0
-        for shipment in queryset:
-            old_status = shipment.status
-            shipment.status = "delivered"
-            shipment.delivered_at = timezone.now()
-            shipment.save()
-            ShipmentHistory.objects.create(
-                shipment=shipment,
-                old_status=old_status,
-                new_status="delivered",
-                note="Bulk action: Marked as delivered",
-            )
-            updated += 1
-        self.message_user(request, f"{updated} shipments marked as delivered.")
+        self._transition(request, queryset, "delivered")
 
     mark_as_delivered.short_description = "Mark selected shipments as Delivered"
 
     def mark_as_cancelled(self, request, queryset):
-        updated = 0
-        for shipment in queryset:
-            old_status = shipment.status
-            shipment.status = "cancelled"
-            shipment.save()
-            ShipmentHistory.objects.create(
-                shipment=shipment,
-                old_status=old_status,
-                new_status="cancelled",
-                note="Bulk action: Marked as cancelled",
-            )
-            updated += 1
-        self.message_user(request, f"{updated} shipments marked as cancelled.")
+        self._transition(request, queryset, "cancelled")
 
     mark_as_cancelled.short_description = "Mark selected shipments as Cancelled"
 
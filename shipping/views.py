@@ -1,8 +1,8 @@
 from rest_framework import generics, permissions, viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.utils import timezone
 
+from orders.workflow import TransitionError, transition_shipments
 from .models import ShippingAddress, ShippingMethod, Shipment, ShipmentHistory
 from .serializers import (
     ShippingAddressSerializer,
@@ -69,9 +69,10 @@ class ShipmentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Shipment.objects.select_related("address", "method").prefetch_related("history")
         if user.is_staff:
-            return Shipment.objects.all()
-        return Shipment.objects.filter(order__user=user)
+            return queryset
+        return queryset.filter(order__user=user)
 
     def perform_create(self, serializer):
         """
@@ -85,31 +86,20 @@ class ShipmentViewSet(viewsets.ModelViewSet):
     def update_status(self, request, pk=None):
         """
         Admin/staff can update shipment status and record history.
+        The order follows (see orders.workflow), so the two never disagree.
         """
         shipment = self.get_object()
-        old_status = shipment.status
         new_status = request.data.get("status")
 
         if new_status not in dict(Shipment.STATUS_CHOICES):
             return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
 
-        shipment.status = new_status
-
-        # Automatically set timestamps
-        if new_status == "shipped" and not shipment.shipped_at:
-            shipment.shipped_at = timezone.now()
-        elif new_status == "delivered" and not shipment.delivered_at:
-            shipment.delivered_at = timezone.now()
-
-        shipment.save()
-
-        # Record history
-        ShipmentHistory.objects.create(
-            shipment=shipment,
-            old_status=old_status,
-            new_status=new_status,
-            note=request.data.get("note", "")
-        )
+        try:
+            transition_shipments(
+                Shipment.objects.filter(pk=shipment.pk), new_status, note=request.data.get("note", ""),
+            )
+        except TransitionError as exc:
+            return Response({"error": " ".join(exc.errors.values())}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({"status": f"Shipment updated to {new_status}"})
 